@@ -24,6 +24,10 @@ import brush_state
 import event_filter
 import brush_utils
 import logging_util
+import instance_data
+import transform_utils
+import filter_utils
+import poisson_utils
 
 
 """ -------------------------------------------------------------------- """
@@ -68,6 +72,9 @@ class SporeToolCmd(ompx.MPxToolCommand):
 
         self.brush_state = None
         self.instance_data = None
+        self.geo_cache = None
+        self.exclusion_index = None
+        self.prototype_radii = None
         self.last_brush_position = None
 
         self.last_undo_journal = ''
@@ -88,10 +95,11 @@ class SporeToolCmd(ompx.MPxToolCommand):
         self.color = om.MVectorArray()
         self.point_id = om.MIntArray()
 
-        self.initial_rotation = om.MVectorArray()
-        self.initial_scale = om.MVectorArray()
-        self.initial_offset = om.MDoubleArray()
-        self.initial_id = om.MIntArray()
+        self.initial_rotation = np.empty((0, 3))
+        self.initial_scale = np.empty((0, 3))
+        self.initial_offset = np.empty(0)
+        self.initial_id = np.empty(0, dtype=int)
+        self.initial_visibility = np.empty(0, dtype=int)
         self.spray_coords = []
 
     def __del__(self):
@@ -272,10 +280,11 @@ class SporeToolCmd(ompx.MPxToolCommand):
         self.color = om.MVectorArray()
         self.point_id = om.MIntArray()
 
-        self.initial_rotation = om.MVectorArray()
-        self.initial_scale = om.MVectorArray()
-        self.initial_offset = om.MDoubleArray()
-        self.initial_id = om.MIntArray()
+        self.initial_rotation = np.empty((0, 3))
+        self.initial_scale = np.empty((0, 3))
+        self.initial_offset = np.empty(0)
+        self.initial_id = np.empty(0, dtype=int)
+        self.initial_visibility = np.empty(0, dtype=int)
         self.spray_coords = []
 
     """ -------------------------------------------------------------------- """
@@ -292,9 +301,6 @@ class SporeToolCmd(ompx.MPxToolCommand):
                 return
 
         self.last_brush_position = b_position
-        position = b_position
-        normal = b_normal
-        tangent = b_tangent
 
         # set number of samples or default to 1 in place mode
         if self.brush_state.settings['mode'] == 'spray': # spray mode
@@ -304,6 +310,8 @@ class SporeToolCmd(ompx.MPxToolCommand):
 
         # set last placed points "cache" and begin to sample
         self.set_cache_length(num_samples)
+        position = np.tile((b_position.x, b_position.y, b_position.z), (num_samples, 1))
+        normal = np.tile((b_normal.x, b_normal.y, b_normal.z), (num_samples, 1))
         for i in xrange(num_samples):
 
             # if in spay mode get random coords on the brush dist or get last values
@@ -319,32 +327,31 @@ class SporeToolCmd(ompx.MPxToolCommand):
                 rotation = om.MQuaternion(angle, b_normal)
                 tangential_vector = b_tangent.rotateBy(rotation)
                 rand_pos =  b_position + tangential_vector * distance
-                position, normal = mesh_utils.get_closest_point_and_normal(rand_pos, self.brush_state.target)
-                tangent = mesh_utils.get_tangent(normal)
-
-            # get point data
-            rotation = self.get_rotation(flag, normal, i)
-            scale = self.get_scale(flag, i)
-            position = self.get_offset(position, normal, flag, i)
-            instance_id = self.get_instance_id(flag, i)
-            # TODO - this is potentially a performance bottleneck on bigger meshes
-            #  u_coord, v_coord = mesh_utils.get_uv_at_point(self.brush_state.target, position)
-            u_coord = 0.0
-            v_coord = 0.0
-            color = om.MVector(0, 0, 0)
-
-            # set internal cached points
-            self.position.set(om.MVector(position), i)
-            self.rotation.set(rotation, i)
-            self.scale.set(scale, i)
-            self.instance_id.set(instance_id, i)
-            self.visibility.set(1, i)
-            self.normal.set(normal, i)
-            self.tangent.set(tangent, i)
-            self.u_coord.set(u_coord, i)
-            self.v_coord.set(v_coord, i)
-            # TODO - not yet implemented
-            self.poly_id.set(0, i)
+                rand_pos, rand_normal = mesh_utils.get_closest_point_and_normal(rand_pos, self.brush_state.target)
+                position[i] = (rand_pos.x, rand_pos.y, rand_pos.z)
+                normal[i] = (rand_normal.x, rand_normal.y, rand_normal.z)
+
+        # get point data for all samples at once
+        u_coord, v_coord, poly_id = self.get_surface_coords(position)
+        rotation = self.get_rotation(flag, normal)
+        scale = self.get_scale(flag, num_samples)
+        instance_id = self.get_instance_id(flag, num_samples)
+        visibility = self.get_visibility(flag, position, scale, instance_id)
+        position = self.get_offset(position, normal, flag)
+        tangent = transform_utils.get_tangent(normal)
+
+        # set internal cached points
+        self.position = instance_data.to_vector_array(position)
+        self.rotation = instance_data.to_vector_array(rotation)
+        self.scale = instance_data.to_vector_array(scale)
+        self.instance_id = instance_data.to_int_array(instance_id)
+        self.visibility = instance_data.to_int_array(visibility)
+        self.normal = instance_data.to_vector_array(normal)
+        self.tangent = instance_data.to_vector_array(tangent)
+        self.u_coord = instance_data.to_double_array(u_coord)
+        self.v_coord = instance_data.to_double_array(v_coord)
+        self.poly_id = instance_data.to_int_array(poly_id)
+        self.color = instance_data.to_vector_array(np.zeros((num_samples, 3)))
 
         # set or append data
         if self.brush_state.shift_mod and flag != SporeToolCmd.k_click:
@@ -390,17 +397,11 @@ class SporeToolCmd(ompx.MPxToolCommand):
         else:
             return
 
-        for i, index in enumerate(neighbour):
-            rotation = self.instance_data.rotation[index]
-
-            # add to undo stack
-            if not self.last_state.has_key(index):
-                self.last_state[index] = om.MVector(rotation.x, rotation.y, rotation.z)
-
-            normal = self.instance_data.normal[index]
-            direction = self.get_alignment(normal)
-            rotation = self.rotate_into(direction, rotation)
-            self.rotation.set(rotation, i)
+        rotation = self.store_undo_vectors(neighbour, self.instance_data.rotation)
+        normal = instance_data.from_vector_array(self.instance_data.normal, neighbour)
+        direction = self.get_alignment(normal)
+        rotation = transform_utils.rotate_into(rotation, direction, self.brush_state.settings['strength'])
+        self.rotation = instance_data.to_vector_array(rotation)
 
         self.instance_data.set_points(neighbour, rotation=self.rotation)
         self.instance_data.set_state()
@@ -412,22 +413,14 @@ class SporeToolCmd(ompx.MPxToolCommand):
         neighbour = self.instance_data.get_closest_points(position, radius, self.brush_state.settings['ids'])
         if neighbour:
             average = self.instance_data.get_rotation_average(neighbour)
-            average = om.MVector(average[0], average[1], average[2])
             self.set_cache_length(len(neighbour))
         else:
             return
 
-        for i, index in enumerate(neighbour):
-            rotation = self.instance_data.rotation[index]
-
-            # add to undo stack
-            if not self.last_state.has_key(index):
-                self.last_state[index] = om.MVector(rotation.x, rotation.y, rotation.z)
-
-            normal = self.instance_data.normal[index]
-            #  direction = self.get_alignment(normal)
-            rotation = self.rotate_into(average, rotation)
-            self.rotation.set(rotation, i)
+        rotation = self.store_undo_vectors(neighbour, self.instance_data.rotation)
+        direction = np.tile(average, (len(neighbour), 1))
+        rotation = transform_utils.rotate_into(rotation, direction, self.brush_state.settings['strength'])
+        self.rotation = instance_data.to_vector_array(rotation)
 
         self.instance_data.set_points(neighbour, rotation=self.rotation)
         self.instance_data.set_state()
@@ -446,19 +439,9 @@ class SporeToolCmd(ompx.MPxToolCommand):
         else:
             return
 
-        for i, index in enumerate(neighbour):
-            rotation = self.instance_data.rotation[index]
-
-            # add to undo stack
-            if not self.last_state.has_key(index):
-                self.last_state[index] = om.MVector(rotation.x, rotation.y, rotation.z)
-
-            normal = self.instance_data.normal[index]
-            direction = self.get_random_vector(normal)
-            #  direction = self.get_alignment(normal)
-            #  rotation = self.rotate_into(average, rotation)
-            rotation = self.randomize_rotation(rotation, self.brush_state.settings['strength'])
-            self.rotation.set(rotation, i)
+        rotation = self.store_undo_vectors(neighbour, self.instance_data.rotation)
+        rotation = transform_utils.randomize_rotation(rotation, self.brush_state.settings['strength'])
+        self.rotation = instance_data.to_vector_array(rotation)
 
         self.instance_data.set_points(neighbour, rotation=self.rotation)
         self.instance_data.set_state()
@@ -731,6 +714,10 @@ class SporeToolCmd(ompx.MPxToolCommand):
         self.instance_data.clean_up()
         self.instance_data.set_state()
 
+        # the removed points must not block the following brush ticks
+        if self.exclusion_index is not None and self.prototype_radii is not None:
+            self.exclusion_index.reset(*self.instance_data.get_footprints(self.prototype_radii))
+
 
     def undo_vector_action(self, attr, undo_command):
         """ undo transformation attributes.
@@ -872,91 +859,33 @@ class SporeToolCmd(ompx.MPxToolCommand):
             return 1
 
     def get_alignment(self, normal):
-        """ get the alignment vector """
+        """ get the alignment vectors
+        :param normal: (n, 3) array of normals
+        :return: (n, 3) array of directions """
 
         if self.brush_state.settings['align_to'] == 'world': # align to world
-            direction = om.MVector(0, 1, 0)
-
-        elif self.brush_state.settings['align_to'] == 'object': # align to obj's local
-            # TODO - get object up vector
-            pass
+            return np.tile(transform_utils.WORLD_UP, (len(normal), 1))
 
         elif self.brush_state.settings['align_to'] == 'stroke'\
         or self.brush_state.meta_mod: # align to stroke
-            direction = om.MVector(self.brush_state.stroke_direction[0],
-                                    self.brush_state.stroke_direction[1],
-                                    self.brush_state.stroke_direction[2])
+            return np.tile(self.brush_state.stroke_direction, (len(normal), 1))
 
-        else:
-            direction = normal
-
-        return direction
-
-    #  def get_random_vector(self, vector, weight):
-    #
-    #      """ randomize the given vector between 0 and 90 degree by the given weight """
-    #
-    #      rando
-
-    def randomize_rotation(self, rotation, random_weight):
-        """ randomize the given rotation values by 10 degrees multiply
-        by the random_weight """
-
-        factor = 5 * random_weight
-        rand_x = np.radians(random.uniform(-factor, factor))
-        rand_y = np.radians(random.uniform(-factor, factor))
-        rand_z = np.radians(random.uniform(-factor, factor))
-
-        util = om.MScriptUtil()
-        util.createFromDouble(rand_x, rand_y, rand_z)
-        rand_rot_ptr = util.asDoublePtr()
-
-        rand_mat = om.MTransformationMatrix()
-        rand_mat.setRotation(rand_rot_ptr, om.MTransformationMatrix.kXYZ)
-
-        util.createFromDouble(np.radians(rotation.x),
-                              np.radians(rotation.y),
-                              np.radians(rotation.z))
-        rot_ptr = util.asDoublePtr()
-
-        rot_mat = om.MTransformationMatrix()
-        rot_mat.setRotation(rot_ptr, om.MTransformationMatrix.kXYZ)
-
-        result_mat = rot_mat.asMatrix() * rand_mat.asMatrix()
-        rotation = om.MTransformationMatrix(result_mat).rotation()
-        return om.MVector(math.degrees(rotation.asEulerRotation().x),
-                        math.degrees(rotation.asEulerRotation().y),
-                        math.degrees(rotation.asEulerRotation().z))
-
-    def rotate_into(self, direction, rotation):
-        """ slerp the given rotation values into the direction given
-        by the brush_state
-        @param direction MVector: the target direction
-        @param rotation MVector: current euler rotation """
-
-        vector_weight = self.brush_state.settings['strength']
-        up_vector = om.MVector(0, 1, 0)
-        local_up = up_vector.rotateBy(om.MEulerRotation(math.radians(rotation.x),
-                                                        math.radians(rotation.y),
-                                                        math.radians(rotation.z)))
-
-        target_rotation = om.MQuaternion(local_up, direction, vector_weight)
-
-        util = om.MScriptUtil()
-        x_rot = np.radians(rotation.x)
-        y_rot = np.radians(rotation.y)
-        z_rot = np.radians(rotation.z)
-        util.createFromDouble(x_rot, y_rot, z_rot)
-        rotation_ptr = util.asDoublePtr()
-        mat = om.MTransformationMatrix()
-        mat.setRotation(rotation_ptr, om.MTransformationMatrix.kXYZ)
-
-        mat = mat.asMatrix() * target_rotation.asMatrix()
-        rotation = om.MTransformationMatrix(mat).rotation()
-
-        return om.MVector(math.degrees(rotation.asEulerRotation().x),
-                        math.degrees(rotation.asEulerRotation().y),
-                        math.degrees(rotation.asEulerRotation().z))
+        elif self.brush_state.settings['align_to'] == 'object': # align to object
+            return np.tile(node_utils.get_world_up(self.brush_state.target), (len(normal), 1))
+
+        return normal
+
+    def store_undo_vectors(self, index, array):
+        """ add the values of the given vector array at the given indices
+        to the undo stack if they are not yet stored
+        :return: (n, 3) array of the current values """
+
+        values = instance_data.from_vector_array(array, index)
+        for i, (x, y, z) in zip(index, values.tolist()):
+            if not self.last_state.has_key(i):
+                self.last_state[i] = om.MVector(x, y, z)
+
+        return values
 
     def set_cache_length(self, length=0):
         """ set the length of the point arrays """
@@ -975,110 +904,134 @@ class SporeToolCmd(ompx.MPxToolCommand):
         self.poly_id.setLength(length)
         self.color.setLength(length)
 
-        self.initial_scale.setLength(length)
-        self.initial_rotation.setLength(length)
-        self.initial_offset.setLength(length)
-        self.initial_id.setLength(length)
+        # initial values are kept when dragging, only resize if needed
+        if len(self.initial_rotation) != length:
+            self.initial_scale = np.resize(self.initial_scale, (length, 3))
+            self.initial_rotation = np.resize(self.initial_rotation, (length, 3))
+            self.initial_offset = np.resize(self.initial_offset, length)
+            self.initial_id = np.resize(self.initial_id, length)
+            self.initial_visibility = np.resize(self.initial_visibility, length)
 
-    def get_rotation(self, flag, normal, index=0):
+    def is_drag_update(self, flag):
+        """ return True if the last placed points should be updated
+        with their initial values instead of generating new ones """
+
+        return self.brush_state.shift_mod and flag != SporeToolCmd.k_click
+
+    def get_rotation(self, flag, normal):
         """ generate new rotation values based on the brush state
         if we are in drag mode we maintain old rotation values and adjust
-        rotation to the new normal. we can use the index arg to set a
-        specific index for the last placed objects """
-
-        dir_vector = self.get_alignment(normal)
-        vector_weight = self.brush_state.settings['strength']
-        world_up = om.MVector(0, 1, 0)
-        rotation = om.MQuaternion(world_up, dir_vector, vector_weight)
+        rotation to the new normal.
+        :param normal: (n, 3) array of normals
+        :return: (n, 3) array of euler rotations """
 
         # when we in drag mode we want to maintain old rotation values
-        if self.brush_state.shift_mod and flag != SporeToolCmd.k_click:
-            initial_rotation = self.initial_rotation[index]
-
         # otherwise we generate new values
-        else:
-            # get random rotation
-            min_rotation = self.brush_state.settings['min_rot']
-            max_rotation = self.brush_state.settings['max_rot']
-            r_x = math.radians(random.uniform(min_rotation[0], max_rotation[0]))
-            r_y = math.radians(random.uniform(min_rotation[1], max_rotation[1]))
-            r_z = math.radians(random.uniform(min_rotation[2], max_rotation[2]))
-            self.initial_rotation.set(om.MVector(r_x, r_y, r_z), index)
-            initial_rotation = self.initial_rotation[index]
-            #  rotation = brush_utils.get_rotation(self.initial_rotation, direction,
-
-        mat = om.MTransformationMatrix()
-
-        util = om.MScriptUtil()
-        util.createFromDouble(initial_rotation.x,
-                              initial_rotation.y,
-                              initial_rotation.z)
-        rotation_ptr = util.asDoublePtr()
-        mat.setRotation(rotation_ptr, om.MTransformationMatrix.kXYZ)
-
-        mat = mat.asMatrix() * rotation.asMatrix()
-        rotation = om.MTransformationMatrix(mat).rotation()
-
-        return om.MVector(math.degrees(rotation.asEulerRotation().x),
-                        math.degrees(rotation.asEulerRotation().y),
-                        math.degrees(rotation.asEulerRotation().z))
-
-    def get_scale(self, flag, index=0):
-        """ get scale values for the currently saved point at the given index """
+        if not self.is_drag_update(flag):
+            self.initial_rotation = transform_utils.random_rotation(len(normal),
+                                                                    self.brush_state.settings['min_rot'],
+                                                                    self.brush_state.settings['max_rot'])
 
-        # when we in drag mode we want to maintain old scale values
-        if self.brush_state.shift_mod and flag != SporeToolCmd.k_click:
-            scale = self.initial_scale[index]
+        direction = self.get_alignment(normal)
+        return transform_utils.get_rotation(direction,
+                                            self.brush_state.settings['strength'],
+                                            self.initial_rotation)
 
-        # otherweise we generate new values
-        else:
-            min_scale = self.brush_state.settings['min_scale']
-            max_scale = self.brush_state.settings['max_scale']
-            uniform = self.brush_state.settings['uni_scale']
-            if uniform:
-                scale_x = scale_y = scale_z = random.uniform(min_scale[0], max_scale[0])
-            else:
-                scale_x = random.uniform(min_scale[0], max_scale[0])
-                scale_y = random.uniform(min_scale[1], max_scale[1])
-                scale_z = random.uniform(min_scale[2], max_scale[2])
+    def get_scale(self, flag, num_points):
+        """ get scale values for the currently saved points
+        :return: (n, 3) array of scale values """
 
-            scale = om.MVector(scale_x, scale_y, scale_z)
-            self.initial_scale.set(scale, index)
+        # when we in drag mode we want to maintain old scale values
+        # otherweise we generate new values
+        if not self.is_drag_update(flag):
+            self.initial_scale = transform_utils.random_scale(num_points,
+                                                              self.brush_state.settings['min_scale'],
+                                                              self.brush_state.settings['max_scale'],
+                                                              self.brush_state.settings['uni_scale'])
 
-        return scale
+        return self.initial_scale
 
-    def get_offset(self, position, normal, flag, index=0):
-        """ offset the given position along the given normal """
+    def get_offset(self, position, normal, flag):
+        """ offset the given positions along the given normals
+        :return: (n, 3) array of positions """
 
-        min_offset = self.brush_state.settings['min_offset']
-        max_offset = self.brush_state.settings['max_offset']
-        if self.brush_state.shift_mod and flag != SporeToolCmd.k_click:
-            initial_offset = self.initial_offset[index]
-        else:
-            initial_offset = random.uniform(min_offset, max_offset)
-            self.initial_offset.set(initial_offset, index)
+        if not self.is_drag_update(flag):
+            self.initial_offset = transform_utils.random_offset(len(position),
+                                                                self.brush_state.settings['min_offset'],
+                                                                self.brush_state.settings['max_offset'])
 
-        return position + normal * initial_offset
+        return transform_utils.apply_offset(position, normal, self.initial_offset)
 
-    def get_instance_id(self, flag, index=0):
-        """ the instance id for the point at the given index """
+    def get_instance_id(self, flag, num_points):
+        """ the instance ids for the currently saved points """
 
         # when we in drag mode we want to maintain old instance id value
-        if self.brush_state.shift_mod and flag != SporeToolCmd.k_click:
-            instance_id = self.initial_id[index]
-
-        else:
-            instance_id = random.choice(self.brush_state.settings['ids'])
-            self.initial_id.set(instance_id, index)
-
-        return instance_id
-
-    def initialize_tool_cmd(self, brush_state, instance_data):
+        if not self.is_drag_update(flag):
+            self.initial_id = np.random.choice(self.brush_state.settings['ids'], num_points)
+
+        return self.initial_id
+
+    def get_visibility(self, flag, position, scale, instance_id):
+        """ hide points that are too close to the points of an exclusion
+        node or whose footprint overlaps the footprint of another instance.
+        visible points are added to the exclusion index so they block the
+        following brush ticks. in drag mode the last visibility is kept and
+        the footprints of the dragged points are moved in the index
+        :return: (n,) array of visibility values """
+
+        if self.is_drag_update(flag):
+            if self.exclusion_index is not None and self.prototype_radii is not None:
+                visible = self.initial_visibility == 1
+                radius = transform_utils.footprint_radius(self.prototype_radii, instance_id, scale)
+                self.exclusion_index.pop(np.count_nonzero(visible))
+                self.exclusion_index.add(position[visible], radius[visible])
+            return self.initial_visibility
+
+        visibility = np.ones(len(position), dtype=int)
+        if self.exclusion_index is not None:
+            radius = np.zeros(len(position))
+            if self.prototype_radii is not None:
+                radius = transform_utils.footprint_radius(self.prototype_radii, instance_id, scale)
+
+                # samples of the same tick must not overlap each other
+                visibility[:] = 0
+                visibility[poisson_utils.resolve_conflicts(position, 2 * radius)] = 1
+
+            visible = (visibility == 1) & self.exclusion_index.mask(position, radius)
+            visibility = visible.astype(int)
+            if self.prototype_radii is not None:
+                self.exclusion_index.add(position[visible], radius[visible])
+
+        self.initial_visibility = visibility
+        return visibility
+
+    def get_surface_coords(self, position):
+        """ get uv coords and poly ids for the given points on the target.
+        the points are located on the triangles of the node's geo cache
+        and the corner uvs are interpolated with the barycentric coords.
+        if the geo cache is not available all values are zero
+        :param position: (n, 3) array of world space positions on the target
+        :return: (n,) u coords, (n,) v coords, (n,) poly ids """
+
+        num_points = len(position)
+        if self.geo_cache is None or self.geo_cache.is_caching\
+        or not len(self.geo_cache):
+            return np.zeros(num_points), np.zeros(num_points), np.zeros(num_points, dtype=int)
+
+        tri_ids, bary = self.geo_cache.get_closest_triangles(position)
+        uvs = self.geo_cache.get_uvs(tri_ids, bary)
+        return uvs[:, 0], uvs[:, 1], self.geo_cache.poly_id[tri_ids]
+
+    def initialize_tool_cmd(self, brush_state, instance_data, geo_cache=None,
+                            exclusion_index=None, prototype_radii=None):
         """ must be called from the context setup method to
         initialize the tool command with the current brush and node state. """
 
         self.brush_state = brush_state
         self.instance_data = instance_data
+        self.geo_cache = geo_cache
+        self.exclusion_index = exclusion_index
+        self.prototype_radii = prototype_radii
 
 
 """ -------------------------------------------------------------------- """
@@ -1097,6 +1050,9 @@ class SporeContext(ompx.MPxContext):
 
         self.state = brush_state.BrushState()
         self.instance_data = None
+        self.geo_cache = None
+        self.exclusion_index = None
+        self.prototype_radii = None
         self.msg_io = message_utils.IOHandler()
         self.canvas = None
         self.sender = Sender()
@@ -1172,8 +1128,25 @@ class SporeContext(ompx.MPxContext):
         obj_handle = om.MObjectHandle(spore_obj)
         spore_locator = sys._global_spore_tracking_dir[obj_handle.hashCode()]
         self.instance_data = spore_locator._state
+        self.geo_cache = spore_locator.geo_cache
         self.state.get_brush_settings()
 
+        # the points of the exclusion nodes and the footprints of the
+        # node's own instances are indexed once per tool setup
+        self.exclusion_index = None
+        self.prototype_radii = None
+        if self.state.settings['mode'] == 'place'\
+        or self.state.settings['mode'] == 'spray':
+            positions, radii = node_utils.get_exclusion_points(node_name)
+            if positions or self.state.settings['use_footprint']:
+                self.exclusion_index = filter_utils.ExclusionIndex(positions, radii)
+
+            # footprints are added on top of the fixed exclusion points so
+            # they can be reset when placed points are undone
+            if self.state.settings['use_footprint']:
+                self.prototype_radii = node_utils.get_prototype_radii(node_name)
+                self.exclusion_index.reset(*self.instance_data.get_footprints(self.prototype_radii))
+
         if self.state.settings['mode'] == 'scale'\
         or self.state.settings['mode'] == 'align'\
         or self.state.settings['mode'] == 'smooth'\
@@ -1449,7 +1422,11 @@ class SporeContext(ompx.MPxContext):
         self.tool_cmd = K_TRACKING_DICTIONARY.get(ompx.asHashable(tool_cmd))
 
         if self.tool_cmd:
-            self.tool_cmd.initialize_tool_cmd(self.state, self.instance_data)
+            self.tool_cmd.initialize_tool_cmd(self.state,
+                                              self.instance_data,
+                                              self.geo_cache,
+                                              self.exclusion_index,
+                                              self.prototype_radii)
         else:
             self.logger.warn('Could not fetch tool command')
 
@@ -11,6 +11,8 @@ import maya.OpenMayaRender as omr
 import node_utils
 import instance_data
 import geo_cache
+import texture_cache
+import ptc_cache
 import progress_bar
 
 
@@ -27,6 +29,7 @@ class SporeNode(ompx.MPxLocatorNode): #Node):
     a_num_brush_samples = om.MObject()
     a_falloff = om.MObject()
     a_min_distance = om.MObject()
+    a_use_footprint = om.MObject()
     a_min_rotation = om.MObject()
     a_max_rotation =  om.MObject()
     a_min_scale = om.MObject()
@@ -50,6 +53,16 @@ class SporeNode(ompx.MPxLocatorNode): #Node):
     a_num_samples = om.MObject()
     a_min_radius = om.MObject()
     a_min_radius_2d = om.MObject()
+    a_class_radius = om.MObject()
+    a_instance_mask = om.MObject()
+    a_udim_start = om.MObject()
+    a_udim_end = om.MObject()
+    a_stratified = om.MObject()
+    a_density_map = om.MObject()
+    # exclusion attributes
+    a_exclusion = om.MObject()
+    a_exclusion_node = om.MObject()
+    a_exclusion_radius = om.MObject()
     # filter attributes
     a_emit_texture  = om.MObject()
     a_min_altitude = om.MObject()
@@ -66,6 +79,7 @@ class SporeNode(ompx.MPxLocatorNode): #Node):
     # count
     a_num_spores = om.MObject()
     a_clear = om.MObject()
+    a_display_fraction = om.MObject()
     a_seed = om.MObject()
     # storage attributes
     a_position = om.MObject()
@@ -80,6 +94,7 @@ class SporeNode(ompx.MPxLocatorNode): #Node):
     a_poly_id = om.MObject()
     a_color = om.MObject()
     a_unique_id = om.MObject()
+    a_display_rank = om.MObject()
 
     context = None
 
@@ -101,6 +116,8 @@ class SporeNode(ompx.MPxLocatorNode): #Node):
         typed_attr_fn = om.MFnTypedAttribute()
         enum_attr_fn = om.MFnEnumAttribute()
         numeric_attr_fn = om.MFnNumericAttribute()
+        message_attr_fn = om.MFnMessageAttribute()
+        compound_attr_fn = om.MFnCompoundAttribute()
         vect_array_attr = om.MFnVectorArrayData()
         int_array_attr = om.MFnIntArrayData()
         double_array_attr = om.MFnDoubleArrayData()
@@ -162,6 +179,13 @@ class SporeNode(ompx.MPxLocatorNode): #Node):
         numeric_attr_fn.setConnectable(False)
         cls.addAttribute(cls.a_min_distance )
 
+        # space instances by the footprint of their prototype
+        cls.a_use_footprint = numeric_attr_fn.create('useFootprint', 'useFootprint', om.MFnNumericData.kBoolean, 0)
+        numeric_attr_fn.setStorable(True)
+        numeric_attr_fn.setKeyable(False)
+        numeric_attr_fn.setConnectable(False)
+        cls.addAttribute(cls.a_use_footprint)
+
         cls.a_uniform_scale = numeric_attr_fn.create('uniformScale', 'uniformScale', om.MFnNumericData.kBoolean, 1)
         numeric_attr_fn.setStorable(True)
         numeric_attr_fn.setKeyable(False)
@@ -296,6 +320,10 @@ class SporeNode(ompx.MPxLocatorNode): #Node):
         enum_attr_fn.addField('jitter grid', 1)
         enum_attr_fn.addField('poisson 3d', 2)
         enum_attr_fn.addField('poisson 2d', 3)
+        enum_attr_fn.addField('sample elimination', 4)
+        enum_attr_fn.addField('halton', 5)
+        enum_attr_fn.addField('blue noise tiles', 6)
+        enum_attr_fn.addField('multi-class poisson', 7)
         enum_attr_fn.setStorable(True)
         enum_attr_fn.setKeyable(False)
         enum_attr_fn.setConnectable(False)
@@ -399,6 +427,40 @@ class SporeNode(ompx.MPxLocatorNode): #Node):
         numeric_attr_fn.setConnectable(False)
         cls.addAttribute(cls.a_min_radius_2d)
 
+        # min distance between points of the same instance id for
+        # multi-class sampling. indexed by instance id, 0 uses minRadius
+        cls.a_class_radius = numeric_attr_fn.create('classRadius', 'classRadius', om.MFnNumericData.kDouble, 0.0)
+        numeric_attr_fn.setMin(0)
+        numeric_attr_fn.setSoftMax(100)
+        numeric_attr_fn.setArray(True)
+        numeric_attr_fn.setStorable(True)
+        numeric_attr_fn.setKeyable(False)
+        numeric_attr_fn.setConnectable(False)
+        cls.addAttribute(cls.a_class_radius)
+
+        # instance ids used by emit. empty uses all instances
+        cls.a_instance_mask = typed_attr_fn.create('instanceMask', 'instanceMask', om.MFnData.kIntArray, int_array_attr.create())
+        typed_attr_fn.setStorable(True)
+        typed_attr_fn.setKeyable(False)
+        typed_attr_fn.setConnectable(False)
+        cls.addAttribute(cls.a_instance_mask)
+
+        cls.a_udim_start = numeric_attr_fn.create('udimStart', 'udimStart', om.MFnNumericData.kInt, 1001)
+        numeric_attr_fn.setMin(1001)
+        numeric_attr_fn.setSoftMax(1100)
+        numeric_attr_fn.setStorable(True)
+        numeric_attr_fn.setKeyable(False)
+        numeric_attr_fn.setConnectable(False)
+        cls.addAttribute(cls.a_udim_start)
+
+        cls.a_udim_end = numeric_attr_fn.create('udimEnd', 'udimEnd', om.MFnNumericData.kInt, 1001)
+        numeric_attr_fn.setMin(1001)
+        numeric_attr_fn.setSoftMax(1100)
+        numeric_attr_fn.setStorable(True)
+        numeric_attr_fn.setKeyable(False)
+        numeric_attr_fn.setConnectable(False)
+        cls.addAttribute(cls.a_udim_end)
+
         cls.a_cell_size = numeric_attr_fn.create('cellSize', 'cellSize', om.MFnNumericData.kDouble , 1.0)
         numeric_attr_fn.setMin(0.001)
         numeric_attr_fn.setSoftMax(100)
@@ -407,6 +469,39 @@ class SporeNode(ompx.MPxLocatorNode): #Node):
         numeric_attr_fn.setConnectable(False)
         cls.addAttribute(cls.a_cell_size)
 
+        cls.a_stratified = numeric_attr_fn.create('stratified', 'stratified', om.MFnNumericData.kBoolean, 0)
+        numeric_attr_fn.setStorable(True)
+        numeric_attr_fn.setKeyable(False)
+        numeric_attr_fn.setConnectable(False)
+        cls.addAttribute(cls.a_stratified)
+
+        cls.a_density_map = enum_attr_fn.create('densityMap', 'densityMap', 0)
+        enum_attr_fn.addField('none', 0)
+        enum_attr_fn.addField('emit texture', 1)
+        enum_attr_fn.addField('vertex color', 2)
+        enum_attr_fn.setStorable(True)
+        enum_attr_fn.setKeyable(False)
+        enum_attr_fn.setConnectable(False)
+        cls.addAttribute(cls.a_density_map)
+
+        # node attributes - exclusion attributes
+        # other spore nodes whose points block sampling and brushing
+        cls.a_exclusion_node = message_attr_fn.create('exclusionNode', 'exclusionNode')
+        message_attr_fn.setStorable(True)
+
+        cls.a_exclusion_radius = numeric_attr_fn.create('exclusionRadius', 'exclusionRadius', om.MFnNumericData.kDouble, 1.0)
+        numeric_attr_fn.setMin(0)
+        numeric_attr_fn.setSoftMax(10)
+        numeric_attr_fn.setStorable(True)
+        numeric_attr_fn.setKeyable(False)
+
+        cls.a_exclusion = compound_attr_fn.create('exclusion', 'exclusion')
+        compound_attr_fn.addChild(cls.a_exclusion_node)
+        compound_attr_fn.addChild(cls.a_exclusion_radius)
+        compound_attr_fn.setArray(True)
+        compound_attr_fn.setStorable(True)
+        cls.addAttribute(cls.a_exclusion)
+
         # node attribute - dummy attributes
         cls.a_geo_cached = numeric_attr_fn.create('geoCached', 'geoCached', om.MFnNumericData.kBoolean, 0)
         numeric_attr_fn.setStorable(False)
@@ -442,6 +537,15 @@ class SporeNode(ompx.MPxLocatorNode): #Node):
         numeric_attr_fn.setConnectable(False)
         cls.addAttribute(cls.a_clear)
 
+        # share of the points passed on to the instancer
+        cls.a_display_fraction = numeric_attr_fn.create('displayFraction', 'displayFraction', om.MFnNumericData.kDouble, 1.0)
+        numeric_attr_fn.setMin(0)
+        numeric_attr_fn.setMax(1)
+        numeric_attr_fn.setStorable(True)
+        numeric_attr_fn.setKeyable(False)
+        numeric_attr_fn.setConnectable(False)
+        cls.addAttribute(cls.a_display_fraction)
+
         cls.a_seed = numeric_attr_fn.create('seed', 'seed', om.MFnNumericData.kInt, -1)
         numeric_attr_fn.setMin(-1)
         numeric_attr_fn.setStorable(True)
@@ -510,8 +614,14 @@ class SporeNode(ompx.MPxLocatorNode): #Node):
         typed_attr_fn.setStorable(True)
         cls.addAttribute(cls.a_unique_id)
 
+        cls.a_display_rank = typed_attr_fn.create('displayRank', 'displayRank', om.MFnData.kDoubleArray, double_array_attr.create())
+        typed_attr_fn.setHidden(True)
+        typed_attr_fn.setStorable(True)
+        cls.addAttribute(cls.a_display_rank)
+
         cls.attributeAffects(cls.a_geo_cached, cls.a_instance_data)
         cls.attributeAffects(cls.a_clear, cls.a_instance_data)
+        cls.attributeAffects(cls.a_display_fraction, cls.a_instance_data)
 
     def __init__(self):
         ompx.MPxLocatorNode.__init__(self)
@@ -530,6 +640,9 @@ class SporeNode(ompx.MPxLocatorNode): #Node):
 
         self._state = None
         self.geo_cache = geo_cache.GeoCache()
+        self.texture_cache = texture_cache.TextureCache()
+        self.ptc_cache = ptc_cache.PtcCache()
+        self.plugs = {}
 
         obj_handle = om.MObjectHandle(self.thisMObject())
         sys._global_spore_tracking_dir[obj_handle.hashCode()] = self
@@ -537,17 +650,37 @@ class SporeNode(ompx.MPxLocatorNode): #Node):
         self.callbacks = om.MCallbackIdArray()
         self.callbacks.append(om.MSceneMessage.addCallback(om.MSceneMessage.kBeforeSave, self.write_points))
         self.callbacks.append(om.MNodeMessage.addNodePreRemovalCallback(self.thisMObject(), self.pre_destructor))
+        self.callbacks.append(om.MNodeMessage.addNodeDirtyPlugCallback(self.thisMObject(), self.in_mesh_dirty))
         #  callback = om.MNodeMessage.addNodePreRemovalCallback(self.thisMObject(), self.event)
         #  self.callbacks.append(om.MDGMessage.addConnectionCallback(self.connection_callback))
         #  self.callbacks.append(om.MDGMessage.addNodeAddedCallback(self.node_added_callback, 'sporeNode'))
         #  self.callbacks.append(om.MDGMessage.addNodeAddedCallback(self.thisMObject(), self.node_added))
 
+    def get_plug(self, name):
+        """ return the plug of the given attribute. plugs are looked up once
+        and cached for the lifetime of the node
+        :param name: the name of the attribute
+        :return: MPlug """
+
+        if name not in self.plugs:
+            node_fn = om.MFnDependencyNode(self.thisMObject())
+            self.plugs[name] = node_fn.findPlug(name)
+        return self.plugs[name]
+
     def pre_destructor(self, *args):
         """ called before node is deleted. used to clean stuff up """
 
+        self.geo_cache.cancel()
+
         for i in xrange(self.callbacks.length()):
             om.MMessage().removeCallback(self.callbacks[i])
 
+    def in_mesh_dirty(self, node, plug, *args):
+        """ mark the geo cache as out of date when the input mesh changes """
+
+        if plug == self.in_mesh:
+            self.geo_cache.dirty = True
+
     def compute(self, plug, data):
 
         this_node = self.thisMObject()
@@ -560,9 +693,10 @@ class SporeNode(ompx.MPxLocatorNode): #Node):
                 self.initialize_state(plug, data)
 
 
-            # cache geometry
+            # cache geometry. a build cancelled by the user is not started
+            # again automatically, the next emit caches the geometry
             is_cached = data.inputValue(self.a_geo_cached).asBool()
-            if not is_cached:
+            if not is_cached and not self.geo_cache.is_caching and not self.geo_cache.cancelled:
 
                 # check if there is another spore node that already has a cache
                 # object for the current inmesh
@@ -574,27 +708,28 @@ class SporeNode(ompx.MPxLocatorNode): #Node):
                     if in_mesh == other_in_mesh and node != self:
                         self.geo_cache = node.geo_cache
 
-                        # check if the cache is still valid
-                        if self.geo_cache.validate_cache():
+                        # the other node is still caching, wait for its result
+                        if self.geo_cache.is_caching:
                             found = True
 
-                        else:
-                            in_mesh = node_utils.get_connected_in_mesh(self.thisMObject(), False)
-                            self.geo_cache.flush_cache()
-                            self.geo_cache.cache_geometry(in_mesh)
+                        # check if the cache is still valid
+                        elif self.geo_cache.validate_cache():
+                            found = True
+                            self.set_geo_cached()
 
                         # if the cache is invalid break, since we need to recache
                         break
 
-                # if no cache was found start creating a new one
+                # if no cache was found start creating a new one.
+                # in interactive sessions the cache is built on a worker
+                # thread so the ui does not freeze on large meshes
                 if not found:
                     in_mesh = node_utils.get_connected_in_mesh(self.thisMObject(), False)
-                    self.geo_cache.cache_geometry(in_mesh)
-
-                # set cached to true
-                node_fn = om.MFnDependencyNode(self.thisMObject())
-                cached_plug = node_fn.findPlug('geoCached')
-                cached_plug.setBool(True)
+                    if om.MGlobal.mayaState() == om.MGlobal.kInteractive:
+                        self.geo_cache.cache_geometry(in_mesh, True, self.set_geo_cached)
+                    else:
+                        self.geo_cache.cache_geometry(in_mesh)
+                        self.set_geo_cached()
 
             is_delete = data.inputValue(self.a_clear).asBool()
             if is_delete:
@@ -604,8 +739,22 @@ class SporeNode(ompx.MPxLocatorNode): #Node):
                 clear_plug = node_fn.findPlug('clear')
                 clear_plug.setBool(False)
 
+            # only pass the first points on to the instancer
+            self._state.display_fraction = data.inputValue(self.a_display_fraction).asDouble()
+            data.outputValue(self.a_instance_data).setMObject(self._state.get_display_object())
+
             data.setClean(self.a_instance_data)
 
+    def set_geo_cached(self):
+        """ mark the geometry of the node as cached """
+
+        if not om.MObjectHandle(self.thisMObject()).isValid():
+            return
+
+        node_fn = om.MFnDependencyNode(self.thisMObject())
+        cached_plug = node_fn.findPlug('geoCached')
+        cached_plug.setBool(True)
+
     def initialize_state(self, plug, data):
         """ initialize the instance data attribute by
         creating all arrays needed. read data from the storage attributes
@@ -628,6 +777,7 @@ class SporeNode(ompx.MPxLocatorNode): #Node):
         poly_id = array_attr_fn.intArray('poly_id')
         color = array_attr_fn.vectorArray('color')
         unique_id = array_attr_fn.intArray('unique_id')
+        display_rank = array_attr_fn.doubleArray('display_rank')
 
         # load points from stored attributes oand copy to instance data attr
         # this should happen only once when the scene is loaded
@@ -686,6 +836,10 @@ class SporeNode(ompx.MPxLocatorNode): #Node):
             int_array_fn.setObject(unique_id_data)
             int_array_fn.copyTo(unique_id)
 
+            display_rank_data = data.outputValue(self.a_display_rank).data()
+            double_array_fn.setObject(display_rank_data)
+            double_array_fn.copyTo(display_rank)
+
             # set points cached to true
             is_point_cached_handle = data.outputValue(self.a_points_cached)
             is_point_cached_handle.setBool(True)
@@ -703,8 +857,14 @@ class SporeNode(ompx.MPxLocatorNode): #Node):
 
         #  state = instance_data.SporeState(self.thisMObject())
         node_fn = om.MFnDependencyNode(self.thisMObject())
-        data_plug = node_fn.findPlug('instanceData')
-        data_obj = data_plug.asMObject()
+
+        # the plug holds the display object if the display fraction is
+        # below 1. store the full data object instead
+        if self._state:
+            data_obj = self._state.get_data_object()
+        else:
+            data_plug = node_fn.findPlug('instanceData')
+            data_obj = data_plug.asMObject()
 
         array_attr_fn = om.MFnArrayAttrsData(data_obj)
         vect_array_fn = om.MFnVectorArrayData()
@@ -776,4 +936,9 @@ class SporeNode(ompx.MPxLocatorNode): #Node):
         unique_id_plug = node_fn.findPlug('uniqueId')
         unique_id_plug.setMObject(unique_id_obj)
 
+        display_rank = array_attr_fn.doubleArray('display_rank')
+        display_rank_obj = double_array_fn.create(display_rank)
+        display_rank_plug = node_fn.findPlug('displayRank')
+        display_rank_plug.setMObject(display_rank_obj)
+
 
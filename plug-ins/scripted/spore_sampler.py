@@ -1,17 +1,29 @@
+import os
 import sys
 import time
+import tempfile
 import math
 import random
 
+import numpy as np
+
 import maya.cmds as cmds
 import maya.OpenMaya as om
 import maya.OpenMayaRender as omr
 import maya.OpenMayaMPx as ompx
 
 import instance_data
+import texture_cache
 import node_utils
+import sample_utils
+import poisson_utils
+import parallel_utils
+import filter_utils
+import estimate_utils
+import transform_utils
 import mesh_utils
 import render_utils
+import progress_bar
 import brush_state
 import logging_util
 #  reload(instance_data)
@@ -26,62 +38,130 @@ K_CELL_SIZE_FLAG = '-c'
 K_CELL_SIZE_LONG_FLAG = '-cellSize'
 K_MIN_DISTANCE_FLAG = '-r'
 K_MIN_DISTANCE_LONG_FLAG = '-minimumRadius'
+K_ESTIMATE_FLAG = '-e'
+K_ESTIMATE_LONG_FLAG = '-estimate'
+K_FACE_IDS_FLAG = '-fi'
+K_FACE_IDS_LONG_FLAG = '-faceIds'
+K_BOUNDING_BOX_FLAG = '-bb'
+K_BOUNDING_BOX_LONG_FLAG = '-boundingBox'
+K_SPHERE_FLAG = '-sp'
+K_SPHERE_LONG_FLAG = '-sphere'
+K_REPLACE_FLAG = '-rp'
+K_REPLACE_LONG_FLAG = '-replace'
+K_REFILTER_FLAG = '-rf'
+K_REFILTER_LONG_FLAG = '-refilter'
+
+K_EMIT_TYPES = {0: 'random',
+                1: 'jitter',
+                2: 'poisson3d',
+                3: 'poisson2d',
+                4: 'elimination',
+                5: 'halton',
+                6: 'tiles',
+                7: 'multiclass'}
+
+# emit types whose points are emitted in progressive order. every prefix
+# of the emitted points is a well distributed subset
+K_PROGRESSIVE_TYPES = (2, 3, 4, 6, 7)
+
+# number of points filtered and appended per batch during emit and the
+# number of batches between two viewport refreshes
+K_EMIT_BATCH_SIZE = 50000
+K_REFRESH_INTERVAL = 4
+
+# width and height of baked emit textures
+K_TEXTURE_RESOLUTION = 1024
+
+# number of random samples used to measure the filters when estimating
+K_PILOT_SIZE = 10000
+
+# number of random keys kept per candidate, one for each of the texture,
+# altitude and slope filter
+K_NUM_FILTER_KEYS = 3
 
 class Points(object):
     """ conatainer for sampled points.
-    holds position, normal, polyid and uv coords """
+    holds position, normal, polyid and uv coords as numpy arrays.
+    points sampled on the geo cache also keep the triangle id and the
+    barycentric coordinates they were sampled with. points sampled per
+    instance class keep their instance id, all others hold -1.
+    the rank orders the points for the node's display fraction """
 
     def __init__(self):
 
-        self.position = om.MPointArray()
-        self.normal = om.MVectorArray()
-        self.poly_id = om.MIntArray()
-        self.u_coord = [] # om.MDoubleArray()
-        self.v_coord = [] # om.MDoubleArray()
+        self.set_length(0)
 
     def set_length(self, length):
         """ set length for the point container """
 
-        self.position.setLength(length)
-        self.normal.setLength(length)
-        self.poly_id.setLength(length)
-        self.u_coord = [None] * length
-        self.v_coord = [None] * length
+        self.position = np.zeros((length, 3))
+        self.normal = np.zeros((length, 3))
+        self.poly_id = np.zeros(length, dtype=int)
+        self.u_coord = np.zeros(length)
+        self.v_coord = np.zeros(length)
+        self.tri_id = np.full(length, -1, dtype=int)
+        self.barycentric = np.zeros((length, 2))
+        self.instance_id = np.full(length, -1, dtype=int)
+        self.rank = np.zeros(length)
 
     def set(self, index, position, normal, poly_id, u_coord=None, v_coord=None):
         """ set data for the given index """
 
-        self.position.set(position, index)
-        self.normal.set(normal, index)
-        self.poly_id.set(poly_id, index)
+        self.position[index] = position
+        self.normal[index] = normal
+        self.poly_id[index] = poly_id
         if u_coord:
             self.u_coord[index] = u_coord
         if v_coord:
             self.v_coord[index] = v_coord
 
-    def remove(self, index):
-        self.position.remove(index)
-        self.normal.remove(index)
-        self.poly_id.remove(index)
-        self.u_coord.pop(index)
-        self.v_coord.pop(index)
+    def set_arrays(self, position, normal, poly_id, tri_id=None, barycentric=None):
+        """ replace the content of the container with the given arrays """
+
+        self.set_length(len(position))
+        self.position[:] = position
+        self.normal[:] = normal
+        self.poly_id[:] = poly_id
+        if tri_id is not None:
+            self.tri_id[:] = tri_id
+        if barycentric is not None:
+            self.barycentric[:] = barycentric
+
+    def subset(self, ids):
+        """ return a new container holding only the given indices """
+
+        points = Points()
+        points.position = self.position[ids]
+        points.normal = self.normal[ids]
+        points.poly_id = self.poly_id[ids]
+        points.u_coord = self.u_coord[ids]
+        points.v_coord = self.v_coord[ids]
+        points.tri_id = self.tri_id[ids]
+        points.barycentric = self.barycentric[ids]
+        points.instance_id = self.instance_id[ids]
+        points.rank = self.rank[ids]
+        return points
+
+    def remove(self, ids):
+        """ remove the point at the given index or list of indices """
+
+        keep = np.ones(len(self), dtype=bool)
+        keep[ids] = False
+        points = self.subset(keep)
+        self.__dict__.update(points.__dict__)
 
     def __iter__(self):
         """ iterate overer the sampled points """
 
-        for i in xrange(self.position.length()):
-            yield ((self.position[i].x, # position
-                    self.position[i].y,
-                    self.position[i].z),
-                   (self.normal[i].x, # normal
-                    self.normal[i].y,
-                    self.normal[i].z),
-                   self.poly_id[i], # poly id
-                   self.u_coord[i], # u coord
-                   self.v_coord[i]) # v coord
+        for data in zip(map(tuple, self.position.tolist()), # position
+                        map(tuple, self.normal.tolist()), # normal
+                        self.poly_id.tolist(), # poly id
+                        self.u_coord.tolist(), # u coord
+                        self.v_coord.tolist()): # v coord
+            yield data
 
     def __len__(self):
-        return self.position.length()
+        return len(self.position)
 
 
 # command
@@ -91,12 +171,10 @@ class SporeSampler(ompx.MPxCommand):
     def __init__(self):
         ompx.MPxCommand.__init__(self)
         self.target = None
-        self.settings = None
+        self.spore_locator = None
 
-        self.sample_type = None
-        self.num_samples = None
-        self.cell_size = None
-        self.min_distance = None
+        # settings given as command flags. they override the node's settings
+        self.overrides = {}
 
         self.logger = logging_util.SporeLogger(__name__)
 
@@ -106,8 +184,13 @@ class SporeSampler(ompx.MPxCommand):
         self.use_tex = None
         self.num_samples = None
         self.cell_size = None
+        self.stratified = None
+        self.density_map = None
+        self.use_footprint = None
         self.min_radius = None
         self.min_radius_2d = None
+        self.udim_start = None
+        self.udim_end = None
         self.align_modes = None
         self.align_id = None
         self.strength = None
@@ -126,717 +209,1102 @@ class SporeSampler(ompx.MPxCommand):
         self.max_slope = None
         self.slope_fuzz = None
         self.ids = None
+        self.transforms = None
+        self.emitted = []
+        self.estimate = False
+
+        # region attributes
+        self.region_faces = None
+        self.region_box = None
+        self.region_sphere = None
+        self.region_ids = None
+        self.replace = False
+        self.replaced = []
+
+        # refilter attributes
+        self.refilter = False
+        self.old_mask = None
+        self.new_mask = None
+
+        # points of other spore nodes blocking the sampled points
+        self.exclusion_index = None
 
     def doIt(self, args):
 
         self.parse_args(args)
-        self.get_settings()
 
         # check if we can find a geo cache on the node we operate on
         # else build a new one
         obj_handle = om.MObjectHandle(self.target)
         if hasattr(sys, '_global_spore_tracking_dir'):
             if sys._global_spore_tracking_dir.has_key(obj_handle.hashCode()):
-                spore_locator = sys._global_spore_tracking_dir[obj_handle.hashCode()]
-                self.geo_cache = spore_locator.geo_cache
-                self.instance_data = spore_locator._state
+                self.spore_locator = sys._global_spore_tracking_dir[obj_handle.hashCode()]
+                self.geo_cache = self.spore_locator.geo_cache
+                self.texture_cache = self.spore_locator.texture_cache
+                self.instance_data = self.spore_locator._state
+                self.ptc_cache = self.spore_locator.ptc_cache
             else:
                 raise RuntimeError('Could not link to spore node')
         else:
             raise RuntimeError('There is no sporeNode in the scene')
 
-        self.initialize_sampling()
-        self.initialize_filtering()
+        self.get_settings()
+
+        # estimates are requested live from the ui. they never wait for,
+        # validate or rebuild the geo cache and are not available while it
+        # is built in the background or out of date
+        if self.estimate and (self.geo_cache.is_caching or self.geo_cache.dirty):
+            return
+        self.geo_cache.wait()
+
+        if self.refilter:
+            self.setResult(self.refilter_candidates())
+            return
+
+        self.initialize_region()
+
+        if self.estimate:
+            self.setResult(instance_data.to_double_array(self.estimate_emit()))
+            return
+
+        if self.replace:
+            self.hide_region()
 
-        self.redoIt()
+        self.initialize_sampling()
+        self.emit()
 
     def redoIt(self):
 
-        self.append_points()
+        if self.refilter:
+            if self.new_mask is not None:
+                self.publish(self.new_mask)
+            return
+
+        # hide the replaced points again and re-append the batches that
+        # passed the filters during emit
+        self.set_visibility(self.replaced, 0)
+        old_len = len(self.instance_data)
+        for batch, transforms in self.emitted:
+            self.point_data = batch
+            self.append_points(transforms)
+
+        self.instance_data.set_state()
+        self.undo_range = (old_len, len(self.instance_data))
 
         #  ompx.MPxCommand.clearResult()
         #  ompx.MPxCommand.setResult(['foo', 'bar', 1, 2,])
 
     def undoIt(self):
-        visibility = om.MIntArray()
-        for i in range(*self.undo_range):
-            self.instance_data.visibility.set(0, i)
-            #  visibility.append(0)
-
-        self.instance_data.clean_up()
+        if self.refilter:
+            if self.old_mask is not None:
+                self.publish(self.old_mask)
+            return
+
+        # only remove the points of this command. clean_up would also drop
+        # points hidden by earlier commands and shift their indices
+        self.instance_data.truncate(self.undo_range[0])
+        self.set_visibility(self.replaced, 1)
         self.instance_data.set_state()
 
-
-
     def isUndoable(self):
-        return True
+        return not self.estimate
 
     def initialize_sampling(self):
         self.point_data = Points()
+        self.transforms = None
+
+        if self.region_ids is not None and not len(self.region_ids):
+            self.logger.warn('No triangles found in the given region')
+            return
+
+        # the number of samples is relative to the entire target
+        num_samples = self.get_region_samples(self.num_samples)
 
         # choose sample operation
         if self.mode == 0: #'random':
-            self.random_sampling(self.num_samples)
+            if self.density_map:
+                self.density_sampling(num_samples)
+            else:
+                self.random_sampling(num_samples)
 
         elif self.mode == 1: #'jitter':
-            self.random_sampling(self.num_samples)
-            grid_partition = self.voxelize(self.cell_size)
-            valid_points = self.grid_sampling(grid_partition)
+            if self.stratified:
+                self.stratified_sampling(self.cell_size)
+            else:
+                self.random_sampling(num_samples)
+                valid_points = self.grid_sampling(self.cell_size)
+                self.point_data = self.point_data.subset(valid_points)
 
         elif self.mode == 2: #'poisson3d':
-            self.random_sampling(self.num_samples)
-            self.cell_size = self.min_radius / math.sqrt(3)
-            grid_partition = self.voxelize(self.cell_size)
-            valid_points = self.disk_sampling_3d(self.min_radius, grid_partition, self.cell_size)
+            self.disk_sampling_3d(self.min_radius)
 
-        elif self.mode == 3: #'poisson2d':
-            self.geo_cache.create_uv_lookup()
-            self.disk_sampling_2d(self.min_radius_2d)
-
-        # get sampled points from disk or grid sampling
-        if self.mode == 1 or self.mode == 2:
-            point_data = Points()
-            point_data.set_length(len(valid_points))
-            for i, index in enumerate(valid_points):
-                point_data.set(i,
-                               self.point_data.position[index],
-                               self.point_data.normal[index],
-                               self.point_data.poly_id[index],
-                               self.point_data.u_coord[index],
-                               self.point_data.v_coord[index])
-
-            self.point_data = point_data
+        elif self.mode == 4: #'elimination':
+            self.elimination_sampling(num_samples)
 
-    def initialize_filtering(self):
-        # texture filter
-        if self.use_tex:
-            try:
-                texture = cmds.listConnections('{}.emitTexture'.format(self.node_name))[0]
-            except RuntimeError:
-                texture = None
+        elif self.mode == 5: #'halton':
+            if self.density_map:
+                self.density_sampling(num_samples)
+            else:
+                self.halton_sampling(num_samples)
 
-            if texture:
-                self.evaluate_uvs()
-                self.texture_filter(texture, 0) # TODO - Filter size
+        elif self.mode == 6: #'tiles':
+            self.tile_sampling(self.min_radius)
 
-        # altitude filter
-        if self.min_altitude != 0 or self.max_altitude != 1:
-            self.altitude_filter(self.min_altitude, self.max_altitude, self.min_altitude_fuzz, self.max_altitude_fuzz)
+        elif self.mode == 3: #'poisson2d':
+            self.disk_sampling_2d(self.min_radius_2d, self.udim_start, self.udim_end)
 
-        # slope filter
-        if self.min_slope != 0 or self.max_slope != 180:
-            self.slope_filter(self.min_slope, self.max_slope, self.slope_fuzz)
+        elif self.mode == 7: #'multiclass':
+            self.multi_class_sampling(self.min_radius)
 
-    def append_points(self):
+        # triangles may only partially overlap the region
+        if self.region_ids is not None:
+            valid_points = self.in_region(self.point_data.position, self.point_data.poly_id)
+            self.point_data = self.point_data.subset(valid_points)
 
-        # get final rotation, scale and position values
-        # append the sampled points to the instance data object
-        old_len = len(self.instance_data)
-        self.instance_data.set_length(old_len + len(self.point_data))
-        for i, (position, normal, poly_id, u_coord, v_coord) in enumerate(self.point_data):
-            position = om.MPoint(position[0], position[1], position[2])
-            normal = om.MVector(normal[0], normal[1], normal[2])
-            direction = self.get_alignment(self.align_modes[self.align_id], normal)
-            rotation = self.get_rotation(direction, self.strength, self.min_rot, self.max_rot)
-            scale = self.get_scale(self.min_scale, self.max_scale, self.uni_scale)
-            position = self.get_offset(position, self.min_offset, self.max_offset, normal)
-            tangent = mesh_utils.get_tangent(normal)
-            instance_id = random.choice(self.ids)
-            index = old_len + i
-
-            if not u_coord:
-                u_coord = 0
-            if not v_coord:
-                v_coord = 0
-
-            # set points
-            self.instance_data.set_point(index,
-                                    om.MVector(position),
-                                    scale,
-                                    rotation,
-                                    instance_id,
-                                    1,
-                                    normal,
-                                    tangent,
-                                    u_coord,
-                                    v_coord,
-                                    poly_id,
-                                    om.MVector(0, 0, 0))
+        if self.use_footprint and len(self.point_data):
+            self.resolve_footprints()
 
-        self.instance_data.set_state()
+        # the halton sequence is already spread over the mesh and keeps its order
+        if self.mode in K_PROGRESSIVE_TYPES or (self.mode == 1 and self.stratified):
+            self.order_progressive()
+        elif self.mode != 5:
+            self.order_random()
 
-        self.undo_range = (old_len, len(self.instance_data))
+        # rank the points by their position in the emit. the node only
+        # displays points whose rank does not exceed its display fraction
+        num_points = len(self.point_data)
+        self.point_data.rank = np.arange(1, num_points + 1) / float(max(num_points, 1))
 
-        #  t_result = time.time() - t1
-        #  self.logger.debug('Sampling {} points in self.mode {} took {}s.'.format(i+1, self.mode, t_result))
+    def initialize_filtering(self):
+        """ filter the sampled points with the node's filter settings and
+        remove all rejected points in one go """
 
+        # uvs are interpolated for all points, not only for the texture filter
+        self.evaluate_uvs()
 
-    def get_settings(self):
-        """ get emit attributes from node """
+        valid_points = self.get_filter_mask(self.point_data)
+        self.point_data = self.point_data.subset(valid_points)
 
-        # get sample settings from the spore node
-        # shouldn use maya commands here but i was lazy
-        self.node_name = om.MFnDependencyNode(self.target).name()
-        self.mode = cmds.getAttr('{}.emitType'.format(self.node_name))
-        self.use_tex = cmds.getAttr('{}.emitFromTexture'.format(self.node_name))
-        self.num_samples = cmds.getAttr('{}.numSamples'.format(self.node_name))
-        self.cell_size = cmds.getAttr('{}.cellSize'.format(self.node_name))
-        self.min_radius = cmds.getAttr('{}.minRadius'.format(self.node_name))
-        self.min_radius_2d = cmds.getAttr('{}.minRadius2d'.format(self.node_name))
-        self.align_modes = ['normal', 'world', 'object', 'stroke']
-        self.align_id = cmds.getAttr('{}.alignTo'.format(self.node_name))
-        self.strength = cmds.getAttr('{}.strength'.format(self.node_name))
-        self.min_rot = cmds.getAttr('{}.minRotation'.format(self.node_name))[0]
-        self.max_rot = cmds.getAttr('{}.maxRotation'.format(self.node_name))[0]
-        self.uni_scale = cmds.getAttr('{}.uniformScale'.format(self.node_name))
-        self.min_scale = cmds.getAttr('{}.minScale'.format(self.node_name))[0]
-        self.max_scale = cmds.getAttr('{}.maxScale'.format(self.node_name))[0]
-        self.min_offset = cmds.getAttr('{}.minOffset'.format(self.node_name))
-        self.max_offset = cmds.getAttr('{}.maxOffset'.format(self.node_name))
-        self.min_altitude = cmds.getAttr('{}.minAltitude'.format(self.node_name))
-        self.max_altitude = cmds.getAttr('{}.maxAltitude'.format(self.node_name))
-        self.min_altitude_fuzz = cmds.getAttr('{}.minAltitudeFuzz'.format(self.node_name))
-        self.max_altitude_fuzz = cmds.getAttr('{}.maxAltitudeFuzz'.format(self.node_name))
-        self.min_slope = cmds.getAttr('{}.minSlope'.format(self.node_name))
-        self.max_slope = cmds.getAttr('{}.maxSlope'.format(self.node_name))
-        self.slope_fuzz = cmds.getAttr('{}.slopeFuzz'.format(self.node_name))
-        sel = cmds.textScrollList('instanceList', q=True, si=True)
-        seed = cmds.getAttr('{}.seed'.format(self.node_name))
-        if sel:
-            object_index = [int(s.split(' ')[0].strip('[]:')) for s in sel]
+    def get_filter_mask(self, points, keys=None):
+        """ build the filter pipeline from the node's filter settings
+        :param points: container holding position, normal and uv arrays
+        :param keys: optional (n, 3) array of random keys for the texture,
+                     altitude and slope filter. drawn from the rng if None
+        :return: (n,) boolean keep-mask """
+
+        if keys is None:
+            keys = [None] * K_NUM_FILTER_KEYS
         else:
-            elements = cmds.textScrollList('instanceList', q=True, ai=True)
-            if not elements:
-                raise RuntimeError('No instance geometry selected')
+            keys = keys.T
 
-            object_index = [int(e.split(' ')[0].strip('[]:')) for e in elements]
-        self.ids = object_index
+        pipeline = filter_utils.FilterPipeline()
 
-        # set the random seed and initialize the Points object
-        self.set_seed(seed)
+        # texture filter. skipped if the texture already drove the sampling
+        texture_sampled = self.density_map == 1 and self.mode in (0, 5)
+        if self.use_tex and not texture_sampled:
+            texture = self.get_emit_texture()
+            if texture:
+                pipeline.add(lambda points: self.texture_filter(points, texture, 0, keys[0])) # TODO - Filter size
 
-    def set_seed(self, seed):
-        """ set the random seed for sampling. if the given seed is -1
-        the system time will be used
-        :param seed: the seed for the random function
-        :return: """
-        if seed == -1:
-            random.seed(None)
-        else:
-            random.seed(seed)
+        # altitude filter
+        if self.min_altitude != 0 or self.max_altitude != 1:
+            pipeline.add(lambda points: self.altitude_filter(points,
+                                                             self.min_altitude,
+                                                             self.max_altitude,
+                                                             self.min_altitude_fuzz,
+                                                             self.max_altitude_fuzz,
+                                                             keys[1]))
 
-    """ ---------------------------------------------------------------- """
-    """ random sampler """
-    """ ---------------------------------------------------------------- """
+        # slope filter
+        if self.min_slope != 0 or self.max_slope != 180:
+            pipeline.add(lambda points: self.slope_filter(points, self.min_slope, self.max_slope, self.slope_fuzz, keys[2]))
+
+        # exclusion filter
+        exclusion_index = self.get_exclusion_index()
+        if len(exclusion_index):
+            pipeline.add(lambda points: exclusion_index.mask(points.position))
+
+        return pipeline.evaluate(points)
+
+    def emit(self):
+        """ filter and append the sampled points in batches.
+        the viewport is refreshed every few batches so large emits give
+        visual feedback. in interactive mode the emit can be interrupted
+        with esc. points emitted so far are kept, or removed again if the
+        ROLLBACK_CANCELLED_EMIT pref is set.
+        all candidates are kept in the ptc cache together with their
+        filter keys and transforms, so the filters can be re-tuned
+        without sampling again """
+
+        samples = self.point_data
+        old_len = len(self.instance_data)
+        self.emitted = []
+        self.ptc_cache.flush_cache()
+        masks = []
 
-    def random_sampling(self, num_points):
-        """ sample a given number of points on the previously cached triangle
-        mesh. note: evaluating uvs on high poly meshes may take a long time """
+        progress = None
+        if om.MGlobal.mayaState() == om.MGlobal.kInteractive:
+            progress = progress_bar.ProgressBar('Emitting...', end=max(len(samples), 1), interruptable=True)
+            progress.run()
 
-        if not self.geo_cache.validate_cache():
-            in_mesh = node_utils.get_connected_in_mesh(self.target, False)
-            self.geo_cache.cache_geometry(in_mesh)
+        interrupted = False
+        try:
+            for i, start in enumerate(range(0, len(samples), K_EMIT_BATCH_SIZE)):
+                end = min(start + K_EMIT_BATCH_SIZE, len(samples))
+                batch = samples.subset(slice(start, end))
+                self.point_data = batch
+                self.evaluate_uvs()
 
-        self.point_data.set_length(num_points)
-        [self.sample_triangle(random.choice(self.geo_cache.weighted_ids), i) for i in xrange(num_points)]
+                keys = self.rng.random_sample((len(batch), K_NUM_FILTER_KEYS))
+                if self.transforms is None:
+                    transforms = self.get_transforms()
+                else:
+                    transforms = [transform[start:end] for transform in self.transforms]
+                valid_points = self.get_filter_mask(batch, keys)
+                self.ptc_cache.append(batch, keys, transforms)
+                masks.append(valid_points)
+
+                self.point_data = batch.subset(valid_points)
+                transforms = [transform[valid_points] for transform in transforms]
+                self.append_points(transforms)
+                self.emitted.append((self.point_data, transforms))
+
+                if (i + 1) % K_REFRESH_INTERVAL == 0:
+                    self.instance_data.set_state()
+
+                if progress:
+                    progress.set_progress(end)
+                    if progress.interrupted():
+                        interrupted = True
+                        break
+        finally:
+            if progress:
+                progress.stop()
 
-    def sample_triangle(self,triangle_id, point_id):
-        """ sample a random point on a the given triangle """
+        self.instance_data.set_state()
+        self.undo_range = (old_len, len(self.instance_data))
 
-        r = random.random()
-        s = random.random()
+        self.ptc_cache.lock()
+        self.ptc_cache.set_published(np.concatenate(masks or [np.empty(0, dtype=bool)]), old_len)
+
+        if interrupted:
+            self.ptc_cache.flush_cache()
+            self.logger.info('Emit interrupted after {} points'.format(self.undo_range[1] - old_len))
+            if sys._global_spore_dispatcher.spore_globals['ROLLBACK_CANCELLED_EMIT']:
+                self.undoIt()
+                self.emitted = []
+                self.replaced = []
+                self.undo_range = (old_len, old_len)
+
+    def estimate_emit(self):
+        """ predict the outcome of the current emit settings without
+        emitting. the number of candidates follows from the surface area,
+        the pass rate of the filters and the time per sample are measured
+        on a small pilot set of random samples
+        :return: expected count, lower and upper bound of the 95%
+                 confidence interval, peak memory in bytes and runtime
+                 in seconds """
+
+        self.validate_geo_cache()
+
+        mode = K_EMIT_TYPES[self.mode]
+        if mode == 'jitter' and self.stratified:
+            mode = 'stratified'
+
+        if mode == 'poisson2d':
+            area = self.geo_cache.get_uv_area(self.udim_start, self.udim_end, self.region_ids)
+            radius = self.min_radius_2d
+        else:
+            area = self.geo_cache.get_surface_area(ids=self.region_ids)
+            radius = self.min_radius
 
-        if r + s >= 1:
-            r = 1 - r
-            s = 1 - s
+        class_radius = None
+        if mode == 'multiclass':
+            class_radius = self.get_class_radii()
 
-        r = om.MScriptUtil(r).asFloat()
-        s = om.MScriptUtil(s).asFloat()
+        num_drawn, num_candidates = estimate_utils.candidate_count(mode,
+                                                                   area,
+                                                                   self.get_region_samples(self.num_samples),
+                                                                   self.cell_size,
+                                                                   radius,
+                                                                   class_radius=class_radius)
 
-        r = self.geo_cache.AB[triangle_id] * r
-        s = self.geo_cache.AC[triangle_id] * s
+        self.point_data = Points()
+        start = time.time()
+        self.random_sampling(K_PILOT_SIZE)
+        sample_time = (time.time() - start) / K_PILOT_SIZE
 
-        p = om.MPoint(r + s + om.MVector(self.geo_cache.p0[triangle_id]))
-        u = 0
-        v = 0
+        start = time.time()
+        self.initialize_filtering()
+        filter_time = (time.time() - start) / K_PILOT_SIZE
+        num_kept = len(self.point_data)
 
-        self.point_data.set(point_id, p, self.geo_cache.normals[triangle_id],
-                            self.geo_cache.poly_id[triangle_id], u, v)
+        start = time.time()
+        self.get_transforms()
+        append_time = (time.time() - start) / max(num_kept, 1)
 
-    """ ---------------------------------------------------------------- """
-    """ grid sampling """
-    """ ---------------------------------------------------------------- """
+        count, low, high = estimate_utils.expected_count(num_candidates, num_kept, K_PILOT_SIZE)
+        memory = estimate_utils.peak_memory(num_drawn, count)
+        seconds = estimate_utils.runtime(mode, num_drawn, num_candidates, count,
+                                         sample_time, filter_time, append_time)
 
-    def grid_sampling(self, grid_partition):
-        """ randomly choose one point from each grid cell and
-        return a list of ids that associate a point in the point_data obj """
+        self.logger.debug('Estimated {} ({} - {}) points, {} bytes, {}s'.format(count, low, high, memory, seconds))
+        return [count, low, high, memory, seconds]
 
-        #  point_data = Points()
-        #  point_data.set_length(len(grid_partition))
+    def append_points(self, transforms=None):
+        """ append the sampled points to the instance data object
+        :param transforms: optional transforms as returned by get_transforms.
+                           drawn for the sampled points if None """
 
-        ids = []
-        for key, val in grid_partition.iteritems():
-            ids.append(random.choice(val))
+        num_points = len(self.point_data)
+        if transforms is None:
+            transforms = self.get_transforms()
+        position, scale, rotation, normal, tangent, instance_id = transforms
 
-        return sorted(ids)
+        old_len = len(self.instance_data)
+        self.instance_data.set_length(old_len + num_points)
+        self.instance_data.set_points(range(old_len, old_len + num_points),
+                                      instance_data.to_vector_array(position),
+                                      instance_data.to_vector_array(scale),
+                                      instance_data.to_vector_array(rotation),
+                                      instance_data.to_int_array(instance_id),
+                                      instance_data.to_int_array(np.ones(num_points)),
+                                      instance_data.to_vector_array(normal),
+                                      instance_data.to_vector_array(tangent),
+                                      instance_data.to_double_array(self.point_data.u_coord),
+                                      instance_data.to_double_array(self.point_data.v_coord),
+                                      instance_data.to_int_array(self.point_data.poly_id),
+                                      instance_data.to_vector_array(np.zeros((num_points, 3))),
+                                      instance_data.to_double_array(self.point_data.rank))
+
+    def get_transforms(self):
+        """ get final position, scale, rotation, normal, tangent and
+        instance id values for all sampled points at once """
+
+        num_points = len(self.point_data)
+        position = self.point_data.position
+        normal = self.point_data.normal
+
+        direction = self.get_alignment(self.align_modes[self.align_id], normal)
+        initial_rotation = transform_utils.random_rotation(num_points, self.min_rot, self.max_rot, self.rng)
+        rotation = transform_utils.get_rotation(direction, self.strength, initial_rotation)
+        scale = transform_utils.random_scale(num_points, self.min_scale, self.max_scale, self.uni_scale, self.rng)
+        if self.min_offset != 0 or self.max_offset != 0:
+            offset = transform_utils.random_offset(num_points, self.min_offset, self.max_offset, self.rng)
+            position = transform_utils.apply_offset(position, normal, offset)
+        tangent = transform_utils.get_tangent(normal)
+        instance_id = self.rng.choice(self.ids, num_points)
+        assigned = self.point_data.instance_id >= 0
+        instance_id[assigned] = self.point_data.instance_id[assigned]
+
+        return position, scale, rotation, normal, tangent, instance_id
 
-    """ ---------------------------------------------------------------- """
-    """ disk sampling 3d """
-    """ ---------------------------------------------------------------- """
+        #  t_result = time.time() - t1
+        #  self.logger.debug('Sampling {} points in self.mode {} took {}s.'.format(i+1, self.mode, t_result))
 
-    def disk_sampling_3d(self, min_radius, grid_partition, cell_size):
 
-        in_mesh = node_utils.get_connected_in_mesh(self.target, False)
-        bb = om.MFnDagNode(in_mesh).boundingBox()
+    def resolve_footprints(self):
+        """ draw the transforms of all sampled points and remove points
+        whose footprint overlaps the footprint of another point. the
+        footprint is the bounding radius of the instanced prototype times
+        the sampled scale. larger instances are kept first so smaller ones
+        fill the gaps in the same pass """
 
-        # pick randomly an initial point from where we start sampling
-        initial_key = random.choice(grid_partition.keys())
-        init_p_ref = random.choice(grid_partition[initial_key])
+        prototype_radii = node_utils.get_prototype_radii(self.node_name)
+        transforms = self.get_transforms()
+        radius = transform_utils.footprint_radius(prototype_radii, transforms[5], transforms[1])
 
-        # create two list for active (not yet processed) and valid (sampled) points
-        active = []
-        valid_points = [None] * self.w_count * self.h_count * self.d_count
+        order = np.argsort(-radius, kind='mergesort')
+        valid = poisson_utils.resolve_conflicts(self.point_data.position[order], 2 * radius[order])
+        valid = np.sort(order[valid])
 
-        # append the first point to both lists
-        active.append(init_p_ref)
-        valid_points[initial_key] = init_p_ref
+        self.point_data = self.point_data.subset(valid)
+        self.transforms = [transform[valid] for transform in transforms]
 
-        while len(active) > 0:
+    def order_progressive(self):
+        """ reorder the sampled points so the viewport can draw only the
+        first points of an emit and still show the entire distribution """
 
-            # pick a random point from the active points list
-            p_active_index = int(len(active) * random.random())
-            p_active = active[p_active_index]
-            # TODO - get each active point only once?
+        order = poisson_utils.progressive_order(self.point_data.position, self.rng)
+        self.point_data = self.point_data.subset(order)
+        if self.transforms is not None:
+            self.transforms = [transform[order] for transform in self.transforms]
 
-            # normalize the point and get it's x,y,z index in the grid
-            p_normalized = self.point_data.position[p_active] - bb.min()
-            p_grid_x = int(p_normalized.x / cell_size)
-            p_grid_y = int(p_normalized.y / cell_size)
-            p_grid_z = int(p_normalized.z / cell_size)
+    def order_random(self):
+        """ shuffle the sampled points with the node's seed. random samples
+        come out sorted by triangle, so without shuffling every batch of
+        an emit and the first points shown by the display fraction would
+        cover only a strip of the mesh """
 
-            # assume no point will be found
-            found = False
+        order = self.rng.permutation(len(self.point_data))
+        self.point_data = self.point_data.subset(order)
+        if self.transforms is not None:
+            self.transforms = [transform[order] for transform in self.transforms]
 
-            # try k times to find a new sample
-            k = 30
-            for i in xrange(k):
+    def get_settings(self):
+        """ get emit attributes from node. all attributes are read from the
+        plugs cached on the node so the command does not depend on the ui
+        and stays fast when it is called for many nodes """
 
-                # get neighboring cell
-                new_p_x, new_p_y, new_p_z = self.get_valid_neighbouring_cell(p_grid_x, p_grid_y, p_grid_z)
+        plug = self.spore_locator.get_plug
+        self.node_name = om.MFnDependencyNode(self.target).name()
+        self.mode = plug('emitType').asShort()
+        self.use_tex = plug('emitFromTexture').asBool()
+        self.num_samples = plug('numSamples').asInt()
+        self.cell_size = plug('cellSize').asDouble()
+        self.stratified = plug('stratified').asBool()
+        self.density_map = plug('densityMap').asShort()
+        self.use_footprint = plug('useFootprint').asBool()
+        self.min_radius = plug('minRadius').asDouble()
+        self.min_radius_2d = plug('minRadius2d').asDouble()
+        self.udim_start = plug('udimStart').asInt()
+        self.udim_end = plug('udimEnd').asInt()
+        self.align_modes = ['normal', 'world', 'object', 'stroke']
+        self.align_id = plug('alignTo').asShort()
+        self.strength = plug('strength').asDouble()
+        self.min_rot = node_utils.get_plug_vector(plug('minRotation'))
+        self.max_rot = node_utils.get_plug_vector(plug('maxRotation'))
+        self.uni_scale = plug('uniformScale').asBool()
+        self.min_scale = node_utils.get_plug_vector(plug('minScale'))
+        self.max_scale = node_utils.get_plug_vector(plug('maxScale'))
+        self.min_offset = plug('minOffset').asDouble()
+        self.max_offset = plug('maxOffset').asDouble()
+        self.min_altitude = plug('minAltitude').asDouble()
+        self.max_altitude = plug('maxAltitude').asDouble()
+        self.min_altitude_fuzz = plug('minAltitudeFuzz').asDouble()
+        self.max_altitude_fuzz = plug('maxAltitudeFuzz').asDouble()
+        self.min_slope = plug('minSlope').asDouble()
+        self.max_slope = plug('maxSlope').asDouble()
+        self.slope_fuzz = plug('slopeFuzz').asDouble()
+        seed = plug('seed').asInt()
+
+        # command flags override the node's settings
+        for name, value in self.overrides.items():
+            setattr(self, name, value)
+
+        dag_path = om.MFnDagNode(self.target).fullPathName()
+        object_index = node_utils.get_instance_ids(dag_path, plug('instanceMask'))
+        if not object_index:
+            if not (self.estimate or self.refilter):
+                raise RuntimeError('No instance geometry connected')
+            object_index = [0]
+        self.ids = object_index
 
-                # get liear index from x,y,z position.
-                key = new_p_x + new_p_y * self.w_count + new_p_z * self.w_count * self.h_count
+        # set the random seed and initialize the Points object
+        self.set_seed(seed)
 
-                # check if key is valid and if there isnt already a valid point...
-                if grid_partition.has_key(key)\
-                and not valid_points[key]:
+    def set_seed(self, seed):
+        """ set the random seed for sampling. if the given seed is -1
+        a random seed will be drawn
+        :param seed: the seed for the random function
+        :return: """
+        if seed == -1:
+            seed = np.random.randint(2 ** 31)
 
-                    # get a random point from the list associated with the key
-                    new_index = int(len(grid_partition[key]) * random.random())
-                    point_index = grid_partition[key][new_index]
-                    point = self.point_data.position[point_index]
+        random.seed(seed)
+        self.seed = seed
+        self.rng = np.random.RandomState(seed)
 
-                # ...otherwise try again
-                else:
-                    continue
-
-                valid = True
-                # check against all nearby cells if the sample is valid
-                for x in xrange(new_p_x - 1, new_p_x + 2):
-                    for y in xrange(new_p_y - 1, new_p_y + 2):
-                        for z in xrange(new_p_z - 1, new_p_z + 2):
-
-                            # ignore invalid cells
-                            if x < 0 or y < 0 or z < 0:
-                                continue
-                            elif x > self.w_count - 1 or y > self.h_count - 1 or z > self.d_count -1:
-                                continue
-
-                            # get the index for the current cell
-                            index = x + y * self.w_count + z * self.w_count * self.h_count
-
-                            # check if there is already a valid point in the cell
-                            if index >= 0 and index <= len(valid_points) - 1:
-                                if valid_points[index]:
-                                    neighbor = self.point_data.position[valid_points[index]]
-
-                                else:
-                                    continue
-                            else:
-                                raise RuntimeError
-                                continue
-
-                            # check distance to the next neighbour
-                            # if it conflicts tag the point invalid and break
-                            # out of the loop
-                            distance = point.distanceTo(neighbor)# + min_radius / 10
-                            if distance < min_radius: # - (min_radius / 10) :
-                                valid = False
-                                break
-
-                        if valid is False:
-                            break
-                    if valid is False:
-                        break
+    def get_processes(self):
+        """ return the number of worker processes used for sampling. the
+        result does not depend on it, so it is a global pref """
 
-                if valid:
-                    found = True
-                    valid_points[key] = point_index
-                    active.append(point_index)
+        return max(int(sys._global_spore_dispatcher.spore_globals['SAMPLING_PROCESSES']), 1)
 
-            if not found:
-                active.remove(p_active)
-                #  active.pop(p_active_index)
+    def get_emit_texture(self):
+        """ return the name of the shading node connected to the emit
+        texture attribute or None """
 
-        return [i for i in valid_points if i is not None]
+        connections = cmds.listConnections('{}.emitTexture'.format(self.node_name))
+        if connections:
+            return connections[0]
 
-    def get_valid_neighbouring_cell(self, p_grid_x, p_grid_y, p_grid_z):
-        """ return a neighbouring cell within the range of p-2 to p+2 where
-        0 < x/y/z < h/w/d - 1. This ensures that only valid cell will be returned.
-        :param p_grid_x: cell x position
-        :param p_grid_y: cell y position
-        :param p_grid_z: cell z posiiton
-        :return: """
+    def validate_geo_cache(self):
+        """ recache the target geometry if the geo cache is out of date.
+        the vertices are only hashed if the node has seen its input mesh
+        change since the last validation. estimates only run on a clean
+        cache and skip the validation """
 
-        if self.w_count < 5:
-            new_p_x = random.randint(0, self.w_count - 1)
-        elif p_grid_x <= 2:
-            new_p_x = random.randint(0, p_grid_x + 2)
-        elif p_grid_x >= self.w_count - 2:
-            new_p_x = random.randint(p_grid_x - 2, self.w_count - 1)
-        else:
-            new_p_x = random.randint(p_grid_x - 2, p_grid_x + 2)
-
-        if self.h_count < 5:
-            new_p_y = random.randint(0, self.h_count - 1)
-        elif p_grid_y <= 2:
-            new_p_y = random.randint(0, p_grid_y + 2)
-        elif p_grid_y >= self.h_count - 2:
-            new_p_y = random.randint(p_grid_y - 2, self.h_count - 1)
-        else:
-            new_p_y = random.randint(p_grid_y - 2, p_grid_y + 2)
-
-        if self.d_count < 5:
-            new_p_z = random.randint(0, self.d_count - 1)
-        elif p_grid_z <= 2:
-            new_p_z = random.randint(0, p_grid_z + 2)
-        elif p_grid_z >= self.d_count - 2:
-            new_p_z = random.randint(p_grid_z - 2, self.d_count - 1)
-        else:
-            new_p_z = random.randint(p_grid_z - 2, p_grid_z + 2)
+        if self.estimate:
+            return
 
-        if new_p_x < 0 or new_p_y < 0 or new_p_z < 0:
-            raise RuntimeError
-        elif new_p_x > self.w_count - 1 or new_p_y > self.h_count - 1 or new_p_z > self.w_count - 1:
-            raise RuntimeError
+        if self.geo_cache.cached and not self.geo_cache.dirty:
+            return
 
-        return new_p_x, new_p_y, new_p_z
+        if not self.geo_cache.validate_cache():
+            in_mesh = node_utils.get_connected_in_mesh(self.target, False)
+            self.geo_cache.cache_geometry(in_mesh)
 
     """ ---------------------------------------------------------------- """
-    """ disk sampling 2d """
+    """ refilter """
     """ ---------------------------------------------------------------- """
 
-    def disk_sampling_2d(self, radius, u=1, v=1):
-        """ sample poisson disk samples in uv space
-        note: the given radius must be between 0 and 1 """
+    def refilter_candidates(self):
+        """ filter the candidates of the last emit again with the current
+        filter settings and replace the points published by the emit.
+        only the vectorized filter masks run, nothing is sampled again.
+        the cache is dropped once the target or the emitted points changed
+        :return: True if the points have been replaced """
+
+        if not self.ptc_cache.locked:
+            self.logger.debug('No candidates cached to refilter')
+            return False
+
+        start, end = self.ptc_cache.published
+        published = self.ptc_cache.get_transforms(self.ptc_cache.mask)[0]
+        if (self.geo_cache.dirty and not self.geo_cache.validate_cache())\
+                or end != len(self.instance_data)\
+                or not np.allclose(self.instance_data.np_position[start:end], published):
+            self.logger.warn('The target or the emitted points changed. Emit again to refilter')
+            self.ptc_cache.flush_cache()
+            return False
+
+        self.old_mask = self.ptc_cache.mask
+        self.new_mask = self.get_filter_mask(self.ptc_cache, self.ptc_cache.keys)
+        self.publish(self.new_mask)
+        return True
+
+    def publish(self, mask):
+        """ replace the points published from the ptc cache with the
+        candidates in the given mask """
 
-        # TODO - make uv sample space editable for user
+        cache = self.ptc_cache
+        start = cache.published[0]
+        self.instance_data.truncate(start)
 
-        grid = []
-        active = []
-        ordered = []
+        self.point_data = Points()
+        self.point_data.set_arrays(cache.position[mask],
+                                   cache.normal[mask],
+                                   cache.poly_id[mask],
+                                   cache.tri_id[mask],
+                                   cache.barycentric[mask])
+        self.point_data.u_coord = cache.u_coord[mask]
+        self.point_data.v_coord = cache.v_coord[mask]
+        self.point_data.rank = (np.flatnonzero(mask) + 1) / float(len(mask))
+
+        self.append_points(cache.get_transforms(mask))
+        cache.set_published(mask, start)
+        self.instance_data.set_state()
 
-        cellsize = radius / math.sqrt(2)
+    """ ---------------------------------------------------------------- """
+    """ region """
+    """ ---------------------------------------------------------------- """
 
-        col = int(u / cellsize)
-        row = int(v / cellsize)
+    def initialize_region(self):
+        """ find the triangles touching the region given by the faceIds,
+        boundingBox and sphere flags. multiple regions are intersected.
+        the region ids stay None if no region has been given """
+
+        self.region_ids = None
+        if self.region_faces is None and self.region_box is None and self.region_sphere is None:
+            return
+
+        self.validate_geo_cache()
+        mask = np.ones(len(self.geo_cache), dtype=bool)
+        if self.region_faces is not None:
+            mask &= np.in1d(self.geo_cache.poly_id, self.region_faces)
+
+        if self.region_box is not None or self.region_sphere is not None:
+            vertices = self.geo_cache.to_world(self.geo_cache.vertices)
+            if self.region_box is not None:
+                mask &= sample_utils.triangles_in_box(vertices, self.geo_cache.triangles, *self.region_box)
+            if self.region_sphere is not None:
+                mask &= sample_utils.triangles_in_sphere(vertices, self.geo_cache.triangles, *self.region_sphere)
+
+        # degenerated triangles can't be sampled
+        area = np.diff(np.concatenate(([0], self.geo_cache.cdf)))
+        self.region_ids = np.flatnonzero(mask & (area > 0))
+
+    def in_region(self, position, poly_id):
+        """ return a mask of the given points that lie inside the region
+        :param position: (n, 3) array of world space positions
+        :param poly_id: (n,) array of poly ids
+        :return: (n,) boolean mask """
+
+        mask = np.ones(len(position), dtype=bool)
+        if self.region_faces is not None:
+            mask &= np.in1d(poly_id, self.region_faces)
+        if self.region_box is not None:
+            mask &= sample_utils.points_in_box(position, *self.region_box)
+        if self.region_sphere is not None:
+            mask &= sample_utils.points_in_sphere(position, *self.region_sphere)
+        return mask
+
+    def get_region_samples(self, num_samples):
+        """ scale a number of samples for the entire target down to the
+        share of the region in the surface area """
+
+        if self.region_ids is None:
+            return num_samples
+
+        area = np.diff(np.concatenate(([0], self.geo_cache.cdf)))
+        return int(round(num_samples * area[self.region_ids].sum()))
+
+    def get_mesh(self):
+        """ return the triangles to sample. these are all triangles of the
+        geo cache unless a region has been given
+        :return: (t,) array of triangle ids, (t, 3) array of vertex
+                 indices and (t,) array of the normalized area cdf """
+
+        if self.region_ids is None:
+            return np.arange(len(self.geo_cache)), self.geo_cache.triangles, self.geo_cache.cdf
+
+        area = np.diff(np.concatenate(([0], self.geo_cache.cdf)))
+        cdf = np.cumsum(area[self.region_ids])
+        return self.region_ids, self.geo_cache.triangles[self.region_ids], cdf / cdf[-1]
+
+    def hide_region(self):
+        """ hide all visible points inside the region. hidden points are
+        removed on the next clean up of the instance data """
+
+        visibility = np.array(list(self.instance_data.visibility), dtype=int)
+        poly_id = np.array(list(self.instance_data.poly_id), dtype=int)
+        inside = self.in_region(self.instance_data.np_position, poly_id)
+        self.replaced = np.flatnonzero((visibility == 1) & inside).tolist()
+        self.set_visibility(self.replaced, 0)
+
+    def set_visibility(self, ids, value):
+        """ set the visibility of the given points """
+
+        if ids:
+            self.instance_data.set_points(ids, visibility=instance_data.to_int_array(np.full(len(ids), value)))
 
-        grid = [None] * col * row
+    """ ---------------------------------------------------------------- """
+    """ random sampler """
+    """ ---------------------------------------------------------------- """
 
-        #  x = random.random() * u
-        #  y = random.random() * v
-        #  since x=1 + y=1 would raise an index err let's assume the first point
-        #  at 0.5 and 0.5
-        x = 0.5
-        y = 0.5
-        pos = (x, y)
+    def random_sampling(self, num_points, cdf=None):
+        """ sample a given number of points on the previously cached triangle
+        mesh. points are sampled in object space and transformed to world
+        space all at once. triangles and barycentric coordinates are drawn
+        for all points in one go. note: evaluating uvs on high poly meshes
+        may take a long time
+        :param cdf: optional cdf over the triangles of get_mesh, their area
+                    cdf if None """
+
+        self.validate_geo_cache()
+        ids, triangles, area_cdf = self.get_mesh()
+        if cdf is None:
+            cdf = area_cdf
+
+        tri_ids, bary, position = parallel_utils.sample_surface(self.geo_cache.vertices,
+                                                                triangles,
+                                                                cdf,
+                                                                num_points,
+                                                                self.seed,
+                                                                processes=self.get_processes())
+        tri_ids = ids[tri_ids]
+
+        matrix = self.geo_cache.get_world_matrix()
+        position = self.geo_cache.to_world(position, matrix)
+        normal = self.geo_cache.normals_to_world(self.geo_cache.normals[tri_ids], matrix)
+
+        self.point_data.set_arrays(position,
+                                   normal,
+                                   self.geo_cache.poly_id[tri_ids],
+                                   tri_ids,
+                                   bary)
 
-        current_col = int(x / cellsize)
-        current_row = int(y / cellsize)
+    """ ---------------------------------------------------------------- """
+    """ low discrepancy sampler """
+    """ ---------------------------------------------------------------- """
 
-        try:
-            grid[current_col + current_row * col] = pos
-        except IndexError as e:
-            # this should not happen any more since the initial point is at
-            # 0.5 / 0.5 but just in case let's log what causes the index error
-            self.logger.error('Error intializing 2d poisson sampler. '
-                              'grid of len({}) build with {} columns, {} rows. '
-                              'Initial index is: {}, {}'.format(
-                                  len(grid), col, row, current_col, current_row)
-                              )
-            raise IndexError(e)
+    def halton_sampling(self, num_points, cdf=None):
+        """ sample a given number of points with a scrambled halton sequence.
+        gives a much more even coverage than random sampling at about the
+        same cost but without a minimum distance guarantee. the scrambling
+        is seeded by the node's seed attribute
+        :param cdf: optional cdf over the triangles of get_mesh, their area
+                    cdf if None """
+
+        self.validate_geo_cache()
+        ids, triangles, area_cdf = self.get_mesh()
+        if cdf is None:
+            cdf = area_cdf
+
+        tri_ids, bary, position = sample_utils.halton_sample_surface(self.geo_cache.vertices,
+                                                                     triangles,
+                                                                     cdf,
+                                                                     num_points,
+                                                                     self.rng)
+        tri_ids = ids[tri_ids]
+
+        matrix = self.geo_cache.get_world_matrix()
+        position = self.geo_cache.to_world(position, matrix)
+        normal = self.geo_cache.normals_to_world(self.geo_cache.normals[tri_ids], matrix)
+
+        self.point_data.set_arrays(position,
+                                   normal,
+                                   self.geo_cache.poly_id[tri_ids],
+                                   tri_ids,
+                                   bary)
 
-        active.append(pos)
-        ordered.append(pos)
+    """ ---------------------------------------------------------------- """
+    """ density sampling """
+    """ ---------------------------------------------------------------- """
 
+    def density_sampling(self, num_samples, max_candidates=10):
+        """ sample about num_samples points distributed by the density map.
+        triangles are picked proportional to their area times an upper
+        bound of the density in the triangle. a final rejection against
+        the bound recovers the detail within the triangles. only the
+        candidates expected to be rejected there are drawn in addition,
+        so the cost does not grow with the sparsity of the density map
+        :param max_candidates: upper limit of candidates per sample """
+
+        self.validate_geo_cache()
+
+        # the density is only probed on the triangles to sample
+        ids, _, area_cdf = self.get_mesh()
+        density = self.get_density_func()
+        bound, mean = sample_utils.density_bounds(lambda tri_ids, bary: density(ids[tri_ids], bary), len(ids))
+        cdf = sample_utils.weighted_cdf(area_cdf, bound)
+        if cdf is None:
+            self.logger.warn('The density map is empty')
+            return
+
+        area = np.diff(np.concatenate(([0], area_cdf)))
+        acceptance = np.sum(area * mean) / np.sum(area * bound)
+        num_candidates = int(math.ceil(num_samples / max(acceptance, 1.0 / max_candidates)))
+
+        if self.mode == 5:
+            self.halton_sampling(num_candidates, cdf)
+        else:
+            self.random_sampling(num_candidates, cdf)
 
-        while len(active) > 0:
+        triangle_bound = np.zeros(len(self.geo_cache))
+        triangle_bound[ids] = bound
 
-            rand_index = int(len(active) - 1)
-            active_pos = active[rand_index]
-            found = False
+        points = self.point_data
+        valid_points = filter_utils.density_mask(density(points.tri_id, points.barycentric),
+                                                 triangle_bound[points.tri_id],
+                                                 self.rng)
+        self.point_data = points.subset(valid_points)
 
-            k = 30
-            for each in xrange(k):
-
-                # find a new point withhin a the range of radius - 2r
-                rand_distance = random.uniform(radius, 2 * radius)
-                theta = 360 * random.random()
-                offset_x = math.cos(theta) * rand_distance
-                offset_y = math.sin(theta) * rand_distance
-
-                # get the absolut position of the new pos
-                new_x = active_pos[0] + offset_x
-                new_y = active_pos[1] + offset_y
-                new_pos = (new_x, new_y)
-
-                # get the new col & row position of the point
-                active_col = int(new_x / cellsize)
-                active_row = int(new_y / cellsize)
-
-                if active_col > 0 \
-                and active_row > 0 \
-                and active_col < col \
-                and active_row < row \
-                and not grid[active_col + active_row * col]:
-
-                    valid = True
-                    for j in xrange(-1, 2):
-                        for f in xrange(-1, 2):
-                            index = (active_col + j) + (active_row + f) * col
-                            try:
-                                neighbor = grid[index]
-                            except IndexError:
-                                continue
-                            if neighbor:
-                                distance = math.sqrt((neighbor[0] - new_pos[0]) ** 2 + (neighbor[1] - new_pos[1]) ** 2)
-                                if (distance < radius):
-                                    valid = False
-
-                    if valid:
-                        found = True
-                        grid[active_col + active_row * col] = new_pos
-                        active.append(new_pos)
-                        ordered.append(new_pos)
-
-                        # TODO
+    def get_density_func(self):
+        """ return the density of the node's density map as function of
+        triangle ids and barycentric coordinates """
 
-            if not found:
-                active.pop(rand_index)
+        if self.density_map == 1: # emit texture
+            texture = self.get_emit_texture()
+            if not texture:
+                raise RuntimeError('No emit texture connected to {}'.format(self.node_name))
 
-        self.point_data.set_length(len(ordered))
+            image = self.texture_cache.get_texture(texture, K_TEXTURE_RESOLUTION)
 
-        util = om.MScriptUtil()
-        in_mesh = node_utils.get_connected_in_mesh(self.target, False)
-        mesh_fn = om.MFnMesh(in_mesh)
+            def density(tri_ids, bary):
+                uvs = self.geo_cache.get_uvs(tri_ids, bary)
+                color = texture_cache.sample_texture(image, uvs[:, 0], uvs[:, 1])
+                return filter_utils.texture_density(color[:, 0])
 
-        for i, (u_coord, v_coord) in enumerate(ordered):
+        else: # vertex color
+            def density(tri_ids, bary):
+                return np.clip(self.geo_cache.get_colors(tri_ids, bary)[:, 0], 0, 1)
 
-            face_ids = self.geo_cache.get_close_face_ids(u_coord, 1 - v_coord)
+        return density
 
-            position = om.MPoint()
-            normal = om.MVector()
-            for face_id in face_ids:
-                util.createFromList([u_coord, 1 - v_coord], 2)
-                ptr = util.asFloat2Ptr()
+    """ ---------------------------------------------------------------- """
+    """ grid sampling """
+    """ ---------------------------------------------------------------- """
 
-                try:
-                    mesh_fn.getPointAtUV(face_id, position, ptr, om.MSpace.kWorld)
-                    mesh_fn.getClosestNormal(position, normal)
-                    self.point_data.set(i, position, normal, 1, u_coord, 1 - v_coord)
-                except:
-                    continue
+    def grid_sampling(self, cell_size):
+        """ randomly choose one point from each occupied grid cell.
+        :return: sorted array of ids that associate a point in the
+                 point_data obj """
+
+        return sample_utils.pick_per_cell(self.point_data.position, cell_size, self.rng)
+
+    def stratified_sampling(self, cell_size):
+        """ draw exactly one sample per grid cell the surface passes
+        through, picked proportional to the surface area in the cell.
+        sampling is done in world space so the cells are not affected
+        by the transformation of the target """
+
+        self.validate_geo_cache()
+
+        ids, triangles, _ = self.get_mesh()
+        matrix = self.geo_cache.get_world_matrix()
+        vertices = self.geo_cache.to_world(self.geo_cache.vertices, matrix)
+        tri_ids, bary, position = sample_utils.stratified_sample_surface(vertices,
+                                                                         triangles,
+                                                                         cell_size,
+                                                                         self.rng)
+        tri_ids = ids[tri_ids]
+
+        normal = self.geo_cache.normals_to_world(self.geo_cache.normals[tri_ids], matrix)
+        self.point_data.set_arrays(position,
+                                   normal,
+                                   self.geo_cache.poly_id[tri_ids],
+                                   tri_ids,
+                                   bary)
 
     """ ---------------------------------------------------------------- """
-    """ spatial utils """
+    """ disk sampling 3d """
     """ ---------------------------------------------------------------- """
 
-    def voxelize(self, cell_size):
-        """ partition the spatial domain with the given cellsize.
-        than assign each point to the cell is spatialy belongs to.
-        :return dict: where:
-                      key == the cell index
-                      value == list of points indexes from the point_data obj """
+    def disk_sampling_3d(self, min_radius):
+        """ sample poisson disk samples on the surface of the target mesh.
+        sampling is done in world space so the radius is not affected by
+        the transformation of the target """
+
+        self.validate_geo_cache()
+
+        ids, triangles, cdf = self.get_mesh()
+        matrix = self.geo_cache.get_world_matrix()
+        vertices = self.geo_cache.to_world(self.geo_cache.vertices, matrix)
+        tri_ids, bary, position = parallel_utils.disk_sampling_surface(vertices,
+                                                                       triangles,
+                                                                       cdf,
+                                                                       min_radius,
+                                                                       self.seed,
+                                                                       processes=self.get_processes())
+        tri_ids = ids[tri_ids]
+
+        normal = self.geo_cache.normals_to_world(self.geo_cache.normals[tri_ids], matrix)
+        self.point_data.set_arrays(position,
+                                   normal,
+                                   self.geo_cache.poly_id[tri_ids],
+                                   tri_ids,
+                                   bary)
 
-        partition = {}
+    """ ---------------------------------------------------------------- """
+    """ multi-class disk sampling """
+    """ ---------------------------------------------------------------- """
 
-        in_mesh = node_utils.get_connected_in_mesh(self.target, False)
-        bb = om.MFnDagNode(in_mesh).boundingBox()
+    def multi_class_sampling(self, min_radius):
+        """ sample poisson disk samples on the surface of the target mesh
+        with one class per selected instance id. points of the same class
+        keep the class radius of their instance, all points keep the
+        given min radius. sampling is done in world space """
+
+        self.validate_geo_cache()
+
+        ids, triangles, cdf = self.get_mesh()
+        matrix = self.geo_cache.get_world_matrix()
+        vertices = self.geo_cache.to_world(self.geo_cache.vertices, matrix)
+        tri_ids, bary, position, label = poisson_utils.multi_class_disk_sampling(vertices,
+                                                                                 triangles,
+                                                                                 cdf,
+                                                                                 self.get_class_radii(),
+                                                                                 min_radius,
+                                                                                 self.rng)
+        tri_ids = ids[tri_ids]
+
+        normal = self.geo_cache.normals_to_world(self.geo_cache.normals[tri_ids], matrix)
+        self.point_data.set_arrays(position,
+                                   normal,
+                                   self.geo_cache.poly_id[tri_ids],
+                                   tri_ids,
+                                   bary)
+        self.point_data.instance_id[:] = np.asarray(self.ids)[label]
+
+    def get_class_radii(self):
+        """ return the class radius of every selected instance id.
+        instances without a class radius use the min radius
+        :return: (n,) array of radii in the order of self.ids """
+
+        class_radius = self.spore_locator.get_plug('classRadius')
+        radii = []
+        for instance_id in self.ids:
+            radius = class_radius.elementByLogicalIndex(instance_id).asDouble()
+            radii.append(radius if radius > 0 else self.min_radius)
+
+        return np.array(radii)
 
-        self.w_count = int(math.ceil(bb.width() / cell_size))
-        self.h_count = int(math.ceil(bb.height() / cell_size))
-        self.d_count = int(math.ceil(bb.depth() / cell_size))
+    """ ---------------------------------------------------------------- """
+    """ blue noise tiles """
+    """ ---------------------------------------------------------------- """
 
-        bb_min = bb.min()
-        for i in xrange(self.point_data.position.length()):
-            p_normalized = self.point_data.position[i] - bb_min
-            p_x = int(p_normalized.x / cell_size)
-            p_y = int(p_normalized.y / cell_size)
-            p_z = int(p_normalized.z / cell_size)
+    def tile_sampling(self, min_radius, tile_size=4096):
+        """ cover the target with a precomputed set of blue noise corner
+        tiles. the tiles are scaled to the given min radius, picked per
+        cell of the world space bounding box in the xz plane from the seed
+        and dropped vertically onto the mesh. samples that miss the mesh
+        are rejected.
+        note: the spacing is only exact on flat areas and stretches
+        with the slope of the surface """
+
+        self.validate_geo_cache()
+
+        cache_dir = os.path.join(os.environ.get('SPORE_PREFS_DIR', tempfile.gettempdir()), 'tiles')
+        tiles, tile_distance = poisson_utils.load_tiles(tile_size, cache_dir)
+        scale = min_radius / tile_distance
+
+        ids, triangles, _ = self.get_mesh()
+        matrix = self.geo_cache.get_world_matrix()
+        vertices = self.geo_cache.to_world(self.geo_cache.vertices, matrix)
+
+        # the tile only covers the bounding box of the triangles to sample
+        corners = vertices[triangles].reshape(-1, 3)
+        bb_min = corners.min(axis=0)[[0, 2]]
+        bb_max = corners.max(axis=0)[[0, 2]]
+        points = poisson_utils.tile_plane(tiles, scale, bb_min, bb_max,
+                                          self.rng.random_sample(2) * scale,
+                                          self.rng.randint(2 ** 31))
+
+        tri_ids, bary = sample_utils.drop_to_surface(points, vertices, triangles)
+        valid = tri_ids >= 0
+        tri_ids, bary = ids[tri_ids[valid]], bary[valid]
+
+        corners = vertices[self.geo_cache.triangles[tri_ids]]
+        position = sample_utils.interpolate(corners[:, 0], corners[:, 1], corners[:, 2], bary)
+        normal = self.geo_cache.normals_to_world(self.geo_cache.normals[tri_ids], matrix)
+
+        self.point_data.set_arrays(position,
+                                   normal,
+                                   self.geo_cache.poly_id[tri_ids],
+                                   tri_ids,
+                                   bary)
 
-            index = p_x + p_y * self.w_count + p_z * self.w_count * self.h_count
+    """ ---------------------------------------------------------------- """
+    """ sample elimination """
+    """ ---------------------------------------------------------------- """
 
+    def elimination_sampling(self, num_samples, oversampling=5):
+        """ sample exactly num_samples points with a blue noise distribution.
+        a dense set of random candidates is reduced with weighted sample
+        elimination which runs in O(n log n) for the number of candidates """
 
-            partition.setdefault(index, []).append(i)
+        self.random_sampling(num_samples * oversampling)
 
-        return partition
+        area = self.geo_cache.get_surface_area(self.geo_cache.get_world_matrix(), self.region_ids)
+        valid_points = poisson_utils.weighted_sample_elimination(self.point_data.position,
+                                                                 num_samples,
+                                                                 area)
+        self.point_data = self.point_data.subset(valid_points)
+
+    """ ---------------------------------------------------------------- """
+    """ disk sampling 2d """
+    """ ---------------------------------------------------------------- """
+
+    def disk_sampling_2d(self, radius, udim_start=1001, udim_end=1001):
+        """ sample poisson disk samples in uv space and map them onto the
+        surface of the target mesh. every udim tile between the given start
+        and end tile is sampled separately. all samples are mapped to the
+        surface at once by locating them in the uv triangles of the geo
+        cache and interpolating position and normal.
+        note: the given radius is in uv space """
+
+        self.validate_geo_cache()
+        self.geo_cache.create_uv_lookup()
+
+        uvs = [np.empty((0, 2))]
+        for tile in range(udim_start - 1001, udim_end - 1000):
+            u_coord, v_coord = tile % 10, tile // 10
+            uvs.append(poisson_utils.disk_sampling_2d(radius,
+                                                      (u_coord, u_coord + 1),
+                                                      (v_coord, v_coord + 1),
+                                                      self.rng))
+        uvs = np.vstack(uvs)
+
+        tri_ids, bary = self.geo_cache.get_triangles_at_uv(uvs)
+        valid = tri_ids >= 0
+        if self.region_ids is not None:
+            valid[valid] = np.in1d(tri_ids[valid], self.region_ids)
+        uvs, tri_ids, bary = uvs[valid], tri_ids[valid], bary[valid]
+
+        p0, p1, p2 = self.geo_cache.get_corners(tri_ids)
+        matrix = self.geo_cache.get_world_matrix()
+        position = self.geo_cache.to_world(sample_utils.interpolate(p0, p1, p2, bary), matrix)
+        normal = self.geo_cache.normals_to_world(self.geo_cache.interpolate_normals(tri_ids, bary), matrix)
+
+        self.point_data.set_arrays(position,
+                                   normal,
+                                   self.geo_cache.poly_id[tri_ids],
+                                   tri_ids,
+                                   bary)
+        self.point_data.u_coord[:] = uvs[:, 0]
+        self.point_data.v_coord[:] = uvs[:, 1]
+
+    """ ---------------------------------------------------------------- """
+    """ spatial utils """
+    """ ---------------------------------------------------------------- """
 
     def evaluate_uvs(self):
         """ evaluate uv coords for all points in point data.
-        note: this may take a long time for large meshes """
+        points sampled on the geo cache interpolate the corner uvs of their
+        triangle with their barycentric coordinates. only points without
+        a triangle fall back to querying the mesh one by one """
 
-        in_mesh = node_utils.get_connected_in_mesh(self.target, False)
+        points = self.point_data
+        on_cache = points.tri_id >= 0
+        if on_cache.any():
+            uvs = self.geo_cache.get_uvs(points.tri_id[on_cache], points.barycentric[on_cache])
+            points.u_coord[on_cache] = uvs[:, 0]
+            points.v_coord[on_cache] = uvs[:, 1]
 
-        for i, (position, normal, poly_id, u_coord, v_coord) in enumerate(self.point_data):
-            #  if not u_coord and not v_coord:
+        if on_cache.all():
+            return
 
+        in_mesh = node_utils.get_connected_in_mesh(self.target, False)
+        for i in np.flatnonzero(~on_cache).tolist():
+            position = points.position[i]
             pos = om.MPoint(position[0], position[1], position[2])
-            u_coord, v_coord = mesh_utils.get_uv_at_point(in_mesh, pos)
-
-            self.point_data.u_coord[i] = u_coord
-            self.point_data.v_coord[i] = v_coord
+            points.u_coord[i], points.v_coord[i] = mesh_utils.get_uv_at_point(in_mesh, pos)
 
     """ ---------------------------------------------------------------- """
     """ filtering """
     """ ---------------------------------------------------------------- """
 
-    def texture_filter(self, node, filter_size):
-        """ filter points based on the input texture attribute """
+    def texture_filter(self, points, node, filter_size, keys=None):
+        """ filter points based on the input texture attribute.
+        the texture is baked once and cached until it changes
+        :return: (n,) boolean keep-mask """
 
         if not node:
             raise RuntimeError('No input shading node given')
 
-        color, alpha = render_utils.sample_shading_node(node, self.point_data)
-        invalid_ids = []
-        gamma = 2.2
-        for i, val in enumerate(color):
-            val = val[0]
-            if val < 0 or val > 1:
-                val = max(min(1, val), 0)
-
-            if val ** (1/gamma) < random.random():
-                invalid_ids.append(i)
-
-        invalid_ids = sorted(invalid_ids, reverse=True)
-        [self.point_data.remove(index) for index in invalid_ids]
-
-    def altitude_filter(self, min_altitude, max_altitude, min_fuzziness, max_fuzziness):
-        """ filter points based on y position relative to bounding box """
-
-        in_mesh = node_utils.get_connected_in_mesh(self.target, False)
-        dag_fn = om.MFnDagNode(in_mesh)
-
-        bb = dag_fn.boundingBox()
-        bb_y_min = bb.min().y
-        height = bb.height()
-
-        invalid_ids = []
-        for i, (position, _, _, _, _) in enumerate(self.point_data):
-            y_normalized = position[1] - bb_y_min
-            pos_rel = y_normalized / height
-
-            if pos_rel < min_altitude:
-                if pos_rel < min_altitude - min_fuzziness:
-                    invalid_ids.append(i)
-
-                elif min_altitude - pos_rel > random.uniform(0, min_fuzziness):
-                    invalid_ids.append(i)
-
-            elif pos_rel > max_altitude:
-                if pos_rel > max_altitude + max_fuzziness:
-                    invalid_ids.append(i)
-
-                elif abs(max_altitude - pos_rel) > random.uniform(0, max_fuzziness):
-                    invalid_ids.append(i)
-
-        invalid_ids = sorted(invalid_ids, reverse=True)
-        [self.point_data.remove(index) for index in invalid_ids]
-
-    def slope_filter(self, min_slope, max_slope, fuzz):
-
-        world = om.MVector(0, 1, 0)
-
-        invalid_ids = []
-        for i, (_, normal, _, _, _) in enumerate(self.point_data):
-            normal = om.MVector(normal[0], normal[1], normal[2])
-            angle = math.degrees(normal.angle(world)) + 45 * random.uniform(-fuzz, fuzz)
-
-            if angle < min_slope or angle > max_slope:
-                invalid_ids.append(i)
-
-        invalid_ids = sorted(invalid_ids, reverse=True)
-        [self.point_data.remove(index) for index in invalid_ids]
-
-
-        pass
+        image = self.texture_cache.get_texture(node, K_TEXTURE_RESOLUTION)
+        color = texture_cache.sample_texture(image, points.u_coord, points.v_coord)
+        return filter_utils.texture_mask(color[:, 0], rng=self.rng, keys=keys)
+
+    def altitude_filter(self, points, min_altitude, max_altitude, min_fuzziness, max_fuzziness, keys=None):
+        """ filter points based on y position relative to the world space
+        bounding box
+        :return: (n,) boolean keep-mask """
+
+        bb = self.geo_cache.get_bounding_box()
+        return filter_utils.altitude_mask(points.position,
+                                          bb.min().y,
+                                          bb.height(),
+                                          min_altitude,
+                                          max_altitude,
+                                          min_fuzziness,
+                                          max_fuzziness,
+                                          self.rng,
+                                          keys)
+
+    def get_exclusion_index(self):
+        """ return the index over the points of all exclusion nodes.
+        the index is built once per command """
+
+        if self.exclusion_index is None:
+            positions, radii = node_utils.get_exclusion_points(self.target)
+            self.exclusion_index = filter_utils.ExclusionIndex(positions, radii)
+        return self.exclusion_index
+
+    def slope_filter(self, points, min_slope, max_slope, fuzz, keys=None):
+        """ filter points based on the angle between normal and world up
+        :return: (n,) boolean keep-mask """
+
+        return filter_utils.slope_mask(points.normal, min_slope, max_slope, fuzz, self.rng, keys)
 
     """ ---------------------------------------------------------------- """
     """ transformation utils """
     """ ---------------------------------------------------------------- """
 
     def get_alignment(self, alignment, normal):
-        """ get a vector representing th current alignment mdoe """
+        """ get vectors representing the current alignment mode
+        :param normal: (n, 3) array of normals
+        :return: (n, 3) array of directions """
 
-        if alignment == 'normal':
-            return normal
-        elif alignment == 'world':
-            return om.MVector(0, 1, 0)
+        if alignment == 'world':
+            return np.tile(transform_utils.WORLD_UP, (len(normal), 1))
         elif alignment == 'object':
-            return node_utils.get_local_rotation(self.target)
-
-
-    def get_rotation(self, direction, weight, min_rot, max_rot):
-        """ get rotation from a matrix pointing towards the given direction
-        slerped by the given weight into the world up vector and added a random
-        rotation between min and max rotation """
-
-        r_x = math.radians(random.uniform(min_rot[0], max_rot[0]))
-        r_y = math.radians(random.uniform(min_rot[1], max_rot[1]))
-        r_z = math.radians(random.uniform(min_rot[2], max_rot[2]))
-        util = om.MScriptUtil()
-        util.createFromDouble(r_x, r_y, r_z)
-        rotation_ptr = util.asDoublePtr()
-
-        matrix = om.MTransformationMatrix()
-        matrix.setRotation(rotation_ptr, om.MTransformationMatrix.kXYZ)
-        world_up = om.MVector(0, 1, 0)
-        rotation = om.MQuaternion(world_up, direction, weight)
-        matrix = matrix.asMatrix() * rotation.asMatrix()
-        rotation = om.MTransformationMatrix(matrix).rotation().asEulerRotation()
-
-        return om.MVector(math.degrees(rotation.x),
-                          math.degrees(rotation.y),
-                          math.degrees(rotation.z))
-
-    def get_scale(self, min_scale, max_scale, uniform=True):
-        """ get scale values between min and max scale """
-
-        if uniform:
-            scale_x = scale_y = scale_z = random.uniform(min_scale[0], max_scale[0])
-        else:
-            scale_x = random.uniform(min_scale[0], max_scale[0])
-            scale_y = random.uniform(min_scale[1], max_scale[1])
-            scale_z = random.uniform(min_scale[2], max_scale[2])
-
-        return om.MVector(scale_x, scale_y, scale_z)
-
-    def get_offset(self, position, min_offset, max_offset, direction):
-        """ get position offest between min and max in a given direction """
-        if min_offset != 0 and max_offset != 0:
-            offset = random.uniform(min_offset, max_offset)
-            return position + direction * offset
+            in_mesh = node_utils.get_connected_in_mesh(self.target, False)
+            return np.tile(node_utils.get_world_up(in_mesh), (len(normal), 1))
         else:
-            return position
+            return normal
 
     def instance_id(self, ids):
         return random.choice(ids)
@@ -844,21 +1312,40 @@ class SporeSampler(ompx.MPxCommand):
     def parse_args(self, args):
         """ parse command arguments """
 
-        mode_map = {0: 'random',
-                    1: 'jitter',
-                    2: 'poisson3d',
-                    3: 'poisson2d'}
-
         arg_data = om.MArgDatabase(self.syntax(), args)
 
         if arg_data.isFlagSet(K_SAMPLET_TYPE_FLAG):
-            self.sample_type = arg_data.flagArgumentString(K_SAMPLET_TYPE_FLAG, 0)
+            sample_type = arg_data.flagArgumentString(K_SAMPLET_TYPE_FLAG, 0)
+            modes = dict((name, mode) for mode, name in K_EMIT_TYPES.items())
+            if sample_type not in modes:
+                raise RuntimeError('Invalid emit type: {}. Valid types are: {}'.format(
+                    sample_type, ', '.join(K_EMIT_TYPES[i] for i in sorted(K_EMIT_TYPES))))
+            self.overrides['mode'] = modes[sample_type]
         if arg_data.isFlagSet(K_NUM_SAMPLES_FLAG):
-            self.num_samples = arg_data.flagArgumentInt(K_NUM_SAMPLES_FLAG, 0)
+            self.overrides['num_samples'] = arg_data.flagArgumentInt(K_NUM_SAMPLES_FLAG, 0)
         if arg_data.isFlagSet(K_CELL_SIZE_FLAG):
-            self.cell_size = arg_data.flagArgumentDouble(K_CELL_SIZE_FLAG, 0)
+            self.overrides['cell_size'] = arg_data.flagArgumentDouble(K_CELL_SIZE_FLAG, 0)
         if arg_data.isFlagSet(K_MIN_DISTANCE_FLAG):
-            self.min_distance = arg_data.flagArgumentDouble(K_MIN_DISTANCE_FLAG, 0)
+            self.overrides['min_radius'] = arg_data.flagArgumentDouble(K_MIN_DISTANCE_FLAG, 0)
+        if arg_data.isFlagSet(K_ESTIMATE_FLAG):
+            self.estimate = True
+        if arg_data.isFlagSet(K_FACE_IDS_FLAG):
+            faces = []
+            for i in range(arg_data.numberOfFlagUses(K_FACE_IDS_FLAG)):
+                flag_args = om.MArgList()
+                arg_data.getFlagArgumentList(K_FACE_IDS_FLAG, i, flag_args)
+                faces.append(flag_args.asInt(0))
+            self.region_faces = np.array(faces, dtype=int)
+        if arg_data.isFlagSet(K_BOUNDING_BOX_FLAG):
+            bb = [arg_data.flagArgumentDouble(K_BOUNDING_BOX_FLAG, i) for i in range(6)]
+            self.region_box = (np.array(bb[:3]), np.array(bb[3:]))
+        if arg_data.isFlagSet(K_SPHERE_FLAG):
+            sphere = [arg_data.flagArgumentDouble(K_SPHERE_FLAG, i) for i in range(4)]
+            self.region_sphere = (np.array(sphere[:3]), sphere[3])
+        if arg_data.isFlagSet(K_REPLACE_FLAG):
+            self.replace = True
+        if arg_data.isFlagSet(K_REFILTER_FLAG):
+            self.refilter = True
 
         selection = om.MSelectionList()
         arg_data.getObjects(selection)
@@ -885,21 +1372,7 @@ class SporeSampler(ompx.MPxCommand):
                     self.target = dag_path.node()
                     found = True
 
-            if found:
-                if not self.sample_type:
-                    type_plug = dag_fn.findPlug('emitType')
-                    self.sample_type = mode_map[type_plug.asShort()]
-                if not self.num_samples:
-                    num_plug = dag_fn.findPlug('numSamples')
-                    self.num_samples = num_plug.asInt()
-                if not self.cell_size:
-                    cell_plug = dag_fn.findPlug('cellSize')
-                    self.cell_size = num_plug.asDouble()
-                if not self.min_distance:
-                    radius_plug = dag_fn.findPlug('minRadius')
-                    self.cell_size = radius_plug.asDouble()
-
-            else:
+            if not found:
                 raise RuntimeError('The sample command only works on sporeNodes')
 
 def creator():
@@ -913,8 +1386,19 @@ def syntax():
     syntax.useSelectionAsDefault(True)
     syntax.addFlag(K_SAMPLET_TYPE_FLAG, K_SAMPLE_TYPE_LONG_FLAG, om.MSyntax.kString)
     syntax.addFlag(K_NUM_SAMPLES_FLAG, K_NUM_SAMPLES_LONG_FLAG, om.MSyntax.kLong)
-    syntax.addFlag(K_CELL_SIZE_FLAG, K_CELL_SIZE_LONG_FLAG, om.MSyntax.kLong)
-    syntax.addFlag(K_MIN_DISTANCE_FLAG, K_MIN_DISTANCE_LONG_FLAG, om.MSyntax.kLong)
+    syntax.addFlag(K_CELL_SIZE_FLAG, K_CELL_SIZE_LONG_FLAG, om.MSyntax.kDouble)
+    syntax.addFlag(K_MIN_DISTANCE_FLAG, K_MIN_DISTANCE_LONG_FLAG, om.MSyntax.kDouble)
+    syntax.addFlag(K_ESTIMATE_FLAG, K_ESTIMATE_LONG_FLAG)
+    syntax.addFlag(K_FACE_IDS_FLAG, K_FACE_IDS_LONG_FLAG, om.MSyntax.kLong)
+    syntax.makeFlagMultiUse(K_FACE_IDS_FLAG)
+    syntax.addFlag(K_BOUNDING_BOX_FLAG, K_BOUNDING_BOX_LONG_FLAG,
+                   om.MSyntax.kDouble, om.MSyntax.kDouble, om.MSyntax.kDouble,
+                   om.MSyntax.kDouble, om.MSyntax.kDouble, om.MSyntax.kDouble)
+    syntax.addFlag(K_SPHERE_FLAG, K_SPHERE_LONG_FLAG,
+                   om.MSyntax.kDouble, om.MSyntax.kDouble,
+                   om.MSyntax.kDouble, om.MSyntax.kDouble)
+    syntax.addFlag(K_REPLACE_FLAG, K_REPLACE_LONG_FLAG)
+    syntax.addFlag(K_REFILTER_FLAG, K_REFILTER_LONG_FLAG)
     return syntax
 
 
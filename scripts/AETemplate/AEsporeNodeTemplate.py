@@ -123,6 +123,9 @@ class AEsporeNodeTemplate(AETemplate):
         self.addSeparator()
         self.addControl('minOffset', label='Min Offset')
         self.addControl('maxOffset', label='Max Offset')
+        self.addSeparator()
+        self.addControl('useFootprint', label='Use Footprint',
+                        annotation='Space emitted and brushed instances by the size of their prototype')
 
         # preassure mapping controls # not implemented yet
         #  self.addSeparator()
@@ -152,18 +155,30 @@ class AEsporeNodeTemplate(AETemplate):
         self.beginLayout('Emit', collapse=1)
         self.addControl('emitType', label='Type',
                         changeCommand=self.emit_type_cc)
-        self.addControl('numSamples', label='Number Of Samples')
+        self.addControl('numSamples', label='Number Of Samples',
+                        changeCommand=self.update_estimate)
         self.addControl('cellSize', label='Cell Size',
                         changeCommand=self.estimate_num_samples)
+        self.addControl('stratified', label='Stratified',
+                        changeCommand=self.update_estimate)
+        self.addControl('densityMap', label='Density Map',
+                        changeCommand=self.update_estimate)
         self.addControl('minRadius', label='Min Radius',
                         changeCommand=self.estimate_num_samples)
-        self.addControl('minRadius2d', label='Min Radius 2d')
+        self.callCustom(self.add_class_radius_fld, self.update_class_radius_fld, 'classRadius')
+        self.addControl('minRadius2d', label='Min Radius 2d',
+                        changeCommand=self.update_estimate)
+        self.addControl('udimStart', label='UDIM Start',
+                        changeCommand=self.update_estimate)
+        self.addControl('udimEnd', label='UDIM End',
+                        changeCommand=self.update_estimate)
 
         # filter attributes
         self.beginLayout('Filter', collapse=0)
         # texture filter attributes
         self.beginLayout('Texture', collapse=1)
-        self.addControl('emitFromTexture', label='Emit from Texture')
+        self.addControl('emitFromTexture', label='Emit from Texture',
+                        changeCommand=self.update_filter)
         self.addControl('emitTexture', label='Texture')
         self.endLayout()
         # altitude filter attributes
@@ -173,8 +188,10 @@ class AEsporeNodeTemplate(AETemplate):
         self.addControl('maxAltitude', 'Max Altitude',
                         changeCommand=self.change_max_altitude)
         self.addSeparator()
-        self.addControl('minAltitudeFuzz', 'Min Altitude Fuzziness')
-        self.addControl('maxAltitudeFuzz', 'Max Altitude Fuzziness')
+        self.addControl('minAltitudeFuzz', 'Min Altitude Fuzziness',
+                        changeCommand=self.update_filter)
+        self.addControl('maxAltitudeFuzz', 'Max Altitude Fuzziness',
+                        changeCommand=self.update_filter)
         self.endLayout()
         # slope filter attributes
         self.beginLayout('Slope', collapse=1)
@@ -183,15 +200,18 @@ class AEsporeNodeTemplate(AETemplate):
         self.addControl('maxSlope', 'Max Slope',
                         changeCommand=self.change_max_slope)
         self.addSeparator()
-        self.addControl('slopeFuzz', 'Slope Fuzziness')
+        self.addControl('slopeFuzz', 'Slope Fuzziness',
+                        changeCommand=self.update_filter)
         self.endLayout()
         self.endLayout()
+        self.callCustom(self.add_estimate_lbl, self.update_estimate_lbl, 'numSamples')
         self.callCustom(self.add_emit_btn, self.update_emit_btn, "emit")
         self.endLayout()
 
         # count layout
         self.beginLayout('Count', collapse=True)
         self.addControl('numSpores', label='Count')
+        self.addControl('displayFraction', label='Display Fraction')
         self.callCustom(self.add_clear_btn, self.update_clear_btn, 'clear')
         self.endLayout()
 
@@ -217,7 +237,8 @@ class AEsporeNodeTemplate(AETemplate):
         help_lbl = cmds.text(l='Select item(s) to specify an index',
                              align='left')
         scroll_list = cmds.textScrollList('instanceList', ams=True,
-                                          append=instanced_geo)
+                                          append=instanced_geo,
+                                          sc=pm.Callback(self.instance_selection_changed))
         add_btn = cmds.symbolButton('addInstanceBtn', width=30, i='setEdAddCmd.png',
                                     c=pm.Callback(self.add_instance),
                                     ann='Add Selected Object')
@@ -244,6 +265,8 @@ class AEsporeNodeTemplate(AETemplate):
                                     (scroll_list, 'left', 2),
                                     (scroll_list, 'bottom', 2)])
 
+        self.select_instances(self._node)
+
     def update_instance_list(self, *args):
         """ update the instance listi.
         1. try to get current node based on ae tab name. this failse if the
@@ -294,6 +317,7 @@ class AEsporeNodeTemplate(AETemplate):
             instanced_geo = ['[{}]: {}'.format(i, name) for i, name in enumerate(instanced_geo)]
 
             cmds.textScrollList('instanceList', e=1, append=instanced_geo)
+            self.select_instances(self._node)
         else:
             msg = 'Could not update objects list. Node name "{}" not unique'.format(current_tab)
             self.logger.warn(msg)
@@ -329,14 +353,140 @@ class AEsporeNodeTemplate(AETemplate):
                     if connection.split('.')[0] == instancer.split('|')[-1]:
                         cmds.disconnectAttr('{}.matrix'.format(obj_name), connection)
 
+        # the ids of the remaining instances changed
+        cmds.setAttr('{}.instanceMask'.format(self._node), [], type='Int32Array')
         self.update_instance_list()
 
+    def instance_selection_changed(self):
+        """ store the selected instances in the node's instance mask and
+        show their class radius """
+
+        selection = cmds.textScrollList('instanceList', q=True, sii=True) or []
+        cmds.setAttr('{}.instanceMask'.format(self._node),
+                     [i - 1 for i in selection], type='Int32Array')
+
+        if cmds.floatFieldGrp('classRadiusFld', exists=True):
+            self.update_class_radius_fld(self._node)
+
+    def select_instances(self, node):
+        """ select the instances stored in the node's instance mask """
+
+        num_items = cmds.textScrollList('instanceList', q=True, numberOfItems=True)
+        for instance_id in cmds.getAttr('{}.instanceMask'.format(node)) or []:
+            if instance_id < num_items:
+                cmds.textScrollList('instanceList', e=True, selectIndexedItem=instance_id + 1)
+
     def select_instancer(self):
         #  self._node = cmds.ls(sl=True, type='sporeNode')[-1]
 
         instancer = node_utils.get_instancer(self._node)
         cmds.select((instancer, self._node))
 
+    # ------------------------------------------------------------------------ #
+    # class radius
+    # ------------------------------------------------------------------------ #
+
+    def add_class_radius_fld(self, attr):
+        """ add a field editing the class radius of the selected instances """
+
+        cmds.floatFieldGrp('classRadiusFld', l='Class Radius', pre=3,
+                           cc=pm.Callback(self.set_class_radius),
+                           ann='Min distance between instances of the selected ids. 0 uses the Min Radius')
+        self.update_class_radius_fld(attr)
+
+    def update_class_radius_fld(self, attr):
+        """ show the class radius of the first selected instance """
+
+        node = attr.split('.')[0]
+        ids = self.get_selected_ids()
+        value = cmds.getAttr('{}.classRadius[{}]'.format(node, ids[0])) if ids else 0
+        emit_type = cmds.getAttr('{}.emitType'.format(node))
+        cmds.floatFieldGrp('classRadiusFld', e=True, v1=value, enable=emit_type == 7)
+
+    def set_class_radius(self):
+        """ set the class radius of all selected instances. if no instance
+        is selected the radius is set for all instances """
+
+        value = cmds.floatFieldGrp('classRadiusFld', q=True, v1=True)
+        for instance_id in self.get_selected_ids():
+            cmds.setAttr('{}.classRadius[{}]'.format(self._node, instance_id), value)
+        self.update_estimate(self._node)
+
+    def get_selected_ids(self):
+        """ return the ids of the selected instances or of all instances
+        if none is selected """
+
+        items = cmds.textScrollList('instanceList', q=True, si=True)\
+            or cmds.textScrollList('instanceList', q=True, ai=True) or []
+        ids = []
+        for item in items:
+            try:
+                ids.append(int(item.split(' ')[0].strip('[]:')))
+            except ValueError:
+                pass
+        return ids
+
+    # ------------------------------------------------------------------------ #
+    # emit estimate
+    # ------------------------------------------------------------------------ #
+
+    def add_estimate_lbl(self, attr):
+        """ add label showing the predicted outcome of the emit """
+
+        cmds.text('emitEstimateLbl', l='', align='left')
+        self.update_estimate(attr.split('.')[0])
+
+    def update_estimate_lbl(self, attr):
+        """ update the estimate label when the template switches nodes """
+
+        self.update_estimate(attr.split('.')[0])
+
+    def update_estimate(self, node):
+        """ run the sample command in estimate mode and display the
+        expected number of points, the peak memory and the runtime.
+        the estimate is not available while the geometry is not cached """
+
+        if not cmds.text('emitEstimateLbl', exists=True):
+            return
+
+        try:
+            result = cmds.sporeSampleCmd(node, estimate=True)
+        except RuntimeError as e:
+            self.logger.debug('Could not estimate emit: {}'.format(e))
+            result = None
+
+        if not result:
+            cmds.text('emitEstimateLbl', e=True, l='Estimate: not available')
+            return
+
+        count, low, high, memory, seconds = result
+        if seconds < 60:
+            duration = '{:.1f} s'.format(seconds)
+        else:
+            duration = '{:.0f} min'.format(seconds / 60)
+
+        label = 'Estimate: {:,} points ({:,} - {:,}), {:.0f} MB, {}'.format(
+            int(count), int(low), int(high), memory / 2.0 ** 20, duration)
+        cmds.text('emitEstimateLbl', e=True, l=label)
+
+    def update_filter(self, node):
+        """ filter the candidates of the last emit again and update the
+        estimate when a filter setting changes.
+        the refilter runs on every slider step, so it is kept out of the
+        undo queue. undoing the filter setting changes the attribute and
+        runs the refilter again """
+
+        undo_state = cmds.undoInfo(q=True, state=True)
+        cmds.undoInfo(stateWithoutFlush=False)
+        try:
+            cmds.sporeSampleCmd(node, refilter=True)
+        except RuntimeError as e:
+            self.logger.debug('Could not refilter emit: {}'.format(e))
+        finally:
+            cmds.undoInfo(stateWithoutFlush=undo_state)
+
+        self.update_estimate(node)
+
     # ------------------------------------------------------------------------ #
     # emit button
     # ------------------------------------------------------------------------ #
@@ -354,30 +504,13 @@ class AEsporeNodeTemplate(AETemplate):
         cmds.button('emitButton', e=True, c=self.emit)
 
     def emit(self, *args):
-        """ run the actual sample command and check if transforms are frozen """
+        """ run the actual sample command. the geo cache is stored in object
+        space, so the target's transforms don't need to be frozen """
 
         # exit spore context since it looses track of points after sampling
         if cmds.currentCtx().startswith('spore'):
             cmds.setToolTo('selectSuperContext')
 
-        in_mesh = node_utils.get_connected_in_mesh(self._node)
-        transform = cmds.listRelatives(in_mesh, p=True, f=True)[0]
-        if cmds.getAttr(transform + '.translateX') != 0\
-        or cmds.getAttr(transform + '.translateY') != 0\
-        or cmds.getAttr(transform + '.translateZ') != 0\
-        or cmds.getAttr(transform + '.rotateX') != 0\
-        or cmds.getAttr(transform + '.rotateY') != 0\
-        or cmds.getAttr(transform + '.rotateZ') != 0\
-        or cmds.getAttr(transform + '.scaleX') != 1\
-        or cmds.getAttr(transform + '.scaleY') != 1\
-        or cmds.getAttr(transform + '.scaleZ') != 1:
-            msg = 'Feeze transformations to sample the geomety!'
-            result = message_utils.IOHandler().confirm_dialog(msg, 'Freeze Transformations')
-            if result:
-                cmds.makeIdentity(transform, a=True, s=True, r=True, t=True, n=0)
-            else:
-                return
-
         cmds.setAttr('{}.emit'.format(self._node), 1)
         cmds.sporeSampleCmd()
 
@@ -502,28 +635,55 @@ class AEsporeNodeTemplate(AETemplate):
         self._node = node
         emit_type = cmds.getAttr('{}.emitType'.format(node))
 
-        if emit_type == 0:
+        if emit_type == 0 or emit_type == 5:
             self.dimControl(node, 'numSamples', False)
             self.dimControl(node, 'cellSize', True)
+            self.dimControl(node, 'stratified', True)
+            self.dimControl(node, 'densityMap', False)
             self.dimControl(node, 'minRadius', True)
             self.dimControl(node, 'minRadius2d', True)
+            self.dimControl(node, 'udimStart', True)
+            self.dimControl(node, 'udimEnd', True)
         elif emit_type == 1:
             self.dimControl(node, 'numSamples', True)
             self.dimControl(node, 'cellSize', False)
+            self.dimControl(node, 'stratified', False)
+            self.dimControl(node, 'densityMap', True)
             self.dimControl(node, 'minRadius', True)
             self.dimControl(node, 'minRadius2d', True)
+            self.dimControl(node, 'udimStart', True)
+            self.dimControl(node, 'udimEnd', True)
             self.estimate_num_samples(node)
-        elif emit_type == 2:
+        elif emit_type == 2 or emit_type == 6 or emit_type == 7:
             self.dimControl(node, 'numSamples', True)
             self.dimControl(node, 'cellSize', True)
+            self.dimControl(node, 'stratified', True)
+            self.dimControl(node, 'densityMap', True)
             self.dimControl(node, 'minRadius', False)
             self.dimControl(node, 'minRadius2d', True)
-            self.estimate_num_samples(node)
+            self.dimControl(node, 'udimStart', True)
+            self.dimControl(node, 'udimEnd', True)
         elif emit_type == 3:
             self.dimControl(node, 'numSamples', True)
             self.dimControl(node, 'cellSize', True)
+            self.dimControl(node, 'stratified', True)
+            self.dimControl(node, 'densityMap', True)
             self.dimControl(node, 'minRadius', True)
             self.dimControl(node, 'minRadius2d', False)
+            self.dimControl(node, 'udimStart', False)
+            self.dimControl(node, 'udimEnd', False)
+        elif emit_type == 4:
+            self.dimControl(node, 'numSamples', False)
+            self.dimControl(node, 'cellSize', True)
+            self.dimControl(node, 'stratified', True)
+            self.dimControl(node, 'densityMap', True)
+            self.dimControl(node, 'minRadius', True)
+            self.dimControl(node, 'minRadius2d', True)
+            self.dimControl(node, 'udimStart', True)
+            self.dimControl(node, 'udimEnd', True)
+
+        cmds.floatFieldGrp('classRadiusFld', e=True, enable=emit_type == 7)
+        self.update_estimate(node)
 
     def estimate_num_samples(self, node):
         """ estimate how many random samples we need for grid or disk sampling """
@@ -532,14 +692,13 @@ class AEsporeNodeTemplate(AETemplate):
         emit_type = cmds.getAttr('{}.emitType'.format(node))
         if emit_type == 1:
             cell_size = cmds.getAttr(self._node + '.cellSize')
-        elif emit_type == 2:
-            cell_size = cmds.getAttr(self._node + '.minRadius') / math.sqrt(3)
         else:
+            self.update_estimate(node)
             return
 
         in_mesh = node_utils.get_connected_in_mesh(self._node)
         area = cmds.polyEvaluate(in_mesh, worldArea=True)
-        cmds.setAttr(self._node + '.numSamples', int(area/cell_size) * 5)
+        cmds.setAttr(self._node + '.numSamples', int(area / cell_size ** 2) * 5)
 
 
     def change_min_altitude(self, node):
@@ -547,24 +706,28 @@ class AEsporeNodeTemplate(AETemplate):
         max_altitude = cmds.getAttr('{}.maxAltitude'.format(node))
         if min_altitude > max_altitude:
             cmds.setAttr('{}.maxAltitude'.format(node), min_altitude)
+        self.update_filter(node)
 
     def change_max_altitude(self, node):
         min_altitude = cmds.getAttr('{}.minAltitude'.format(node))
         max_altitude = cmds.getAttr('{}.maxAltitude'.format(node))
         if min_altitude > max_altitude:
             cmds.setAttr('{}.minAltitude'.format(node), max_altitude)
+        self.update_filter(node)
 
     def change_min_slope(self, node):
         min_slope = cmds.getAttr('{}.minSlope'.format(node))
         max_slope = cmds.getAttr('{}.maxSlope'.format(node))
         if min_slope > max_slope:
             cmds.setAttr('{}.maxSlope'.format(node), min_slope)
+        self.update_filter(node)
 
     def change_max_slope(self, node):
         min_slope = cmds.getAttr('{}.minSlope'.format(node))
         max_slope = cmds.getAttr('{}.maxSlope'.format(node))
         if min_slope > max_slope:
             cmds.setAttr('{}.minSlope'.format(node), max_slope)
+        self.update_filter(node)
 
 
     def use_pressure_cc(self, node):
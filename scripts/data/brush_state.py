@@ -4,6 +4,7 @@ import maya.cmds as cmds
 import maya.OpenMaya as om
 
 import window_utils
+import node_utils
 
 class BrushState(object):
     """ object hold the current brush state """
@@ -66,13 +67,8 @@ class BrushState(object):
     def get_brush_settings(self):
         """ fetch brush setting from the node and save it to the "state" dict """
 
-        # get selected item from node's textScrollList
-        sel = cmds.textScrollList('instanceList', q=True, si=True)
-        if sel:
-            object_index = [int(s.split(' ')[0].strip('[]:')) for s in sel]
-        else:
-            elements = cmds.textScrollList('instanceList', q=True, ai=True)
-            object_index = [int(e.split(' ')[0].strip('[]:')) for e in elements]
+        # get the instance ids from the node's instance mask
+        object_index = node_utils.get_instance_ids(self._node)
 
         # get modes
         modes = ['place', 'spray', 'scale', 'align', 'move', 'id', 'remove']
@@ -84,6 +80,7 @@ class BrushState(object):
         self.settings = {'mode': modes[mode_id],
                          'num_samples': cmds.getAttr('{}.numBrushSamples'.format(self._node)),
                          'min_distance': cmds.getAttr('{}.minDistance'.format(self._node)),
+                         'use_footprint': cmds.getAttr('{}.useFootprint'.format(self._node)),
                          'fall_off': cmds.getAttr('{}.fallOff'.format(self._node)),
                          'align_to': align_modes[align_id],
                          'strength': cmds.getAttr('{}.strength'.format(self._node)),
@@ -1,5 +1,8 @@
 import sys
 import math
+import ctypes
+import hashlib
+import threading
 import numpy as np
 
 try:
@@ -7,15 +10,20 @@ try:
 except ImportError:
     from scipy.spatial import cKDTree as kd_tree
 
+import maya.utils
 import maya.OpenMaya as om
 
 import logging_util
-#  import progress_bar
+import progress_bar
+import sample_utils
 
 
 class GeoCache(object):
     """
     container for cached triangulated geometry
+    all triangles are cached in object space. the world matrix is read from
+    the mesh's dag path whenever points are requested in world space.
+    therefore transforming the target mesh does not invalidate the cache.
     note: no extra type checking or error handling is done!
     """
 
@@ -24,205 +32,626 @@ class GeoCache(object):
         log_lvl = sys._global_spore_dispatcher.spore_globals['LOG_LEVEL']
         self.logger = logging_util.SporeLogger(__name__, log_lvl)
 
-        self.p0 = om.MPointArray()
-        self.p1 = om.MPointArray()
-        self.p2 = om.MPointArray()
-        self.normals = om.MVectorArray()
-        self.poly_id = om.MIntArray()
-        self.AB = om.MVectorArray()
-        self.AC = om.MVectorArray()
+        # indexed triangle mesh. vertices are shared between triangles and
+        # stored once. edges are derived on demand from the index buffer
+        self.vertices = np.empty((0, 3), dtype=np.float32)
+        self.triangles = np.empty((0, 3), dtype=np.int32)
+        self.normals = np.empty((0, 3), dtype=np.float32)
+        self.poly_id = np.empty(0, dtype=np.int32)
 
-        self.poly_verts = om.MPointArray()
+        # digest of the object space vertices used for validating the cache
+        self.digest = None
 
-        self.uv_kd_tree = None
-        self.neighbor_lookup = {}
+        # uv coordinates per triangle corner and a lookup of the uv
+        # centroids. only created on demand by create_uv_lookup
+        self.uvs = np.empty((0, 3, 2), dtype=np.float32)
+        self.uv_tri_ids = np.empty(0, dtype=int)
+        self.uv_grid = None
+
+        # vertex colors per triangle corner. created by create_color_lookup
+        self.colors = np.empty((0, 3, 3), dtype=np.float32)
+        self._vertex_normals = None
 
         self.mesh = None
         self.cached = True
-        self.weighted_ids = []
-
-    #  @progress_bar.ProgressBar('Caching Geometry...')
-    def cache_geometry(self, mesh):
-        """ cache the given geometry
+        self.cdf = np.empty(0)
+        self.centroid_tree = None
+        self._world_tree = None
+
+        # background builds. every build gets a new generation so deferred
+        # calls of an older build can be told apart and ignored
+        self._thread = None
+        self._cancel_event = threading.Event()
+        self._progress_bar = None
+        self._generation = 0
+
+        # True if the last background build was cancelled or failed
+        self.cancelled = False
+
+        # True if the mesh might have changed since it has been cached.
+        # set by the spore node when its input mesh is dirtied. unlike
+        # validate_cache this is free to check
+        self.dirty = True
+
+    def cache_geometry(self, mesh, asynchronous=False, callback=None):
+        """ cache the given geometry in object space.
+        only the extraction of the triangles is done through the maya api
+        on the main thread. computing areas, normals, the cdf and the
+        spatial lookup is pure numpy and can be done on a worker thread
         :param mesh: the mesh which will be cached
-        :type mesh: MDagPath to the mesh """
+        :type mesh: MDagPath to the mesh
+        :param asynchronous: build the cache on a worker thread. the
+                             previous cache stays in place until the new
+                             one has been built
+        :param callback: called on the main thread when the cache has been
+                         built successfully. only used if asynchronous """
 
-        self.flush_cache()
-        self.mesh = mesh
+        self.cancel()
+        self.cancelled = False
 
         self.logger.debug('Cache geometry: {}'.format(mesh.fullPathName())) # TODO - get node name
 
-        #  in_mesh = node_utils.get_connected_in_mesh(self.thisMObject(), False)
-        mesh_fn = om.MFnMesh(self.mesh)
-        #  num_polys = mesh_fn.numPolygons() # TODO - get in mesh fn
-        #  num_iter = num_polys / 100
+        vertices, triangles, poly_ids = self.extract_geometry(mesh)
+
+        # changes to the mesh from here on mark the new cache dirty
+        self.dirty = False
+
+        if asynchronous:
+            self._cancel_event = threading.Event()
+            self._progress_bar = progress_bar.ProgressBar('Caching Geometry...', interruptable=True)
+            self._progress_bar.run()
+
+            self._thread = threading.Thread(target=self._build_cache_async,
+                                            args=(mesh, vertices, triangles, poly_ids,
+                                                  callback, self._generation))
+            self._thread.daemon = True
+            self._thread.start()
+
+        else:
+            try:
+                self.build_cache(vertices, triangles, poly_ids, mesh=mesh)
+            except Exception:
+                self.dirty = True
+                raise
+
+    def extract_geometry(self, mesh=None):
+        """ read the vertices and the triangulation of a mesh in object
+        space. this is the only part of caching that touches the maya api
+        and therefore must run on the main thread
+        :param mesh: MDagPath to the mesh, the cached mesh if None
+        :return: (v, 3) float32 array of vertices, (n, 3) array of vertex
+                 indices per triangle, (n,) array of poly ids """
+
+        mesh_fn = om.MFnMesh(mesh or self.mesh)
+        vertices = self.get_points(mesh_fn)
+
+        tri_count = om.MIntArray()
+        tri_verts = om.MIntArray()
+        mesh_fn.getTriangles(tri_count, tri_verts)
+        triangles = np.array(list(tri_verts), dtype=np.int32).reshape(-1, 3)
+        poly_ids = np.repeat(np.arange(tri_count.length(), dtype=np.int32),
+                             list(tri_count))
+
+        return vertices, triangles, poly_ids
+
+    def build_cache(self, vertices, triangles, poly_ids, progress=None, mesh=None):
+        """ compute all derived triangle data from the extracted geometry.
+        this does not call into maya and is safe to run on a worker thread.
+        the results are only assigned once everything has been computed
+        so a cancelled build never leaves a half filled cache behind.
+        :param vertices: (v, 3) array of object space vertices
+        :param triangles: (n, 3) array of vertex indices per triangle
+        :param poly_ids: (n,) array of polygon ids
+        :param progress: optional callable receiving the progress in percent.
+                         if it returns False the build is cancelled
+        :param mesh: optional MDagPath of the mesh the geometry was
+                     extracted from. it replaces the cached mesh together
+                     with the arrays
+        :return: True if the cache has been built, False if cancelled
+        :raises RuntimeError: if the geometry has no surface area """
+
+        if progress is None:
+            progress = lambda value: True
+
+        digest = self.get_digest(vertices)
+        vertices = np.asarray(vertices, dtype=np.float32)
+        triangles = np.asarray(triangles, dtype=np.int32)
+
+        num_tris = len(triangles)
+        area = np.empty(num_tris)
+        normals = np.empty((num_tris, 3), dtype=np.float32)
+
+        # process the triangles in chunks to report progress, to give the
+        # user a chance to cancel and to keep temporary arrays small
+        chunk = 100000
+        for start in range(0, num_tris, chunk):
+            end = min(start + chunk, num_tris)
+            tris = triangles[start:end]
+            area[start:end], _, _, normals[start:end]\
+                = self.get_triangle_area(vertices[tris[:, 0]].astype(float),
+                                         vertices[tris[:, 1]].astype(float),
+                                         vertices[tris[:, 2]].astype(float))
+            if not progress(60 * end / max(num_tris, 1)):
+                return False
 
-        # store ferts for validating the cache later
-        mesh_fn.getPoints(self.poly_verts)
+        # triangles are picked by searching the cumulative area.
+        # degenerated triangles have zero area and are never picked
+        cdf = np.cumsum(area)
+        if not num_tris or not cdf[-1] > 0:
+            raise RuntimeError('Can\'t cache geometry without surface area. '
+                               'The mesh has {} triangles'.format(num_tris))
+        cdf /= cdf[-1]
+        if not progress(70):
+            return False
 
-        # get bb in world space
-        dag_fn = om.MFnDagNode(self.mesh)
-        bb = dag_fn.boundingBox()
-        inv_matrix = self.mesh.exclusiveMatrix()
-        bb.transformUsing(inv_matrix)
+        # spatial lookup of the triangle centroids
+        centroids = vertices[triangles].mean(axis=1)
+        centroid_tree = kd_tree(centroids)
+        if not progress(100):
+            return False
 
-        # initialize triangle data
-        tri_points = om.MPointArray()
-        vert_ids = om.MIntArray()
-        tris_area = []
-        smallest_tri = None
+        if mesh is not None:
+            self.mesh = mesh
+        self.vertices = vertices
+        self.triangles = triangles
+        self.normals = normals
+        self.poly_id = np.asarray(poly_ids, dtype=np.int32)
+        self.digest = digest
+        self.cdf = cdf
+        self.centroid_tree = centroid_tree
+        self._world_tree = None
+        self.uvs = np.empty((0, 3, 2), dtype=np.float32)
+        self.uv_tri_ids = np.empty(0, dtype=int)
+        self.uv_grid = None
+        self.colors = np.empty((0, 3, 3), dtype=np.float32)
+        self._vertex_normals = None
+        self.cached = True
 
-        # iter mesh
-        poly_iter = om.MItMeshPolygon(self.mesh)
-        while not poly_iter.isDone():
+        return True
 
-            # get face triangles
-            poly_index = poly_iter.index()
-            poly_iter.getTriangles(tri_points, vert_ids, om.MSpace.kWorld)
+    @staticmethod
+    def get_points(mesh_fn):
+        """ read the object space vertices of a mesh in bulk. the raw float
+        buffer of the mesh is wrapped with ctypes and copied at once instead
+        of converting every point through an MPointArray
+        :param mesh_fn: MFnMesh of the mesh
+        :return: (v, 3) float32 array of vertices """
 
-            # get triangle data
-            for i in xrange(tri_points.length() / 3):
-                p0 = tri_points[i * 3]
-                p1 = tri_points[i * 3 + 1]
-                p2 = tri_points[i * 3 + 2]
-                area, AB, AC, normal = self.get_triangle_area(p0, p1, p2)
+        num_vertices = mesh_fn.numVertices()
+        if not num_vertices:
+            return np.empty((0, 3), dtype=np.float32)
 
-                if area < smallest_tri or smallest_tri is None:
-                    smallest_tri = area
+        address = int(mesh_fn.getRawPoints())
+        buffer = (ctypes.c_float * (num_vertices * 3)).from_address(address)
+        return np.ctypeslib.as_array(buffer).reshape(-1, 3).copy()
 
-                tris_area.append(area)
-                self.cache = (p0, p1, p2, normal, poly_index, AB, AC)
+    @staticmethod
+    def get_digest(vertices):
+        """ return a digest of the given object space vertices.
+        the digest replaces a full copy of the vertices for validation """
 
-            # update progressbar
-            #  if poly_index >= num_iter:
-            #      self.cache_geometry.increment()
-            #      num_iter += num_polys / 100
+        vertices = np.ascontiguousarray(vertices, dtype=np.float32)
+        return hashlib.md5(vertices.tobytes()).hexdigest()
 
-            poly_iter.next()
+    def _build_cache_async(self, mesh, vertices, triangles, poly_ids, callback, generation):
+        """ worker thread entry point """
 
-        probability = [int(math.ceil(area / smallest_tri)) for area in tris_area]
-        [self.weighted_ids.extend([idx] * chance) for idx, chance in enumerate(probability)]
+        progress = lambda value: self._report_progress(value, generation)
+        try:
+            success = self.build_cache(vertices, triangles, poly_ids, progress, mesh)
+        except Exception as e:
+            self.logger.error('Failed to cache geometry: {}'.format(e))
+            success = False
 
-        self.cached = True
+        maya.utils.executeDeferred(self._finish_async, success, callback, generation)
 
-    def get_triangle_area(self, p0, p1, p2):
-        """
-        return size of a triangle and the vector p1-p0 and p2-p0
-        :param p0: MPoint 1
-        :param p1: MPoint 2
-        :param p2: MPoint 3
-        :return: triangle area, vector AB, vector AC, and the normalized triangle normal
-        """
+    def _report_progress(self, value, generation):
+        """ called from the worker thread. the progress bar is only ever
+        touched on the main thread """
 
-        AB = om.MVector(p1 - p0)
-        AC = om.MVector(p2 - p0)
+        if self._cancel_event.is_set() or generation != self._generation:
+            return False
 
-        normal = (AB ^ AC)
+        maya.utils.executeDeferred(self._update_progress, value, generation)
+        return True
 
-        # actually the real surface area is area/2
-        # but since all tris are handled the same way it does not make any difference
-        # hence I can save computation by omitting area/2
-        area = math.sqrt(normal[0] ** 2 + normal[1] ** 2 + normal[2] ** 2)
+    def _update_progress(self, value, generation):
+        """ update the progress bar and check for user interruption """
 
-        normal.normalize()
+        if self._progress_bar is None or generation != self._generation:
+            return
 
-        return area, AB, AC, normal
+        if self._progress_bar.interrupted():
+            self._cancel_event.set()
+        else:
+            self._progress_bar.set_progress(value)
 
-    def create_uv_lookup(self):
-        """ create a dict with an entry for every vertex and a list of
-        neighbouring faces as well as a kd tree tro look up close face ids """
+    def _finish_async(self, success, callback, generation):
+        """ called on the main thread after the worker has finished.
+        calls queued by a build that has been superseded are ignored """
 
-        self.logger.debug('Create UV lookup for the current GeoCache')
+        if generation != self._generation:
+            return
 
-        util = om.MScriptUtil()
-        connected_faces = om.MIntArray()
+        if self._progress_bar:
+            self._progress_bar.stop()
+            self._progress_bar = None
 
-        mesh_fn = om.MFnMesh(self.mesh)
-        num_verts = mesh_fn.numVertices()
-        points = np.zeros(shape=(num_verts, 2))
+        if success:
+            self.logger.debug('Finished caching geometry')
+            if callback:
+                callback()
+        else:
+            self.cancelled = True
+            self.dirty = True
+            self.logger.info('Geometry caching has been cancelled or failed. '
+                             'The geometry will be cached on the next emit')
 
-        vert_iter = om.MItMeshVertex(self.mesh)
-        while not vert_iter.isDone():
+    @property
+    def is_caching(self):
+        """ True while a worker thread is building the cache """
 
-            index = vert_iter.index()
-            vert_iter.getConnectedFaces(connected_faces)
-            self.neighbor_lookup[index] = [connected_faces[i] for i in xrange(connected_faces.length())]
+        return self._thread is not None and self._thread.is_alive()
 
-            util.createFromDouble(0.0, 0.0)
-            uv_ptr = util.asFloat2Ptr()
-            vert_iter.getUV(uv_ptr)
-            u_coord = util.getFloat2ArrayItem(uv_ptr, 0, 0)
-            v_coord = util.getFloat2ArrayItem(uv_ptr, 0, 1)
-            points[index] = (u_coord, v_coord)
+    def wait(self):
+        """ block until a running background cache build has finished """
 
-            vert_iter.next()
+        if self.is_caching:
+            self._thread.join()
 
-        self.uv_kd_tree = kd_tree(points)
+    def cancel(self):
+        """ cancel a running background cache build and wait for the
+        worker to stop. pending deferred calls of the build are ignored.
+        the previous cache state is left untouched """
 
-    def get_close_face_ids(self, u_coord, v_coord):
-        """ get a list of neighbour face ids to the give u and v coords """
+        if self.is_caching:
+            self._cancel_event.set()
+            self._thread.join()
 
-        distance, index = self.uv_kd_tree.query((u_coord, v_coord), 1)
-        return self.neighbor_lookup[index]
+        self._generation += 1
+        if self._progress_bar:
+            self._progress_bar.stop()
+            self._progress_bar = None
 
+    def get_corners(self, ids=None):
+        """ return the corners of the given triangles in object space
+        :param ids: optional triangle ids, all triangles if None
+        :return: three (n, 3) arrays p0, p1, p2 """
 
-    def validate_cache(self):
-        """ check if the current cache is valid """
+        triangles = self.triangles if ids is None else self.triangles[ids]
+        return self.vertices[triangles[..., 0]].astype(float),\
+            self.vertices[triangles[..., 1]].astype(float),\
+            self.vertices[triangles[..., 2]].astype(float)
 
-        points = om.MPointArray()
-        mesh_fn = om.MFnMesh(self.mesh)
-        mesh_fn.getPoints(points)
+    def get_edges(self, ids=None):
+        """ return the edge vectors AB and AC of the given triangles.
+        edges are not stored but derived from the index buffer
+        :param ids: optional triangle ids, all triangles if None
+        :return: two (n, 3) arrays AB, AC """
 
-        if points.length() != self.poly_verts.length():
-            self.logger.debug('Validate GeoCache succeded')
-            return False
+        p0, p1, p2 = self.get_corners(ids)
+        return p1 - p0, p2 - p0
 
-        for i in xrange(points.length()):
-            if points[i] != self.poly_verts[i]:
-                self.logger.debug('Validate GeoCache failed')
-                return False
+    @property
+    def p0(self):
+        return self.get_corners()[0]
 
-        return True
+    @property
+    def p1(self):
+        return self.get_corners()[1]
 
+    @property
+    def p2(self):
+        return self.get_corners()[2]
 
-        """
-        index = 0
-        tri_points = om.MPointArray()
-        tri_ids = om.MIntArray()
-        poly_iter = om.MItMeshPolygon(self.mesh)
-        while not poly_iter.isDone():
-
-            # get face triangles
-            poly_index = poly_iter.index()
-            poly_iter.getTriangles(tri_points, tri_ids, om.MSpace.kWorld)
-
-            # get triangle data
-            for i in xrange(tri_points.length() / 3):
-                #  assert self.p0[i * 3] == tri_points[i * 3]
-                #  assert self.p1[i * 3 + 1] == tri_points[i * 3 + 1]
-                #  assert self.p2[i * 3 + 2] == tri_points[i * 3 + 2]
-                print self.p0[i*3].x, tri_points[i*3].x
-                print self.p0[i*3].y, tri_points[i*3].y
-                print self.p0[i*3].z, tri_points[i*3].z
-                print '-'
-                print self.p0[i*3+1].x, tri_points[i*3+1].x
-                print self.p0[i*3+1].y, tri_points[i*3+1].y
-                print self.p0[i*3+1].z, tri_points[i*3+1].z
-                print '-'
-                print self.p0[i*3+2].x, tri_points[i*3+2].x
-                print self.p0[i*3+2].y, tri_points[i*3+2].y
-                print self.p0[i*3+2].z, tri_points[i*3+2].z
-                #  except AssertionError:
-                #      return False
-
-                index += 1
-
-            poly_iter.next()
+    @property
+    def AB(self):
+        return self.get_edges()[0]
 
-        return True
+    @property
+    def AC(self):
+        return self.get_edges()[1]
+
+    def get_triangle_area(self, p0, p1, p2):
         """
+        return size of the given triangles and the vectors p1-p0 and p2-p0
+        :param p0: (n, 3) array of first triangle corners
+        :param p1: (n, 3) array of second triangle corners
+        :param p2: (n, 3) array of third triangle corners
+        :return: triangle area, vector AB, vector AC, and the normalized triangle normal
+        """
+
+        AB = p1 - p0
+        AC = p2 - p0
 
+        normal = np.cross(AB, AC)
+
+        # actually the real surface area is area/2
+        # but since all tris are handled the same way it does not make any difference
+        # hence I can save computation by omitting area/2
+        area = np.sqrt(np.sum(normal ** 2, axis=1))
 
+        normal = normal / np.maximum(area, 1e-12)[:, np.newaxis]
+
+        return area, AB, AC, normal
+
+    ################################################################################################
+    # world space
+    ################################################################################################
+
+    def get_world_matrix(self):
+        """ return the world matrix of the cached mesh as 4x4 numpy array.
+        the matrix is read from the dag path on every call since the
+        transform of the mesh is not part of the cache """
+
+        matrix = self.mesh.inclusiveMatrix()
+        return np.array([[matrix(row, col) for col in xrange(4)] for row in xrange(4)])
+
+    def to_world(self, points, matrix=None):
+        """ transform the given object space points to world space
+        :param points: (n, 3) array of object space positions
+        :param matrix: optional 4x4 world matrix, fetched from the mesh if None
+        :return: (n, 3) array of world space positions """
+
+        if matrix is None:
+            matrix = self.get_world_matrix()
+
+        return np.dot(points, matrix[:3, :3]) + matrix[3, :3]
+
+    def normals_to_world(self, normals, matrix=None):
+        """ transform the given object space normals to world space using
+        the inverse transpose of the world matrix
+        :param normals: (n, 3) array of object space normals
+        :param matrix: optional 4x4 world matrix, fetched from the mesh if None
+        :return: (n, 3) array of normalized world space normals """
+
+        if matrix is None:
+            matrix = self.get_world_matrix()
+
+        normals = np.dot(normals, np.linalg.inv(matrix[:3, :3]).T)
+        length = np.sqrt(np.sum(normals ** 2, axis=1))
+        return normals / np.maximum(length, 1e-12)[:, np.newaxis]
+
+    def get_surface_area(self, matrix=None, ids=None):
+        """ return the world space surface area of the cached mesh
+        :param matrix: optional 4x4 world matrix, fetched from the mesh if None
+        :param ids: optional triangle ids, all triangles if None """
+
+        p0, p1, p2 = self.get_corners(ids)
+        p0, p1, p2 = [self.to_world(p, matrix) for p in (p0, p1, p2)]
+        area, _, _, _ = self.get_triangle_area(p0, p1, p2)
+        return area.sum() / 2
+
+    def get_centroid_tree(self, matrix=None):
+        """ return a kd tree of the triangle centroids in world space.
+        the tree is kept until the world matrix of the mesh changes
+        :param matrix: optional 4x4 world matrix, fetched from the mesh if None """
+
+        if matrix is None:
+            matrix = self.get_world_matrix()
+
+        if (matrix == np.identity(4)).all():
+            return self.centroid_tree
+
+        if self._world_tree is None or not (self._world_tree[0] == matrix).all():
+            centroids = self.to_world(self.vertices[self.triangles].mean(axis=1), matrix)
+            self._world_tree = (matrix, kd_tree(centroids))
+
+        return self._world_tree[1]
+
+    def get_bounding_box(self):
+        """ return the world space bounding box of the cached mesh
+        :return: MBoundingBox """
+
+        bb = om.MFnDagNode(self.mesh).boundingBox()
+        bb.transformUsing(self.mesh.inclusiveMatrix())
+        return bb
+
+    def get_corner_face_vertices(self, mesh_fn):
+        """ return the face vertex index of every triangle corner.
+        the face vertex of each corner is found by searching the
+        (polygon, vertex) pairs of all face vertices
+        :param mesh_fn: MFnMesh of the cached mesh
+        :return: (n, 3) array of face vertex indices, (p,) array of
+                 vertices per polygon """
+
+        vertex_count = om.MIntArray()
+        vertex_list = om.MIntArray()
+        mesh_fn.getVertices(vertex_count, vertex_list)
+        vertex_count = np.array(list(vertex_count), dtype=int)
+        face_vertices = np.array(list(vertex_list), dtype=int)
+
+        num_verts = len(self.vertices)
+        keys = np.repeat(np.arange(len(vertex_count)), vertex_count) * num_verts + face_vertices
+        order = np.argsort(keys, kind='mergesort')
+        tri_keys = self.poly_id.astype(int)[:, np.newaxis] * num_verts + self.triangles
+        return order[np.searchsorted(keys[order], tri_keys)], vertex_count
+
+    def create_uv_lookup(self, uv_set=None):
+        """ cache the uv coordinates of every triangle corner and build a
+        kd tree of the uv centroids of all mapped triangles.
+        :param uv_set: name of the uv set, the current uv set if None """
+
+        self.logger.debug('Create UV lookup for the current GeoCache')
+
+        mesh_fn = om.MFnMesh(self.mesh)
+        if uv_set is None:
+            uv_set = mesh_fn.currentUVSetName()
+
+        corners, vertex_count = self.get_corner_face_vertices(mesh_fn)
+        uv_count = om.MIntArray()
+        uv_list = om.MIntArray()
+        mesh_fn.getAssignedUVs(uv_count, uv_list, uv_set)
+        u_array = om.MFloatArray()
+        v_array = om.MFloatArray()
+        mesh_fn.getUVs(u_array, v_array, uv_set)
+
+        uv_coords = np.column_stack((list(u_array), list(v_array))).astype(np.float32)
+
+        # faces without uvs have no entry in the uv list
+        mapped = np.array(list(uv_count), dtype=int) == vertex_count
+        face_uvs = np.full(vertex_count.sum(), -1, dtype=int)
+        face_uvs[np.repeat(mapped, vertex_count)] = list(uv_list)
+        corner_uvs = face_uvs[corners]
+
+        self.uv_tri_ids = np.flatnonzero((corner_uvs >= 0).all(axis=1))
+        self.uvs = np.zeros((len(self.triangles), 3, 2), dtype=np.float32)
+        if len(uv_coords):
+            self.uvs[self.uv_tri_ids] = uv_coords[corner_uvs[self.uv_tri_ids]]
+
+        self.uv_grid = None
+        if len(self.uv_tri_ids):
+            self.uv_grid = sample_utils.TriangleGrid(self.uvs, self.uv_tri_ids)
+
+    def get_uv_area(self, udim_start=1001, udim_end=1001, ids=None):
+        """ return the uv space area of all mapped triangles whose uv
+        centroid lies in the given range of udim tiles
+        :param ids: optional triangle ids, all triangles if None """
+
+        if len(self.uvs) != len(self.triangles):
+            self.create_uv_lookup()
+
+        tri_ids = self.uv_tri_ids
+        if ids is not None:
+            tri_ids = tri_ids[np.in1d(tri_ids, ids)]
+
+        uvs = self.uvs[tri_ids].astype(float)
+        ab = uvs[:, 1] - uvs[:, 0]
+        ac = uvs[:, 2] - uvs[:, 0]
+        area = np.abs(ab[:, 0] * ac[:, 1] - ab[:, 1] * ac[:, 0]) / 2
+
+        centroid = np.floor(uvs.mean(axis=1)).astype(int)
+        tile = 1001 + centroid[:, 0] + 10 * centroid[:, 1]
+        return area[(tile >= udim_start) & (tile <= udim_end)].sum()
+
+    def create_color_lookup(self, color_set=None):
+        """ cache the vertex colors of every triangle corner.
+        unset colors are stored as black
+        :param color_set: name of the color set, the current color set if None """
+
+        self.logger.debug('Create color lookup for the current GeoCache')
+
+        mesh_fn = om.MFnMesh(self.mesh)
+        if color_set is None:
+            color_set = mesh_fn.currentColorSetName()
+
+        colors = om.MColorArray()
+        if color_set:
+            mesh_fn.getFaceVertexColors(colors, color_set)
+
+        if not colors.length():
+            self.logger.warn('No vertex colors found on {}'.format(self.mesh.fullPathName()))
+            self.colors = np.zeros((len(self.triangles), 3, 3), dtype=np.float32)
+            return
+
+        corners, _ = self.get_corner_face_vertices(mesh_fn)
+        face_colors = np.array([(colors[i].r, colors[i].g, colors[i].b)
+                                for i in xrange(colors.length())], dtype=np.float32)
+        self.colors = np.maximum(face_colors, 0)[corners]
+
+    def get_colors(self, tri_ids, bary):
+        """ interpolate the corner colors of the given triangles at the
+        given barycentric coordinates. the color lookup is created on first use
+        :param tri_ids: (n,) array of triangle ids
+        :param bary: (n, 2) array of r, s weights for the edges AB, AC
+        :return: (n, 3) array of rgb colors """
+
+        if len(self.colors) != len(self.triangles):
+            self.create_color_lookup()
+
+        corners = self.colors[tri_ids].astype(float)
+        return sample_utils.interpolate(corners[:, 0], corners[:, 1], corners[:, 2], bary)
+
+    def get_triangles_at_uv(self, uvs):
+        """ find the triangles containing the given uv coordinates.
+        create_uv_lookup must be called first
+        :param uvs: (n, 2) array of uv coordinates
+        :return: (n,) triangle ids, -1 for uvs outside of all triangles
+                 and (n, 2) barycentric coordinates """
+
+        if self.uv_grid is None:
+            return np.full(len(uvs), -1, dtype=int), np.zeros((len(uvs), 2))
+
+        return sample_utils.locate_uvs(uvs, self.uvs, self.uv_grid)
+
+    def get_uvs(self, tri_ids, bary):
+        """ interpolate the corner uvs of the given triangles at the given
+        barycentric coordinates. the uv lookup is created on first use.
+        triangles without uvs return (0, 0)
+        :param tri_ids: (n,) array of triangle ids
+        :param bary: (n, 2) array of r, s weights for the edges AB, AC
+        :return: (n, 2) array of uv coordinates """
+
+        if len(self.uvs) != len(self.triangles):
+            self.create_uv_lookup()
+
+        corners = self.uvs[tri_ids].astype(float)
+        return sample_utils.interpolate(corners[:, 0], corners[:, 1], corners[:, 2], bary)
+
+    def get_closest_triangles(self, points, matrix=None):
+        """ find the triangles closest to the given world space points.
+        the points are moved to object space and projected onto the
+        triangles with the nearest centroids. points that already lie on
+        the surface map to their exact triangle for any world matrix
+        :param points: (n, 3) array of world space positions
+        :param matrix: optional 4x4 world matrix, fetched from the mesh if None
+        :return: (n,) triangle ids and (n, 2) barycentric coordinates """
+
+        if matrix is None:
+            matrix = self.get_world_matrix()
+
+        points = np.dot(np.asarray(points, dtype=float) - matrix[3, :3],
+                        np.linalg.inv(matrix[:3, :3]))
+        tri_ids, bary, _ = sample_utils.project_to_surface(points,
+                                                           self.vertices,
+                                                           self.triangles,
+                                                           self.centroid_tree)
+        return tri_ids, bary
+
+    def get_vertex_normals(self):
+        """ return area weighted vertex normals in object space.
+        vertex normals are derived from the triangle normals on demand """
+
+        if self._vertex_normals is None:
+            p0, p1, p2 = self.get_corners()
+            area, _, _, _ = self.get_triangle_area(p0, p1, p2)
+            weighted = self.normals * area[:, np.newaxis]
+
+            normals = np.zeros((len(self.vertices), 3))
+            for i in range(3):
+                np.add.at(normals, self.triangles[:, i], weighted)
+
+            length = np.sqrt(np.sum(normals ** 2, axis=1))
+            self._vertex_normals = normals / np.maximum(length, 1e-12)[:, np.newaxis]
+
+        return self._vertex_normals
+
+    def interpolate_normals(self, tri_ids, bary):
+        """ return smooth object space normals at the given barycentric
+        coordinates of the given triangles
+        :param tri_ids: (n,) array of triangle ids
+        :param bary: (n, 2) array of r, s weights for the edges AB, AC
+        :return: (n, 3) array of normalized normals """
+
+        corners = self.get_vertex_normals()[self.triangles[tri_ids]]
+        normals = sample_utils.interpolate(corners[:, 0], corners[:, 1], corners[:, 2], bary)
+        length = np.sqrt(np.sum(normals ** 2, axis=1))
+        return normals / np.maximum(length, 1e-12)[:, np.newaxis]
+
+    def validate_cache(self):
+        """ check if the current cache is valid. only object space points
+        are compared, so transforming the mesh keeps the cache valid """
+
+        if not self.cached:
+            return False
+
+        vertices = self.get_points(om.MFnMesh(self.mesh))
+        if self.get_digest(vertices) != self.digest:
+            self.logger.debug('Validate GeoCache failed')
+            return False
+
+        self.dirty = False
+        return True
 
     ################################################################################################
     # cache property
@@ -231,63 +660,40 @@ class GeoCache(object):
     @property
     def cache(self):
         """ cache getter
-        :return:    tuple of entire geo cache:
+        :return:    tuple of entire geo cache in object space:
         id  content           data type
-        0 - p0              - MPointArray
-        1 - p2              - MPointArray
-        2 - p1              - MPointArray
-        3 - face normal     - MVectorArray
-        4 - polygon id      - MIntArray
-        5 - vector AB       - MVectorArray
-        6 - vector AC       - MvectorArray
+        0 - vertices        - (v, 3) float32 array
+        1 - triangles       - (n, 3) int32 array of vertex indices
+        2 - face normal     - (n, 3) float32 array
+        3 - polygon id      - (n,) int32 array
+        4 - area cdf        - (n,) float64 array
         """
 
-        return self.p0,\
-                self.p1,\
-                self.p2,\
+        return self.vertices,\
+                self.triangles,\
                 self.normals,\
                 self.poly_id,\
-                self.AB,\
-                self.AC
-
-    @cache.setter
-    def cache(self, triangle):
-        """ cache setter
-        append one triangle to the end of the current cache
-        :param triangle:    argument must be of type tuple or list
-        it must consist of the following items in the exact same order:
-        id  content           data type
-        0 - p0              - MPointArray
-        1 - p2              - MPointArray
-        2 - p1              - MPointArray
-        3 - face normal     - MVectorArray
-        4 - polygon id      - MIntArray
-        5 - vector AB       - MVectorArray
-        6 - vector AC       - MvectorArray
-        note: no error or type checking is done!
-        """
-
-        self.p0.append(triangle[0])
-        self.p1.append(triangle[1])
-        self.p2.append(triangle[2])
-        self.normals.append(triangle[3])
-        self.poly_id.append(int(triangle[4]))
-        self.AB.append(triangle[5])
-        self.AC.append(triangle[6])
+                self.cdf
 
     def flush_cache(self):
 
         self.logger.debug('Flush GeoCache')
-        self.p0 = om.MPointArray()
-        self.p1 = om.MPointArray()
-        self.p2 = om.MPointArray()
-        self.normals = om.MVectorArray()
-        self.poly_id = om.MIntArray()
-        self.AB = om.MVectorArray()
-        self.AC = om.MVectorArray()
+        self.vertices = np.empty((0, 3), dtype=np.float32)
+        self.triangles = np.empty((0, 3), dtype=np.int32)
+        self.normals = np.empty((0, 3), dtype=np.float32)
+        self.poly_id = np.empty(0, dtype=np.int32)
+        self.digest = None
+        self.cdf = np.empty(0)
+        self.centroid_tree = None
+        self._world_tree = None
+        self.uvs = np.empty((0, 3, 2), dtype=np.float32)
+        self.uv_tri_ids = np.empty(0, dtype=int)
+        self.uv_grid = None
+        self.colors = np.empty((0, 3, 3), dtype=np.float32)
+        self._vertex_normals = None
         self.cached = False
+        self.dirty = True
 
 
     def __len__(self):
-        return p0.length()
-
+        return len(self.triangles)
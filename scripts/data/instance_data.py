@@ -1,5 +1,6 @@
 import sys
 import time
+import ctypes
 
 import maya.cmds as cmds
 import maya.OpenMaya as om
@@ -14,6 +15,7 @@ except ImportError:
 import node_utils
 import window_utils
 import logging_util
+import transform_utils
 
 
 
@@ -48,9 +50,15 @@ class InstanceData(object):
         self.poly_id = om.MIntArray()
         self.color = om.MVectorArray()
         self.unique_id = om.MIntArray()
+        self.display_rank = om.MDoubleArray()
 
         self.exclusive_paint = []
 
+        # share of the points passed on to the instancer
+        self.display_fraction = 1.0
+        self.display_object = None
+        self.displayed_fraction = None
+
         # collect points for kd tree
         self.np_position = np.empty((0,3), float)
         self.tree = None
@@ -78,13 +86,12 @@ class InstanceData(object):
         self.poly_id = array_attr_fn.intArray('poly_id')
         self.color = array_attr_fn.vectorArray('color')
         self.unique_id = array_attr_fn.intArray('unique_id')
+        self.display_rank = array_attr_fn.doubleArray('display_rank')
 
         # TODO - set bb
 
         # get position as numpy array
-        for i in xrange(self.position.length()):
-            position = [[self.position[i].x, self.position[i].y, self.position[i].z]]
-            self.np_position = np.append(self.np_position, position, axis=0)
+        self.np_position = from_vector_array(self.position)
 
         self.logger.debug('Initialize InstanceData object for: {}'.format(self.node_name))
 
@@ -92,7 +99,8 @@ class InstanceData(object):
         """ set the currently cached point data as node instanceData attribute
         and refresh the view to make changes visible """
 
-        self.data_plug.setMObject(self.data_object)
+        self.display_object = None
+        self.data_plug.setMObject(self.get_display_object())
         view = window_utils.active_view()
         view.refresh(True, False)
 
@@ -107,6 +115,37 @@ class InstanceData(object):
 
         return self.data_object
 
+    def get_display_object(self):
+        """ return the mObject passed on to the instancer. if the display
+        fraction is below 1 only points whose display rank does not exceed
+        the fraction are visible. emit ranks its points by their position
+        in the emit, and adds the points of blue noise and stratified samplers
+        in progressive order, so the visible points cover the entire emit.
+        brushed points have rank 0 and are always displayed.
+        the object is cached until set_state is called or the fraction
+        changes
+        :return mObject: """
+
+        if self.display_fraction >= 1:
+            return self.data_object
+
+        if self.display_object is not None \
+                and self.displayed_fraction == self.display_fraction:
+            return self.display_object
+
+        array_attr_fn = om.MFnArrayAttrsData()
+        self.display_object = array_attr_fn.create()
+        self.displayed_fraction = self.display_fraction
+        array_attr_fn.vectorArray('position').copy(self.position)
+        array_attr_fn.vectorArray('scale').copy(self.scale)
+        array_attr_fn.vectorArray('rotation').copy(self.rotation)
+        array_attr_fn.intArray('objectIndex').copy(self.instance_id)
+
+        visibility = (from_int_array(self.visibility) != 0)\
+            & (from_double_array(self.display_rank) <= self.display_fraction)
+        array_attr_fn.intArray('visibility').copy(to_int_array(visibility))
+
+        return self.display_object
 
     def append_points(self, position, scale, rotation, instance_id, visibility, normal, tangent, u_coord, v_coord, poly_id, color):
         """ append the given array to the instance data object
@@ -136,6 +175,7 @@ class InstanceData(object):
             self.v_coord.append(v_coord[i])
             self.poly_id.append(poly_id[i])
             self.color.append(color[i])
+            self.display_rank.append(0.0)
 
             # append position to numpy array
             np_position = [[position[i].x, position[i].y, position[i].z]]
@@ -150,7 +190,7 @@ class InstanceData(object):
     def set_points(self, index, position=None, scale=None, rotation=None,
                    instance_id=None, visibility=None, normal=None,
                    tangent=None, u_coord=None, v_coord=None, poly_id=None,
-                   color=None):
+                   color=None, display_rank=None):
         """ set points identified by the given index(s) for the given array(s)
         if an index is not within the bounds of the instance data object
         the operation will fail. if length of the given arrays is not the same
@@ -166,7 +206,8 @@ class InstanceData(object):
         :param u_coord MDoubleArray
         :param v_coord MDoubleArray
         :param poly_id MIntArray
-        :param color MVectorArray """
+        :param color MVectorArray
+        :param display_rank MDoubleArray """
 
         # check input
         try:
@@ -192,6 +233,8 @@ class InstanceData(object):
                 assert len(index) == poly_id.length()
             if color:
                 assert len(index) == color.length()
+            if display_rank:
+                assert len(index) == display_rank.length()
         except AssertionError:
             self.logger.error('Could not set points: Array length does not match'.format(self.node_name))
             return
@@ -201,6 +244,14 @@ class InstanceData(object):
                 self.logger.error('Could not set points: Operation would generate null pointer')
                 return
 
+        # contiguous ranges, like the points appended by emit, are written
+        # in bulk instead of point by point
+        if len(index) > 1 and np.array_equal(index, np.arange(index[0], index[0] + len(index))):
+            self.set_range(index[0], index[0] + len(index), position, scale,
+                           rotation, instance_id, visibility, normal, tangent,
+                           u_coord, v_coord, poly_id, color, display_rank)
+            return
+
         # set points
         for i in xrange(len(index)):
             if position:
@@ -228,9 +279,44 @@ class InstanceData(object):
                 self.poly_id.set(poly_id[i], index[i])
             if color:
                 self.color.set(color[i], index[i])
+            if display_rank:
+                self.display_rank.set(display_rank[i], index[i])
 
             self.unique_id.set(index[i], index[i])
 
+    def set_range(self, start, end, position=None, scale=None,
+                  rotation=None, instance_id=None, visibility=None,
+                  normal=None, tangent=None, u_coord=None, v_coord=None,
+                  poly_id=None, color=None, display_rank=None):
+        """ set the points from start to end to the given arrays.
+        every array is copied out to numpy, updated and copied back at once.
+        no checks are done, use set_points instead """
+
+        for target, source, from_array, to_array in (
+                (self.position, position, from_vector_array, to_vector_array),
+                (self.scale, scale, from_vector_array, to_vector_array),
+                (self.rotation, rotation, from_vector_array, to_vector_array),
+                (self.instance_id, instance_id, from_int_array, to_int_array),
+                (self.visibility, visibility, from_int_array, to_int_array),
+                (self.normal, normal, from_vector_array, to_vector_array),
+                (self.tangent, tangent, from_vector_array, to_vector_array),
+                (self.u_coord, u_coord, from_double_array, to_double_array),
+                (self.v_coord, v_coord, from_double_array, to_double_array),
+                (self.poly_id, poly_id, from_int_array, to_int_array),
+                (self.color, color, from_vector_array, to_vector_array),
+                (self.display_rank, display_rank, from_double_array, to_double_array)):
+            if source:
+                values = from_array(target)
+                values[start:end] = from_array(source)
+                target.copy(to_array(values))
+
+        if position:
+            self.np_position[start:end] = from_vector_array(position)
+
+        unique_id = from_int_array(self.unique_id)
+        unique_id[start:end] = np.arange(start, end)
+        self.unique_id.copy(to_int_array(unique_id))
+
     def set_length(self, length):
         """ set the instance data arrays to the given length
         do nothing when the given length is shorter than the current
@@ -252,6 +338,7 @@ class InstanceData(object):
         self.poly_id.setLength(length)
         self.color.setLength(length)
         self.unique_id.setLength(length)
+        self.display_rank.setLength(length)
         self.np_position.resize(length, 3, refcheck=False)
 
     def set_point(self, index, position, scale, rotation, instance_id,
@@ -296,6 +383,7 @@ class InstanceData(object):
         self.poly_id.insert(poly_id, index)
         self.color.insert(color, index)
         self.unique_id.insert(index, index)
+        self.display_rank.insert(0.0, index)
         self.np_position = np.insert(self.np_position, index, [position.x,
                                                                position.y,
                                                                position.z],
@@ -319,10 +407,7 @@ class InstanceData(object):
         t1 = time.time()
 
         if refresh_position:
-            self.np_position = np.empty((0, 3), float)
-            for i in xrange(self.position.length()):
-                position = [[self.position[i].x, self.position[i].y, self.position[i].z]]
-                self.np_position = np.append(self.np_position, position, axis=0)
+            self.np_position = from_vector_array(self.position)
 
         self.tree = kd_tree(self.np_position)
 
@@ -386,6 +471,17 @@ class InstanceData(object):
         else:
             return list(neighbours)
 
+    def get_footprints(self, prototype_radii):
+        """ return the positions and footprint radii of all visible points
+        :param prototype_radii: (p,) array of footprint radii per prototype
+        :return: (n, 3) array of positions, (n,) array of radii """
+
+        visible = from_int_array(self.visibility).astype(bool)
+        instance_id = from_int_array(self.instance_id)
+        scale = from_vector_array(self.scale)
+        radius = transform_utils.footprint_radius(prototype_radii, instance_id, scale)
+        return self.np_position[visible], radius[visible]
+
     def is_valid(self):
         """ check if the internal data is in sync. otherwise try to
         repair some of the arrays if possible. """
@@ -449,6 +545,14 @@ class InstanceData(object):
             )
             self.unique_id.setLength(len(self))
             [self.unique_id.set(i, i) for i in range(len(self))]
+        try:
+            assert len(self) == self.display_rank.length()
+        except AssertionError:
+            self.logger.warn(
+                'InstanceData validation faild. Trying to repair display rank...'
+            )
+            self.display_rank.setLength(len(self))
+            [self.display_rank.set(0, i) for i in range(len(self))]
 
         return True
 
@@ -486,9 +590,31 @@ class InstanceData(object):
                 self.poly_id.remove(index)
                 self.color.remove(index)
                 self.unique_id.remove(index)
+                self.display_rank.remove(index)
                 self.np_position = np.delete(self.np_position, index, 0)
             self.update_unique_id()
 
+    def truncate(self, length):
+        """ remove all points from the given index on. unlike clean_up
+        this does not touch the remaining points """
+
+        if length >= len(self):
+            return
+
+        self.position.setLength(length)
+        self.rotation.setLength(length)
+        self.scale.setLength(length)
+        self.instance_id.setLength(length)
+        self.visibility.setLength(length)
+        self.normal.setLength(length)
+        self.tangent.setLength(length)
+        self.u_coord.setLength(length)
+        self.v_coord.setLength(length)
+        self.poly_id.setLength(length)
+        self.color.setLength(length)
+        self.unique_id.setLength(length)
+        self.display_rank.setLength(length)
+        self.np_position = self.np_position[:length].copy()
 
     def __len__(self):
         return self.position.length()
@@ -540,3 +666,94 @@ class InstanceData(object):
         #  print 'del ptc'
         pass
 
+
+
+def to_vector_array(array):
+    """ convert a (n, 3) numpy array to an MVectorArray. the values are
+    passed to the MVectorArray constructor as one flat buffer """
+
+    array = np.asarray(array, dtype=float).reshape(-1, 3)
+    if not len(array):
+        return om.MVectorArray()
+
+    util = om.MScriptUtil()
+    util.createFromList(array.ravel().tolist(), array.size)
+    return om.MVectorArray(util.asDouble3Ptr(), len(array))
+
+
+def to_int_array(array):
+    """ convert a (n,) numpy array to an MIntArray """
+
+    result = om.MIntArray()
+    om.MScriptUtil.createIntArrayFromList(np.asarray(array, dtype=int).tolist(), result)
+    return result
+
+
+def to_double_array(array):
+    """ convert a (n,) numpy array to an MDoubleArray """
+
+    array = np.asarray(array, dtype=float).ravel()
+    if not len(array):
+        return om.MDoubleArray()
+
+    util = om.MScriptUtil()
+    util.createFromList(array.tolist(), len(array))
+    return om.MDoubleArray(util.asDoublePtr(), len(array))
+
+
+def from_vector_array(array, index=None):
+    """ convert an MVectorArray to a (n, 3) numpy array. the entire array
+    is copied out in bulk, single indices are read one by one
+    :param index: optional list of indices to convert """
+
+    if index is not None:
+        return np.array([(array[i].x, array[i].y, array[i].z) for i in index],
+                        dtype=float).reshape(-1, 3)
+
+    size = array.length() * 3
+    if not size:
+        return np.empty((0, 3))
+
+    util = om.MScriptUtil()
+    util.createFromList([0.0] * size, size)
+    pointer = util.asDouble3Ptr()
+    array.get(pointer)
+    return read_buffer(pointer, ctypes.c_double, size).reshape(-1, 3)
+
+
+def from_int_array(array):
+    """ convert an MIntArray to a (n,) numpy array """
+
+    size = array.length()
+    if not size:
+        return np.empty(0, dtype=int)
+
+    util = om.MScriptUtil()
+    util.createFromList([0] * size, size)
+    pointer = util.asIntPtr()
+    array.get(pointer)
+    return read_buffer(pointer, ctypes.c_int, size).astype(int)
+
+
+def from_double_array(array):
+    """ convert an MDoubleArray to a (n,) numpy array """
+
+    size = array.length()
+    if not size:
+        return np.empty(0)
+
+    util = om.MScriptUtil()
+    util.createFromList([0.0] * size, size)
+    pointer = util.asDoublePtr()
+    array.get(pointer)
+    return read_buffer(pointer, ctypes.c_double, size)
+
+
+def read_buffer(pointer, ctype, size):
+    """ copy the given number of values from a swig pointer into a new
+    numpy array
+    :param pointer: swig pointer, e.g. as returned by MScriptUtil
+    :param ctype: ctypes type of the values """
+
+    buffer = (ctype * size).from_address(int(pointer))
+    return np.ctypeslib.as_array(buffer).copy()
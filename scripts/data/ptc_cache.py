@@ -1,138 +1,96 @@
 import sys
+
+import numpy as np
+
 import maya.OpenMaya as om
 
 
 class PtcCache(object):
     """
-    container for sampled points
+    container for sampled candidates
     usage:  1. cache gets filled with point data from the sampler
             2. once sampling is finished the cache gets locked
+            3. the locked cache can be filtered again without resampling
+    besides the point data every candidate keeps a set of random keys for
+    the filters and its final transforms. filtering the cache again with
+    the same keys only changes the points affected by the new settings.
+    the points published to the instance data are tracked by their range
+    and the mask they were selected with.
     """
 
     def __init__(self):
 
-        self._locked = False
+        self.flush_cache()
 
-        # sampled data from the ptc
-        self.points = om.MPointArray()
-        self.normals = om.MVectorArray()
-        self.poly_ids = om.MIntArray()
-        self.u_coords = om.MDoubleArray()
-        self.v_coords = om.MDoubleArray()
-        self.user = []
-        self.bb = None
+    def flush_cache(self):
+        """ remove all candidates and unlock the cache """
 
-    @property
-    def bounding_box(self):
-        return self.bb
+        self._locked = False
+        self._chunks = []
 
-    @bounding_box.setter
-    def bounding_box(self, bb):
-        self.bb = bb
+        self.position = np.empty((0, 3))
+        self.normal = np.empty((0, 3))
+        self.poly_id = np.empty(0, dtype=int)
+        self.tri_id = np.empty(0, dtype=int)
+        self.barycentric = np.empty((0, 2))
+        self.u_coord = np.empty(0)
+        self.v_coord = np.empty(0)
+        self.keys = np.empty((0, 0))
+        self.transforms = []
 
-    def length(self):
-        return self.points.length()
+        self.mask = np.empty(0, dtype=bool)
+        self.published = (0, 0)
 
-    def append(self, point, normal, index, u, v, user_data=None):
-        """
-        append a given point and its associated data to the cache.
-        note:   this method gets called a lot from the ptc_sampler.
-                therefore no type checking is done.
-
-        :param point:   position of the point                   - MPoint
-        :param normal:  normal of closest triangle              - MVector
-        :param index:   index of the closest polygon            - MInt
-        :param u:       u_coordinate of the closest polygon     - MDouble
-        :param v:       v coordinate of the closest polygon     - MDouble
-        :return:
-        """
-
-        if self.bb:
-            self.points.append(point)
-            self.normals.append(normal)
-            self.poly_ids.append(index)
-            self.u_coords.append(u)
-            self.v_coords.append(v)
-            self.user.append(user_data)
-        else:
-            raise RuntimeError ('No bounding box set for point cache')
+    @property
+    def locked(self):
+        return self._locked
 
-    def remove(self, index):
+    def append(self, points, keys, transforms):
+        """ append a batch of candidates to the cache
+        :param points: container holding position, normal, poly_id, tri_id,
+                       barycentric, u_coord and v_coord arrays
+        :param keys: (n, k) array of random keys
+        :param transforms: list of arrays holding the final transforms """
 
-        def remove_point(index):
-            # if index >= self.points.length():
-            self.points.remove(index)
-            self.normals.remove(index)
-            self.poly_ids.remove(index)
-            self.u_coords.remove(index)
-            self.v_coords.remove(index)
+        if self._locked:
+            raise RuntimeError('Point cache is locked')
 
-            # self.user.pop(index)
+        self._chunks.append([points.position,
+                             points.normal,
+                             points.poly_id,
+                             points.tri_id,
+                             points.barycentric,
+                             points.u_coord,
+                             points.v_coord,
+                             keys] + list(transforms))
 
-            # self.orig_points.remove(index)
-            # self.lifespan_pp.remove(index)
-            # self.age_pp.remove(index)
+    def lock(self):
+        """ merge all appended batches and lock the cache """
 
-            # self.id_pp.remove(index)
-            # self.rgb_pp.remove(index)
-            # self.rotation_pp.remove(index)
-            # self.scale_pp.remove(index)
-            # else:
-            #     raise IndexError ('Remove point from cache: Index out of range')
+        if self._chunks:
+            arrays = [np.concatenate(chunk) for chunk in zip(*self._chunks)]
+            self.position, self.normal, self.poly_id, self.tri_id, \
+                self.barycentric, self.u_coord, self.v_coord, self.keys = arrays[:8]
+            self.transforms = arrays[8:]
 
-        if type(index) == type(list()):
+        self._chunks = []
+        self._locked = True
 
-            for i in index:
-                remove_point(i)
+    def set_published(self, mask, start):
+        """ keep track of the candidates published to the instance data
+        :param mask: (n,) boolean array of published candidates
+        :param start: index of the first published point """
 
-        elif type(index) == type(int()):
-            remove_point(index)
+        self.mask = mask
+        self.published = (start, start + int(np.count_nonzero(mask)))
 
-        else:
-            raise TypeError ('Unsupported type: {} - must be of type int() or list(int(), int())'.format(type(index)))
-
-    def get_point(self, index):
-        """
-        return a point at the given position in the cache
-        :param index:   position of the point in the cache
-        :return:        MPoint        - position of the point
-                        MVector       - normal of closest triangle
-                        MInt          - index of the closest polygon
-                        MDouble       - u_coordinate of the closest polygon
-                        MDouble       - v coordinate of the closest polygon
-        """
-
-        p = self.points[index]
-        n = self.normals[index]
-        i = self.poly_ids[index]
-        u = self.u_coords[index]
-        v = self.v_coords[index]
-        user = self.user[index]
-
-        return p, n, i, u, v, user
-
-    def get_points(self):
-        """
-        return all points from the cache
-        :return:        MPointArray   - list of all point positions
-                        MVectorArray  - list of all normals
-                        MIntArray     - list of all polygon ids
-                        MDoubleArray  - list of all u_coordinates
-                        MDoubleArray  - list of all v coordinates
-        """
-
-        return self.points, self.normals, self.poly_ids, self.u_coords, self.v_coords, self.user
+    def get_transforms(self, mask):
+        """ return the transforms of the candidates in the given mask """
 
-    def validate_cache(self):
+        return [transform[mask] for transform in self.transforms]
 
-        try:
-            assert self.points.length() == \
-                   self.normals.length() == \
-                   self.poly_ids.length() == \
-                   self.u_coords.length() == \
-                   self.v_coords.length()
-        except AssertionError:
-            raise RuntimeError('Point Cache Error: cached arrays do not match in size')
+    def __len__(self):
+        return len(self.position)
 
 class PointData(PtcCache):
     def __init__(self):
@@ -152,6 +110,9 @@ class PointData(PtcCache):
         self.lifespan = om.MDoubleArray()
         self.age = om.MDoubleArray()
 
+    def length(self):
+        return self.points.length()
+
     def __iadd__(self, ptc):
 
         self.__add__(ptc)
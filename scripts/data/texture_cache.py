@@ -0,0 +1,76 @@
+import sys
+from collections import OrderedDict
+
+import numpy as np
+
+import logging_util
+import render_utils
+
+
+class TextureCache(object):
+    """
+    container for baked shading nodes.
+    every texture is baked once into a numpy image and kept together with
+    its signature. the bake is reused until the signature changes, e.g.
+    when the file on disk has been modified. the least recently used
+    textures are dropped once more than max_entries are cached.
+    """
+
+    def __init__(self, max_entries=8):
+
+        log_lvl = sys._global_spore_dispatcher.spore_globals['LOG_LEVEL']
+        self.logger = logging_util.SporeLogger(__name__, log_lvl)
+
+        self.max_entries = max_entries
+        self.textures = OrderedDict()
+
+    def get_texture(self, shading_node, resolution=1024):
+        """ return the baked image of the given shading node
+        :param shading_node: name of the shading node
+        :param resolution: width and height of the baked image
+        :return: (resolution, resolution, 3) float32 array """
+
+        key = (shading_node, resolution)
+        signature = render_utils.get_texture_signature(shading_node)
+
+        if key in self.textures:
+            cached_signature, image = self.textures.pop(key)
+            if cached_signature == signature:
+                self.textures[key] = (signature, image)
+                return image
+
+        self.logger.debug('Bake texture: {}'.format(shading_node))
+        image = render_utils.bake_shading_node(shading_node, resolution)
+        self.textures[key] = (signature, image)
+
+        while len(self.textures) > self.max_entries:
+            self.textures.popitem(last=False)
+
+        return image
+
+    def flush_cache(self):
+        self.textures = OrderedDict()
+
+
+def sample_texture(image, u_coord, v_coord):
+    """ bilinear lookup of the given uv coordinates in a baked image.
+    the image repeats outside of the 0 - 1 uv space
+    :param image: (h, w, c) array sampled at the pixel centers
+    :param u_coord: (n,) array of u coordinates
+    :param v_coord: (n,) array of v coordinates
+    :return: (n, c) array of interpolated values """
+
+    height, width = image.shape[:2]
+    x = np.asarray(u_coord, dtype=float) * width - 0.5
+    y = np.asarray(v_coord, dtype=float) * height - 0.5
+
+    x0 = np.floor(x).astype(int)
+    y0 = np.floor(y).astype(int)
+    fx = (x - x0)[:, np.newaxis]
+    fy = (y - y0)[:, np.newaxis]
+    x0, x1 = x0 % width, (x0 + 1) % width
+    y0, y1 = y0 % height, (y0 + 1) % height
+
+    top = image[y0, x0] * (1 - fx) + image[y0, x1] * fx
+    bottom = image[y1, x0] * (1 - fx) + image[y1, x1] * fx
+    return top * (1 - fy) + bottom * fy
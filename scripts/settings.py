@@ -21,6 +21,8 @@ class SporeGlobals(QObject):
                      'AUTOMATIC_REPORT': False, # Submit reports automatically
                      'REPORT': True, # Enable/Disabel reporting
                      'SENDER': ' ', # Store sender email address
+                     'ROLLBACK_CANCELLED_EMIT': False, # Remove points of an interrupted emit
+                     'SAMPLING_PROCESSES': 1, # Number of worker processes used for sampling
                      }
 
     def __init__(self):
@@ -73,6 +75,10 @@ class SporeGlobals(QObject):
                 msg = 'Could not load preference file from: {}\nMaybe badly formatted. Try to delete it...'.format(pref_file)
                 raise RuntimeError(msg)
 
+        # add options that have been introduced after the file was written
+        for key, val in self.default_prefs.iteritems():
+            spore_globals.setdefault(key, val)
+
         return spore_globals
 
     def fill_prefs_ui(self):
@@ -15,6 +15,9 @@ class ProgressBar(object):
     def increment(self, val=1):
         cmds.progressBar(self._progress_bar, e=1, s=val)
 
+    def set_progress(self, val):
+        cmds.progressBar(self._progress_bar, e=1, pr=val)
+
     def status(self, msg):
         cmds.progressBar(self._progress_bar, e=1, st=msg)
 
@@ -46,6 +49,7 @@ class ProgressBar(object):
             return result
 
         wrapper.increment = self.increment
+        wrapper.set_progress = self.set_progress
         wrapper.status = self.status
         wrapper.interrupt = self.interrupted
 
@@ -0,0 +1,125 @@
+""" predict the outcome of an emit before running it.
+the number of candidates is derived from the surface area and the emit
+settings, the share of candidates passing the filters is measured on a
+small pilot set of random samples. """
+
+import math
+
+
+# share of the area a poisson disk set of radius r covers with disks of
+# radius r / 2. measured for bridson sampling on the surface and in uv space
+DISK_PACKING = 0.6
+
+# cost of the emit types relative to drawing one random sample. the cost
+# is given per drawn sample for random, halton, jitter and elimination
+# and per output sample for all other types
+RELATIVE_COST = {'random': 1.0,
+                 'halton': 3.6,
+                 'jitter': 2.3,
+                 'stratified': 38.0,
+                 'poisson3d': 800.0,
+                 'poisson2d': 250.0,
+                 'multiclass': 1100.0,
+                 'elimination': 160.0,
+                 'tiles': 14.0}
+
+# bytes held per drawn sample while sampling and per emitted point in the
+# instance data plus the batch kept for redo
+SAMPLE_BYTES = 96
+POINT_BYTES = 268
+
+
+def candidate_count(mode, area, num_samples=0, cell_size=1.0, radius=1.0,
+                    oversampling=5, class_radius=None):
+    """ return the number of samples drawn and the number of candidates
+    handed to the filters for the given emit type
+    :param mode: name of the emit type, stratified for stratified jitter
+    :param area: surface area. the uv area for poisson2d
+    :param num_samples: number of samples for random, halton, jitter
+                        and elimination
+    :param cell_size: cell size for jitter and stratified
+    :param radius: min radius for all poisson types
+    :param oversampling: candidates per sample for elimination
+    :param class_radius: list of class radii for multiclass
+    :return: number of drawn samples, number of candidates """
+
+    if mode in ('random', 'halton'):
+        return num_samples, num_samples
+
+    elif mode == 'jitter':
+        # expected number of cells hit by num_samples random samples
+        num_cells = float(area) / cell_size ** 2
+        if not num_cells:
+            return num_samples, 0
+        return num_samples, num_cells * (1 - math.exp(-num_samples / num_cells))
+
+    elif mode == 'stratified':
+        num_cells = float(area) / cell_size ** 2
+        return num_cells, num_cells
+
+    elif mode == 'elimination':
+        return num_samples * oversampling, num_samples
+
+    elif mode in ('poisson3d', 'poisson2d', 'tiles'):
+        num_disks = DISK_PACKING * area / float(radius) ** 2
+        return num_disks, num_disks
+
+    elif mode == 'multiclass':
+        # every class fills the surface up to its own radius but all
+        # classes together can't be denser than the global radius
+        num_disks = DISK_PACKING * area / float(radius) ** 2
+        class_disks = sum(DISK_PACKING * area / max(r, radius) ** 2 for r in class_radius or [radius])
+        num_disks = min(num_disks, class_disks)
+        return num_disks, num_disks
+
+    raise ValueError('Invalid emit type: {}'.format(mode))
+
+
+def expected_count(num_candidates, num_kept, num_pilot, z=1.96):
+    """ expected number of points passing the filters and its confidence
+    interval. the variance combines the binomial noise of the emit itself
+    and the uncertainty of the pass rate measured on the pilot set
+    :param num_candidates: number of candidates handed to the filters
+    :param num_kept: number of pilot samples passing the filters
+    :param num_pilot: number of pilot samples
+    :param z: z-score of the interval, 1.96 for 95%
+    :return: expected count, lower bound, upper bound """
+
+    if not num_pilot:
+        return num_candidates, num_candidates, num_candidates
+
+    rate = float(num_kept) / num_pilot
+
+    # keep the variance above zero if none or all pilot samples passed
+    smoothed = (num_kept + 0.5) / (num_pilot + 1.0)
+    variance = smoothed * (1 - smoothed) * (num_candidates + num_candidates ** 2 / float(num_pilot))
+
+    mean = num_candidates * rate
+    error = z * math.sqrt(variance)
+    return mean, max(mean - error, 0), min(mean + error, num_candidates)
+
+
+def peak_memory(num_drawn, num_output):
+    """ approximate peak memory of an emit in bytes
+    :param num_drawn: number of samples drawn
+    :param num_output: number of points emitted """
+
+    return num_drawn * SAMPLE_BYTES + num_output * POINT_BYTES
+
+
+def runtime(mode, num_drawn, num_candidates, num_output,
+            sample_time, filter_time, append_time):
+    """ approximate runtime of an emit in seconds. the times per sample
+    are measured on the pilot set and scaled by the relative cost
+    :param sample_time: seconds per random sample
+    :param filter_time: seconds per filtered candidate
+    :param append_time: seconds per emitted point """
+
+    if mode in ('random', 'halton', 'jitter', 'elimination'):
+        work = num_drawn
+    else:
+        work = num_candidates
+
+    return work * RELATIVE_COST[mode] * sample_time\
+        + num_candidates * filter_time\
+        + num_output * append_time
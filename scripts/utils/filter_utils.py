@@ -0,0 +1,256 @@
+""" vectorized point filters.
+every filter returns a boolean keep-mask over the given points. masks of
+several filters are combined in a FilterPipeline and applied to the
+points in a single compaction.
+the random filters take an optional array of uniform random keys, one per
+point. filtering the same points with the same keys again gives the same
+result and tightening a filter never adds points. """
+
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree as kd_tree
+except ImportError:
+    from scipy.spatial import cKDTree as kd_tree
+
+
+class FilterPipeline(object):
+    """ list of filters combined to a single keep-mask.
+    a filter is any callable taking the points container and returning
+    a boolean array with one entry per point """
+
+    def __init__(self):
+        self.filters = []
+
+    def add(self, func, operator='and'):
+        """ add a filter to the pipeline
+        :param func: callable returning a keep-mask for the given points
+        :param operator: 'and' or 'or', how the mask is combined with the
+                         masks of all previously added filters """
+
+        if operator not in ('and', 'or'):
+            raise ValueError('Invalid filter operator: {}'.format(operator))
+
+        self.filters.append((func, operator))
+
+    def evaluate(self, points):
+        """ evaluate all filters in the order they were added
+        :return: (n,) boolean keep-mask """
+
+        mask = np.ones(len(points), dtype=bool)
+        for i, (func, operator) in enumerate(self.filters):
+            keep = np.asarray(func(points), dtype=bool)
+            if i == 0:
+                mask = keep
+            elif operator == 'and':
+                mask &= keep
+            else:
+                mask |= keep
+
+        return mask
+
+    def __len__(self):
+        return len(self.filters)
+
+
+def random_keys(num_points, keys=None, rng=np.random):
+    """ return the given random keys or draw new ones from the rng
+    :return: (n,) array of uniform random values in [0, 1) """
+
+    if keys is None:
+        return rng.random_sample(num_points)
+    return keys
+
+
+def altitude_mask(position, y_min, height, min_altitude, max_altitude,
+                  min_fuzziness, max_fuzziness, rng=np.random, keys=None):
+    """ keep points between the min and max altitude relative to the given
+    height range. points within the fuzziness outside of the range are
+    kept with a probability falling off linearly with the distance
+    :param position: (n, 3) array of positions
+    :param y_min: lower end of the height range
+    :param height: size of the height range
+    :param keys: optional (n,) array of random keys
+    :return: (n,) boolean keep-mask """
+
+    altitude = (position[:, 1] - y_min) / height
+
+    below = min_altitude - altitude
+    above = altitude - max_altitude
+    keep = (below <= 0) & (above <= 0)
+
+    # the fuzziness of min and max altitude is drawn from the same stream
+    random = random_keys(len(position), keys, rng)
+    keep |= (below > 0) & (below <= random * min_fuzziness)
+    keep |= (above > 0) & (above <= random * max_fuzziness)
+    return keep
+
+
+def slope_mask(normal, min_slope, max_slope, fuzz, rng=np.random, keys=None):
+    """ keep points whose angle between the normal and the world up vector
+    lies between min and max slope. the angle is jittered by up to
+    45 * fuzz degrees
+    :param normal: (n, 3) array of normals
+    :param keys: optional (n,) array of random keys
+    :return: (n,) boolean keep-mask """
+
+    length = np.sqrt(np.sum(normal ** 2, axis=1))
+    cos = np.clip(normal[:, 1] / np.maximum(length, 1e-12), -1, 1)
+    jitter = 2 * random_keys(len(normal), keys, rng) - 1
+    angle = np.degrees(np.arccos(cos)) + 45 * fuzz * jitter
+    return (angle >= min_slope) & (angle <= max_slope)
+
+
+def texture_density(value, gamma=2.2):
+    """ convert texture values to a density between 0 and 1
+    :param value: (n,) array of texture values, clamped to 0 - 1
+    :param gamma: the values are linearized with the given gamma
+    :return: (n,) array of densities """
+
+    return np.clip(value, 0, 1) ** (1.0 / gamma)
+
+
+def texture_mask(value, gamma=2.2, rng=np.random, keys=None):
+    """ keep points with a probability of the given texture value
+    :param value: (n,) array of texture values, clamped to 0 - 1
+    :param gamma: the values are linearized with the given gamma
+    :param keys: optional (n,) array of random keys
+    :return: (n,) boolean keep-mask """
+
+    value = texture_density(value, gamma)
+    return value >= random_keys(len(value), keys, rng)
+
+
+def density_mask(density, bound, rng=np.random):
+    """ keep points with a probability of their density relative to an
+    upper bound of the density. used after sampling proportional to the
+    bound to recover the detail within a triangle
+    :param density: (n,) array of densities at the points
+    :param bound: (n,) array of upper bounds of the density
+    :return: (n,) boolean keep-mask """
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(bound > 0, density / bound, 0)
+    return ratio > rng.random_sample(len(density))
+
+
+class ExclusionIndex(object):
+    """ spatial index over blocker points with a radius per point. used
+    for the points of other spore nodes, with the exclusion radius of
+    their node, and for the footprints of existing instances.
+    all blockers share a single kd tree which is built once and queried
+    for all candidates at the same time. points added later are kept in a
+    small buffer that is checked brute force until it gets merged.
+    the blockers given on creation are fixed, the added points can be
+    removed again with pop and reset """
+
+    def __init__(self, positions, radii, buffer_size=4096):
+        """ :param positions: list of (n, 3) arrays of blocker positions
+        :param radii: list of radii, one per array. either a scalar or
+                      an (n,) array holding a radius for every point
+        :param buffer_size: number of added points kept in the buffer """
+
+        positions = [np.asarray(p, dtype=float).reshape(-1, 3) for p in positions]
+        radii = [np.broadcast_to(np.asarray(r, dtype=float), len(p)) for p, r in zip(positions, radii)]
+        self.points = np.concatenate(positions or [np.empty((0, 3))])
+        self.radius = np.concatenate(radii or [np.empty(0)])
+        self.num_fixed = len(self.points)
+
+        self.buffer_size = buffer_size
+        self.buffer_points = np.empty((0, 3))
+        self.buffer_radius = np.empty(0)
+        self.build()
+
+    def build(self):
+        """ merge the buffer and rebuild the kd tree """
+
+        self.points = np.concatenate((self.points, self.buffer_points))
+        self.radius = np.concatenate((self.radius, self.buffer_radius))
+        self.buffer_points = np.empty((0, 3))
+        self.buffer_radius = np.empty(0)
+
+        self.tree = None
+        self.max_radius = 0
+        if len(self.points):
+            self.tree = kd_tree(self.points)
+            self.max_radius = self.radius.max()
+
+    def add(self, position, radius=0):
+        """ add blocker points to the index
+        :param position: (n, 3) array of positions
+        :param radius: scalar or (n,) array of radii """
+
+        position = np.asarray(position, dtype=float).reshape(-1, 3)
+        radius = np.broadcast_to(np.asarray(radius, dtype=float), len(position))
+        self.buffer_points = np.concatenate((self.buffer_points, position))
+        self.buffer_radius = np.concatenate((self.buffer_radius, radius))
+
+        if len(self.buffer_points) > self.buffer_size:
+            self.build()
+
+    def pop(self, count):
+        """ remove the last added blocker points from the index
+        :param count: number of points to remove """
+
+        count = min(count, len(self) - self.num_fixed)
+        if count <= 0:
+            return
+
+        if count <= len(self.buffer_points):
+            self.buffer_points = self.buffer_points[:len(self.buffer_points) - count]
+            self.buffer_radius = self.buffer_radius[:len(self.buffer_radius) - count]
+        else:
+            end = len(self) - count
+            self.points = self.points[:end]
+            self.radius = self.radius[:end]
+            self.buffer_points = np.empty((0, 3))
+            self.buffer_radius = np.empty(0)
+            self.build()
+
+    def reset(self, position=None, radius=0):
+        """ remove all added blocker points and optionally add new ones
+        :param position: (n, 3) array of positions
+        :param radius: scalar or (n,) array of radii """
+
+        self.points = self.points[:self.num_fixed]
+        self.radius = self.radius[:self.num_fixed]
+        self.buffer_points = np.empty((0, 3))
+        self.buffer_radius = np.empty(0)
+        if position is not None:
+            self.add(position, radius)
+        self.build()
+
+    def mask(self, position, radius=0):
+        """ keep points that are further away from every blocker point than
+        the radius of the blocker plus the radius of the point
+        :param position: (n, 3) array of positions
+        :param radius: scalar or (n,) array of radii of the points
+        :return: (n,) boolean keep-mask """
+
+        position = np.asarray(position, dtype=float).reshape(-1, 3)
+        radius = np.broadcast_to(np.asarray(radius, dtype=float), len(position))
+        keep = np.ones(len(position), dtype=bool)
+        if not len(position):
+            return keep
+
+        if self.tree is not None:
+            # find all blockers within the largest possible distance and
+            # check each pair against the radii of the blocker and the point
+            neighbours = self.tree.query_ball_point(position, self.max_radius + radius.max())
+            count = np.array([len(n) for n in neighbours], dtype=int)
+            if count.any():
+                candidate = np.repeat(np.arange(len(position)), count)
+                blocker = np.concatenate([n for n in neighbours if n]).astype(int)
+                distance = np.sum((position[candidate] - self.points[blocker]) ** 2, axis=1)
+                limit = self.radius[blocker] + radius[candidate]
+                keep[candidate[distance < limit ** 2]] = False
+
+        if len(self.buffer_points):
+            delta = position[:, np.newaxis] - self.buffer_points[np.newaxis]
+            limit = radius[:, np.newaxis] + self.buffer_radius[np.newaxis]
+            keep &= ~(np.sum(delta ** 2, axis=2) < limit ** 2).any(axis=1)
+
+        return keep
+
+    def __len__(self):
+        return len(self.points) + len(self.buffer_points)
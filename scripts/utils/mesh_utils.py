@@ -98,16 +98,17 @@ def get_tangent(normal):
 def normal_to_eulter(position, normal):
     pass
 
-def get_uv_at_point(target, point, uv_set=None, poly_id=None):
+def get_uv_at_point(target, point, uv_set=None, poly_id=None, space=om.MSpace.kWorld):
     """ get closest UV coords of the target at the given point
     :param target str: name of the target object
-    :param point MPoint: """
+    :param point MPoint:
+    :param space MSpace: the space the given point is in """
 
     util = om.MScriptUtil()
     uv_coords_ptr = util.asFloat2Ptr()
 
     mesh_fn = get_mesh_fn(target)
-    mesh_fn.getUVAtPoint(point, uv_coords_ptr, om.MSpace.kObject, uv_set, poly_id)
+    mesh_fn.getUVAtPoint(point, uv_coords_ptr, space, uv_set, poly_id)
 
     u_coord = util.getFloat2ArrayItem(uv_coords_ptr, 0, 0)
     v_coord = util.getFloat2ArrayItem(uv_coords_ptr, 0, 1)
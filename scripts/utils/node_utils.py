@@ -2,8 +2,11 @@
 module provides quick acces to frequently used node utilities
 """
 
+import sys
 import math
 
+import numpy as np
+
 import maya.OpenMaya as om
 
 
@@ -114,6 +117,51 @@ def get_instanced_geo(spore_node):
 
     return instance_geo
 
+def get_prototype_radii(spore_node):
+    """ return the footprint radius of every instanced prototype. the
+    radius is half the diagonal of the prototype's bounding box in the
+    xz plane including the prototype's transformation
+    @param spore_node str: the name of the spore node
+    @return: (n,) array of radii in the order of the instancer's inputs """
+
+    radii = []
+    for geo in get_instanced_geo(spore_node):
+        dag_path = get_dagpath_from_name(geo)
+        bb = om.MFnDagNode(dag_path).boundingBox()
+        bb.transformUsing(dag_path.exclusiveMatrix())
+        radii.append(0.5 * math.sqrt(bb.width() ** 2 + bb.depth() ** 2))
+
+    return np.array(radii)
+
+def get_instance_ids(spore_node, mask_plug=None):
+    """ return the instance ids used by emit and the brush. these are the
+    ids stored in the node's instance mask or all instanced objects if the
+    mask is empty
+    @param spore_node str: the name of the spore node
+    @param mask_plug MPlug: optional instanceMask plug of the node
+    @return: list of instance ids. empty if no geometry is instanced """
+
+    if mask_plug is None:
+        mask_plug = get_dgfn_from_dagpath(spore_node).findPlug('instanceMask')
+    instance_ids = get_plug_int_array(mask_plug)
+    if not instance_ids:
+        instance_ids = range(len(get_instanced_geo(spore_node)))
+
+    return list(instance_ids)
+
+def get_plug_int_array(plug):
+    """ return the value of an int array plug as list """
+
+    data = plug.asMObject()
+    if data.isNull():
+        return []
+    return list(om.MFnIntArrayData(data).array())
+
+def get_plug_vector(plug):
+    """ return the value of a double3 plug as tuple """
+
+    return tuple(plug.child(i).asDouble() for i in range(plug.numChildren()))
+
 def get_instancer(spore_node, as_string=True):
     """ return the instancer node connected to a given spore node
     :param spore_node:
@@ -186,6 +234,44 @@ def get_connected_in_mesh(spore_node, as_string=True):
         else:
             raise RuntimeError('spore nodes\'s inMesh plug is not connected')
 
+def get_exclusion_points(spore_node):
+    """ get the points of all spore nodes connected to the given node's
+    exclusion attribute. only visible points are returned
+    :param spore_node: name or MObject of the spore node
+    :return: list of (n, 3) arrays of world space positions and
+             list of exclusion radii, one per connected node """
+
+    if isinstance(spore_node, str) or isinstance(spore_node, unicode):
+        node_fn = get_dgfn_from_dagpath(spore_node)
+    else:
+        node_fn = om.MFnDependencyNode(spore_node)
+
+    exclusion_plug = node_fn.findPlug('exclusion')
+    positions, radii = [], []
+    plugs = om.MPlugArray()
+    for i in xrange(exclusion_plug.numElements()):
+        element_plug = exclusion_plug.elementByPhysicalIndex(i)
+        node_plug = element_plug.child(0)
+        radius = element_plug.child(1).asDouble()
+        if not node_plug.connectedTo(plugs, True, False) or radius <= 0:
+            continue
+
+        # points of the node itself are never blockers
+        if plugs[0].node() == node_fn.object():
+            continue
+
+        obj_handle = om.MObjectHandle(plugs[0].node())
+        spore_locator = sys._global_spore_tracking_dir.get(obj_handle.hashCode())
+        if not spore_locator or not spore_locator._state:
+            continue
+
+        state = spore_locator._state
+        visibility = np.array(list(state.visibility), dtype=bool)
+        positions.append(state.np_position[visibility])
+        radii.append(radius)
+
+    return positions, radii
+
 def get_local_rotation(mobject):
     """ returns an transform node's world space rotation values
     in degrees """
@@ -201,3 +287,14 @@ def get_local_rotation(mobject):
                       math.degrees(rotation.z))
 
 
+
+def get_world_up(dagpath):
+    """ return the world space up axis of the given dag node
+    :param dagpath: full path name or MDagPath of the node
+    :return: (3,) array, normalized """
+
+    if not isinstance(dagpath, om.MDagPath):
+        dagpath = get_dagpath_from_name(dagpath)
+
+    up = (om.MVector(0, 1, 0) * dagpath.inclusiveMatrix()).normal()
+    return np.array((up.x, up.y, up.z))
@@ -0,0 +1,240 @@
+""" deterministic parallel sampling.
+the work is split into chunks that only depend on the input. every chunk
+gets its own random stream derived from the seed and the chunk index and
+results are concatenated in chunk order, so the output is the same for
+any number of worker processes. with a single process the chunks are
+processed one after another in the current process. """
+
+import os
+import sys
+import multiprocessing
+
+import numpy as np
+
+import sample_utils
+import poisson_utils
+
+
+# number of samples per chunk for random sampling
+CHUNK_SIZE = 100000
+
+# edge length of the spatial blocks for poisson sampling in radii
+BLOCK_SIZE = 50
+
+# width of the band of neighbouring triangles sampled with a block in radii
+HALO_SIZE = 4
+
+
+def chunk_rng(seed, index):
+    """ return an independent random stream for the given chunk
+    :param seed: the base seed
+    :param index: the index of the chunk
+    :return: numpy RandomState """
+
+    return np.random.RandomState([seed, index])
+
+
+def get_pool(processes, initializer=None, initargs=()):
+    """ return a pool of worker processes or None if the work should be
+    done in the current process. inside maya the workers are started
+    with mayapy since the maya executable can't run them
+    :param processes: number of worker processes
+    :param initializer: optional callable run once in every worker
+    :param initargs: arguments of the initializer
+    :return: multiprocessing.Pool or None """
+
+    if processes < 2:
+        if initializer:
+            initializer(*initargs)
+        return None
+
+    executable = os.path.basename(sys.executable).lower()
+    if executable.startswith('maya') and not executable.startswith('mayapy'):
+        mayapy = 'mayapy.exe' if os.name == 'nt' else 'mayapy'
+        multiprocessing.set_executable(os.path.join(os.path.dirname(sys.executable), mayapy))
+
+    return multiprocessing.Pool(processes, initializer, initargs)
+
+
+def map_tasks(pool, function, tasks):
+    """ apply the function to all tasks in the pool or in the current
+    process if pool is None
+    :return: list of results in the order of the tasks """
+
+    if pool is None or len(tasks) < 2:
+        return [function(task) for task in tasks]
+    return pool.map(function, tasks)
+
+
+# mesh of the current sampling call. set once per worker process
+_mesh = None
+
+
+def _set_mesh(vertices, triangles, cdf):
+    global _mesh
+    _mesh = vertices, triangles, cdf
+
+
+def _sample_chunk(task):
+    """ sample one chunk of points on the mesh of the worker
+    :param task: tuple of the number of samples, the seed and the chunk index """
+
+    count, seed, index = task
+    vertices, triangles, cdf = _mesh
+    return sample_utils.sample_surface(vertices, triangles, cdf, count, chunk_rng(seed, index))
+
+
+def sample_surface(vertices, triangles, cdf, num_samples, seed,
+                   chunk_size=CHUNK_SIZE, processes=1):
+    """ sample random points uniformly on the surface of an indexed mesh.
+    the samples are drawn in chunks of chunk_size
+    :param vertices: (v, 3) array of vertex positions
+    :param triangles: (n, 3) array of vertex indices per triangle
+    :param cdf: (n,) array of the normalized cumulative triangle area
+    :param num_samples: number of points to sample
+    :param seed: the base seed of the chunk streams
+    :param processes: number of worker processes
+    :return: (num_samples,) triangle ids, (num_samples, 2) barycentric
+             coordinates and (num_samples, 3) positions """
+
+    global _mesh
+
+    num_chunks = max(int(np.ceil(num_samples / float(chunk_size))), 1)
+    tasks = [(min(chunk_size, num_samples - index * chunk_size), seed, index)
+             for index in range(num_chunks)]
+
+    pool = get_pool(processes, _set_mesh, (vertices, triangles, cdf))
+    try:
+        if pool is None:
+            results = [_sample_chunk(task) for task in tasks]
+        else:
+            results = pool.map(_sample_chunk, tasks)
+    finally:
+        _mesh = None
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return [np.concatenate(result) for result in zip(*results)]
+
+
+def _sample_block(task):
+    """ poisson disk sample one block of triangles
+    :param task: tuple of the block's vertices, triangles and cdf, the
+                 number of triangles owned by the block, the radius, the
+                 seed, the block index and the fixed points
+    :return: local triangle ids, barycentric coordinates and positions
+             of the samples on the block's own triangles """
+
+    vertices, triangles, cdf, num_owned, radius, seed, index, fixed = task
+    ids, bary, position = poisson_utils.disk_sampling_surface(vertices,
+                                                              triangles,
+                                                              cdf,
+                                                              radius,
+                                                              chunk_rng(seed, index),
+                                                              fixed=fixed)
+    inside = ids < num_owned
+    return ids[inside], bary[inside], position[inside]
+
+
+def disk_sampling_surface(vertices, triangles, cdf, radius, seed,
+                          block_size=BLOCK_SIZE, processes=1):
+    """ poisson disk sampling on the surface of an indexed mesh in spatial
+    blocks. the triangles are binned into cubic blocks by their centroid.
+    the blocks are colored by the parity of their grid cell and sampled in
+    eight phases, one per color. blocks of the same color never touch so
+    they are independent of each other. every block is sampled together
+    with a halo of neighbouring triangles and the samples of neighbouring
+    blocks from earlier phases as fixed points. only the samples on the
+    block's own triangles are kept, so there are no seams at the borders.
+    the blocks of one phase are distributed over the worker processes
+    :param vertices: (v, 3) array of vertex positions
+    :param triangles: (t, 3) array of vertex indices per triangle
+    :param cdf: (t,) array of the normalized cumulative triangle area
+    :param radius: minimum distance between two samples
+    :param seed: the base seed of the block streams
+    :param block_size: edge length of the blocks in radii
+    :param processes: number of worker processes
+    :return: (n,) triangle ids, (n, 2) barycentric coordinates and
+             (n, 3) positions """
+
+    if not len(triangles):
+        return np.empty(0, dtype=int), np.empty((0, 2)), np.empty((0, 3))
+
+    corners = vertices[triangles].astype(float)
+    centroids = corners.mean(axis=1)
+    tri_min = corners.min(axis=1)
+    tri_max = corners.max(axis=1)
+    area = np.diff(np.concatenate(([0], cdf)))
+
+    # samples lie on their block's triangles which reach at most extent
+    # beyond the block. blocks of this size only interact with their 26
+    # direct neighbours, which makes a two coloring per axis sufficient
+    extent = np.sqrt(np.sum((corners - centroids[:, np.newaxis]) ** 2, axis=2).max())
+    edge = max(radius * block_size, (HALO_SIZE + 1) * radius + 2 * extent)
+
+    cells = np.floor(centroids / edge).astype(np.int64)
+    keys = sample_utils.cell_keys(centroids, edge)
+    order = np.argsort(keys, kind='mergesort')
+    _, start, count = np.unique(keys[order], return_index=True, return_counts=True)
+    block_cells = cells[order[start]]
+    color = np.dot(block_cells % 2, (1, 2, 4))
+
+    lookup = dict((tuple(cell), i) for i, cell in enumerate(block_cells.tolist()))
+    offsets = [(i, j, k) for i in (-1, 0, 1) for j in (-1, 0, 1) for k in (-1, 0, 1)
+               if i or j or k]
+
+    samples = [None] * len(start)
+    empty = np.empty(0, dtype=int), np.empty((0, 2)), np.empty((0, 3))
+
+    def block_task(index):
+        owned = order[start[index]:start[index] + count[index]]
+        x, y, z = block_cells[index].tolist()
+        neighbours = [lookup.get((x + i, y + j, z + k)) for i, j, k in offsets]
+        neighbours = [n for n in neighbours if n is not None]
+        bb_min = tri_min[owned].min(axis=0)
+        bb_max = tri_max[owned].max(axis=0)
+
+        # the block is sampled into the halo of its neighbours that are not
+        # sampled yet and only the samples on its own triangles are kept.
+        # darts thrown on the halo give the border samples the same
+        # neighbourhood as the inner ones. the sampled neighbours are
+        # already covered by their fixed samples
+        margin = HALO_SIZE * radius
+        halo = [order[start[n]:start[n] + count[n]] for n in neighbours if samples[n] is None]
+        halo = np.concatenate(halo) if halo else np.empty(0, dtype=int)
+        halo = halo[((tri_max[halo] >= bb_min - margin)
+                     & (tri_min[halo] <= bb_max + margin)).all(axis=1)]
+
+        # samples closer than r to the block or its halo constrain it
+        fixed = [samples[n][2] for n in neighbours if samples[n] is not None]
+        fixed = np.concatenate(fixed) if fixed else np.empty((0, 3))
+        fixed = fixed[((fixed >= bb_min - margin - radius)
+                       & (fixed <= bb_max + margin + radius)).all(axis=1)]
+
+        # the task only holds the vertices of the block so it is cheap
+        # to send
+        tri_ids = np.concatenate((owned, halo))
+        block_cdf = np.cumsum(area[tri_ids])
+        block_cdf /= block_cdf[-1]
+        used, local = np.unique(triangles[tri_ids], return_inverse=True)
+        task = (vertices[used], local.reshape(-1, 3), block_cdf, len(owned),
+                radius, seed, index, fixed)
+        return tri_ids, task
+
+    pool = get_pool(processes)
+    try:
+        for phase in range(8):
+            blocks = [index for index in np.flatnonzero(color == phase).tolist()
+                      if area[order[start[index]:start[index] + count[index]]].sum() > 0]
+            tri_ids, tasks = zip(*[block_task(index) for index in blocks]) if blocks else ((), ())
+            results = map_tasks(pool, _sample_block, list(tasks))
+            for index, ids, (local_ids, bary, position) in zip(blocks, tri_ids, results):
+                samples[index] = ids[local_ids], bary, position
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    samples = [sample if sample is not None else empty for sample in samples]
+    return [np.concatenate(result) for result in zip(*samples)]
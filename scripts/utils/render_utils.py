@@ -1,3 +1,6 @@
+import os
+
+import numpy as np
 
 import maya.cmds as cmds
 import maya.OpenMaya as om
@@ -68,3 +71,102 @@ def sample_shading_node(shading_node, point_data, filter_size=0):
 
     return color_result, alpha_result
 
+
+
+def bake_shading_node(shading_node, resolution=1024, chunk_size=65536):
+    """ bake the outColor of the given shading node into an image over
+    the 0 - 1 uv space. 2d textures are read with colorAtPoint, all
+    other shading networks are sampled with sampleShadingNetwork in
+    chunks of chunk_size pixels
+    :param shading_node: name of the shading node
+    :param resolution: width and height of the image in pixels
+    :return: (resolution, resolution, 3) float32 array. rows go along v
+             and columns along u, sampled at the pixel centers """
+
+    if cmds.getClassification(cmds.nodeType(shading_node), satisfies='texture/2d'):
+        colors = cmds.colorAtPoint(shading_node,
+                                   output='RGB',
+                                   samplesU=resolution,
+                                   samplesV=resolution,
+                                   minU=0.5 / resolution,
+                                   maxU=1 - 0.5 / resolution,
+                                   minV=0.5 / resolution,
+                                   maxV=1 - 0.5 / resolution)
+
+        # colorAtPoint iterates over u in the outer loop
+        image = np.array(colors, dtype=np.float32).reshape(resolution, resolution, 3)
+        return image.transpose(1, 0, 2).copy()
+
+    # create temp material and shading engine for sampling
+    old_selection = cmds.ls(sl=True, l=True)
+    shd = cmds.shadingNode('surfaceShader', name='shaderEvalTemp', asShader=True)
+    shd_grp = cmds.sets(name='%sSG' % shd, empty=True, renderable=True, noSurfaceShader=True)
+    cmds.connectAttr('%s.outColor' % shd, '%s.surfaceShader' % shd_grp)
+    cmds.connectAttr(shading_node + '.outColor', shd + '.outColor')
+
+    try:
+        coords = (np.arange(resolution) + 0.5) / resolution
+        u_coords, v_coords = [c.ravel() for c in np.meshgrid(coords, coords)]
+        image = np.empty((resolution * resolution, 3), dtype=np.float32)
+
+        for start in range(0, len(u_coords), chunk_size):
+            end = min(start + chunk_size, len(u_coords))
+            count = end - start
+
+            points = om.MFloatPointArray(count, om.MFloatPoint(0, 0, 0))
+            normals = om.MFloatVectorArray(count, om.MFloatVector(0, 1, 0))
+            u_array = om.MFloatArray()
+            v_array = om.MFloatArray()
+            for u_coord, v_coord in zip(u_coords[start:end].tolist(), v_coords[start:end].tolist()):
+                u_array.append(u_coord)
+                v_array.append(v_coord)
+
+            color = om.MFloatVectorArray()
+            alpha = om.MFloatVectorArray()
+            omr.MRenderUtil.sampleShadingNetwork(shd_grp,
+                                                count,
+                                                False,
+                                                False,
+                                                om.MFloatMatrix(),
+                                                points,
+                                                u_array,
+                                                v_array,
+                                                normals,
+                                                points,
+                                                None,
+                                                None,
+                                                None,
+                                                color,
+                                                alpha)
+
+            image[start:end] = [(color[i].x, color[i].y, color[i].z) for i in xrange(count)]
+
+    finally:
+        cmds.delete((shd, shd_grp))
+        cmds.select(old_selection)
+
+    return image.reshape(resolution, resolution, 3)
+
+
+def get_texture_signature(shading_node):
+    """ return a signature that changes whenever the baked texture of the
+    given shading node would change. file textures are identified by
+    their path and modification time, all other networks by the values
+    of the attributes in their history
+    :param shading_node: name of the shading node
+    :return: hashable signature """
+
+    signature = []
+    for node in cmds.listHistory(shading_node) or []:
+        if cmds.nodeType(node) == 'file':
+            path = cmds.getAttr('{}.fileTextureName'.format(node))
+            mtime = os.path.getmtime(path) if os.path.isfile(path) else None
+            signature.append((node, path, mtime))
+        else:
+            for attr in cmds.listAttr(node, keyable=True, scalar=True) or []:
+                try:
+                    signature.append((node, attr, repr(cmds.getAttr('{}.{}'.format(node, attr)))))
+                except (RuntimeError, ValueError):
+                    continue
+
+    return tuple(signature)
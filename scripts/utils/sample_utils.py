@@ -0,0 +1,573 @@
+import math
+
+import numpy as np
+
+
+# bases of the halton sequence
+PRIMES = (2, 3, 5, 7, 11, 13)
+
+# barycentric coordinates at which a density is probed per triangle:
+# the corners, the edge midpoints and the centroid
+DENSITY_PROBES = np.array([(0, 0), (1, 0), (0, 1),
+                           (0.5, 0), (0.5, 0.5), (0, 0.5),
+                           (1 / 3.0, 1 / 3.0)])
+
+
+def pick_triangles(cdf, num_samples, rng=np.random):
+    """ pick triangle ids proportional to their area.
+    the random keys are sorted before searching the cdf which makes the
+    search and all following lookups much more cache friendly. the
+    returned ids are therefore in ascending order
+    :param cdf: (n,) array of the normalized cumulative triangle area
+    :param num_samples: number of triangles to pick
+    :param rng: numpy RandomState used for sampling
+    :return: (num_samples,) int array of triangle ids """
+
+    keys = rng.random_sample(num_samples)
+    keys.sort()
+    ids = np.searchsorted(cdf, keys, side='right')
+    return np.minimum(ids, len(cdf) - 1)
+
+
+def random_barycentric(num_samples, rng=np.random):
+    """ return uniformly distributed barycentric coordinates.
+    samples that fall outside the triangle are folded back into it
+    :param num_samples: number of coordinate pairs
+    :param rng: numpy RandomState used for sampling
+    :return: (num_samples, 2) array of r, s weights for the edges AB, AC """
+
+    bary = rng.random_sample((num_samples, 2))
+    outside = bary.sum(axis=1) >= 1
+    bary[outside] = 1 - bary[outside]
+    return bary
+
+
+def interpolate(p0, p1, p2, bary):
+    """ return the position of the given barycentric coordinates
+    :param p0, p1, p2: (n, 3) arrays of triangle corners
+    :param bary: (n, 2) array of r, s weights for the edges AB, AC
+    :return: (n, 3) array of positions """
+
+    r = bary[:, 0, np.newaxis]
+    s = bary[:, 1, np.newaxis]
+    return p0 + (p1 - p0) * r + (p2 - p0) * s
+
+
+def warp_barycentric(u, v):
+    """ map points of the unit square to uniformly distributed barycentric
+    coordinates. unlike folding, the mapping is continuous and keeps the
+    stratification of low discrepancy sequences
+    :param u, v: (n,) arrays of coordinates between 0 and 1
+    :return: (n, 2) array of r, s weights for the edges AB, AC """
+
+    root = np.sqrt(u)
+    return np.column_stack((root * (1 - v), root * v))
+
+
+def halton(num_samples, dims, rng=np.random):
+    """ return a randomly scrambled halton sequence.
+    the digits of every dimension are shuffled with a random permutation
+    per digit position which breaks the correlation between dimensions.
+    the sequence is fully determined by the state of the given rng
+    :param num_samples: number of points
+    :param dims: number of dimensions, at most len(PRIMES)
+    :param rng: numpy RandomState used for scrambling
+    :return: (num_samples, dims) array of values between 0 and 1 """
+
+    index = np.arange(num_samples, dtype=np.int64)
+    result = np.zeros((num_samples, dims))
+
+    for dim, base in enumerate(PRIMES[:dims]):
+
+        num_digits = int(math.ceil(math.log(max(num_samples, 2), base))) + 1
+        remaining = index.copy()
+        factor = 1.0 / base
+        for _ in range(num_digits):
+            digit = rng.permutation(base)[remaining % base]
+            result[:, dim] += digit * factor
+            remaining //= base
+            factor /= base
+
+    return result
+
+
+def morton_order(points, bits=10):
+    """ return the indices that sort the given points along a z-order curve
+    :param points: (n, 3) array of positions
+    :param bits: number of bits per axis used to quantize the positions
+    :return: (n,) array of indices """
+
+    extent = points.max(axis=0) - points.min(axis=0)
+    cells = (points - points.min(axis=0)) / max(extent.max(), 1e-12) * (2 ** bits - 1)
+    cells = cells.astype(np.int64)
+
+    # interleave the bits of the three axes
+    key = np.zeros(len(points), dtype=np.int64)
+    for bit in range(bits):
+        for axis in range(3):
+            key |= ((cells[:, axis] >> bit) & 1) << (3 * bit + axis)
+
+    return np.argsort(key, kind='mergesort')
+
+
+def halton_sample_surface(vertices, triangles, cdf, num_samples, rng=np.random):
+    """ sample points on the surface of an indexed mesh with a scrambled
+    halton sequence. the first dimension picks the triangle through the
+    area cdf and the other two are warped to barycentric coordinates.
+    the cdf is rebuilt along a z-order curve of the triangle centroids so
+    values close in the first dimension map to triangles close in space,
+    which carries the stratification of the sequence over to the surface
+    :param vertices: (v, 3) array of vertex positions
+    :param triangles: (n, 3) array of vertex indices per triangle
+    :param cdf: (n,) array of the normalized cumulative triangle area
+    :param num_samples: number of points to sample
+    :param rng: numpy RandomState used for scrambling
+    :return: (num_samples,) triangle ids, (num_samples, 2) barycentric
+             coordinates and (num_samples, 3) positions """
+
+    order = morton_order(vertices[triangles].mean(axis=1).astype(float))
+    area = np.diff(np.concatenate(([0], cdf)))
+    curve_cdf = np.cumsum(area[order])
+
+    sequence = halton(num_samples, 3, rng)
+    tri_ids = np.searchsorted(curve_cdf, sequence[:, 0] * curve_cdf[-1], side='right')
+    tri_ids = order[np.minimum(tri_ids, len(cdf) - 1)]
+    bary = warp_barycentric(sequence[:, 1], sequence[:, 2])
+
+    corners = vertices[triangles[tri_ids]].astype(float)
+    position = interpolate(corners[:, 0], corners[:, 1], corners[:, 2], bary)
+
+    return tri_ids, bary, position
+
+
+def sample_surface(vertices, triangles, cdf, num_samples, rng=np.random):
+    """ sample random points uniformly on the surface of an indexed mesh
+    :param vertices: (v, 3) array of vertex positions
+    :param triangles: (n, 3) array of vertex indices per triangle
+    :param cdf: (n,) array of the normalized cumulative triangle area
+    :param num_samples: number of points to sample
+    :param rng: numpy RandomState used for sampling
+    :return: (num_samples,) triangle ids, (num_samples, 2) barycentric
+             coordinates and (num_samples, 3) positions """
+
+    tri_ids = pick_triangles(cdf, num_samples, rng)
+    bary = random_barycentric(num_samples, rng)
+
+    corners = vertices[triangles[tri_ids]].astype(float)
+    position = interpolate(corners[:, 0], corners[:, 1], corners[:, 2], bary)
+
+    return tri_ids, bary, position
+
+
+def closest_point_on_triangles(points, p0, p1, p2):
+    """ return the closest point on each triangle to the given points
+    :param points: (n, 3) array of query points
+    :param p0, p1, p2: (n, 3) arrays of triangle corners
+    :return: (n, 3) array of closest points and (n, 2) array of r, s
+             weights for the edges AB, AC """
+
+    ab = p1 - p0
+    ac = p2 - p0
+    ap = points - p0
+    bp = points - p1
+    cp = points - p2
+
+    d1 = np.sum(ab * ap, axis=1)
+    d2 = np.sum(ac * ap, axis=1)
+    d3 = np.sum(ab * bp, axis=1)
+    d4 = np.sum(ac * bp, axis=1)
+    d5 = np.sum(ab * cp, axis=1)
+    d6 = np.sum(ac * cp, axis=1)
+
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denom = 1.0 / (va + vb + vc)
+        edge_ab = d1 / (d1 - d3)
+        edge_ac = d2 / (d2 - d6)
+        edge_bc = (d4 - d3) / ((d4 - d3) + (d5 - d6))
+        inside_r = vb * denom
+        inside_s = vc * denom
+
+    # voronoi regions of the triangle. the first matching region wins
+    regions = [(d1 <= 0) & (d2 <= 0), # vertex a
+               (d3 >= 0) & (d4 <= d3), # vertex b
+               (d6 >= 0) & (d5 <= d6), # vertex c
+               (vc <= 0) & (d1 >= 0) & (d3 <= 0), # edge ab
+               (vb <= 0) & (d2 >= 0) & (d6 <= 0), # edge ac
+               (va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0)] # edge bc
+    r = np.select(regions, [0, 1, 0, edge_ab, 0, 1 - edge_bc], inside_r)
+    s = np.select(regions, [0, 0, 1, 0, edge_ac, edge_bc], inside_s)
+
+    bary = np.nan_to_num(np.column_stack((r, s)))
+    return interpolate(p0, p1, p2, bary), bary
+
+
+def project_to_surface(points, vertices, triangles, centroid_tree, num_candidates=8):
+    """ project the given points onto the closest triangle of an indexed
+    mesh. the closest triangle is searched among the triangles with the
+    nearest centroids
+    :param points: (n, 3) array of query points
+    :param vertices: (v, 3) array of vertex positions
+    :param triangles: (t, 3) array of vertex indices per triangle
+    :param centroid_tree: cKDTree of the triangle centroids
+    :param num_candidates: number of triangles tested per point
+    :return: (n,) triangle ids, (n, 2) barycentric coordinates and
+             (n, 3) positions """
+
+    num_points = len(points)
+    num_candidates = min(num_candidates, len(triangles))
+    _, candidates = centroid_tree.query(points, num_candidates)
+    candidates = candidates.reshape(num_points, num_candidates)
+
+    corners = vertices[triangles[candidates.ravel()]].astype(float)
+    query = np.repeat(points, num_candidates, axis=0)
+    closest, bary = closest_point_on_triangles(query, corners[:, 0], corners[:, 1], corners[:, 2])
+
+    distance = np.sum((closest - query) ** 2, axis=1).reshape(num_points, num_candidates)
+    best = np.argmin(distance, axis=1)
+    pick = np.arange(num_points) * num_candidates + best
+
+    return candidates[np.arange(num_points), best], bary[pick], closest[pick]
+
+
+def barycentric_2d(points, a, b, c):
+    """ return the barycentric coordinates of 2d points in 2d triangles
+    :param points: (n, 2) array of query points
+    :param a, b, c: (n, 2) arrays of triangle corners
+    :return: (n, 2) array of r, s weights for the edges AB, AC.
+             degenerated triangles return nan """
+
+    ab = b - a
+    ac = c - a
+    ap = points - a
+
+    det = ab[:, 0] * ac[:, 1] - ab[:, 1] * ac[:, 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = (ap[:, 0] * ac[:, 1] - ap[:, 1] * ac[:, 0]) / det
+        s = (ab[:, 0] * ap[:, 1] - ab[:, 1] * ap[:, 0]) / det
+
+    return np.column_stack((r, s))
+
+
+class TriangleGrid(object):
+    """ uniform grid over the bounding boxes of 2d triangles.
+    every triangle is stored in all cells its bounding box overlaps, so
+    the cell of a point lists every triangle that may contain the point,
+    no matter how large the triangle is compared to its neighbours. the
+    cell size is chosen to have about as many cells as triangles """
+
+    def __init__(self, corners, tri_ids=None):
+        """ :param corners: (t, 3, 2) array of triangle corners
+        :param tri_ids: optional (m,) array of the triangles to store,
+                        all triangles if None """
+
+        if tri_ids is None:
+            tri_ids = np.arange(len(corners))
+
+        self.tri_ids = np.asarray(tri_ids, dtype=int)
+        bb_min = corners[self.tri_ids].min(axis=1).astype(float)
+        bb_max = corners[self.tri_ids].max(axis=1).astype(float)
+
+        num_triangles = max(len(self.tri_ids), 1)
+        self.origin = bb_min.min(axis=0) if len(bb_min) else np.zeros(2)
+        extent = bb_max.max(axis=0) - self.origin if len(bb_max) else np.zeros(2)
+        self.cell_size = max(math.sqrt(extent[0] * extent[1] / num_triangles),
+                             extent.max() / num_triangles, 1e-12)
+        self.shape = (extent / self.cell_size).astype(int) + 1
+
+        # one entry per triangle and overlapped cell
+        cell_min = self.cells(bb_min)
+        span = self.cells(bb_max) - cell_min + 1
+        count = span[:, 0] * span[:, 1]
+        owner = np.repeat(np.arange(len(count)), count)
+        local = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        keys = cell_min[owner, 0] + local % span[owner, 0]\
+            + self.shape[0] * (cell_min[owner, 1] + local // span[owner, 0])
+
+        order = np.argsort(keys, kind='mergesort')
+        self.entries = self.tri_ids[owner[order]]
+        self.offsets = np.searchsorted(keys[order], np.arange(self.shape[0] * self.shape[1] + 1))
+
+    def cells(self, points):
+        """ return the (n, 2) cell coordinates of the given points """
+
+        cells = np.floor((points - self.origin) / self.cell_size).astype(int)
+        return np.clip(cells, 0, self.shape - 1)
+
+    def query(self, points):
+        """ return every pair of a point and a triangle whose bounding box
+        overlaps the cell of the point
+        :param points: (n, 2) array of query points
+        :return: (k,) point indices and (k,) triangle ids, sorted by the
+                 point index """
+
+        cells = self.cells(points)
+        outside = ((points < self.origin) | (points > self.origin + self.shape * self.cell_size)).any(axis=1)
+        keys = cells[:, 0] + self.shape[0] * cells[:, 1]
+
+        start = self.offsets[keys]
+        count = np.where(outside, 0, self.offsets[keys + 1] - start)
+        point_ids = np.repeat(np.arange(len(points)), count)
+        local = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        return point_ids, self.entries[np.repeat(start, count) + local]
+
+
+def locate_uvs(uvs, tri_uvs, uv_grid, tolerance=1e-6):
+    """ find the triangle containing each of the given uv coordinates.
+    every triangle of the grid cell of a uv is tested. uvs without a
+    containing triangle get the id -1
+    :param uvs: (n, 2) array of uv coordinates
+    :param tri_uvs: (t, 3, 2) array of uv coordinates per triangle corner
+    :param uv_grid: TriangleGrid of all mapped triangles
+    :return: (n,) triangle ids and (n, 2) barycentric coordinates """
+
+    point_ids, candidates, bary = locate_candidates(uvs, tri_uvs, uv_grid, tolerance)
+
+    # take the first triangle containing the uv
+    found, first = np.unique(point_ids, return_index=True)
+    tri_ids = np.full(len(uvs), -1, dtype=int)
+    tri_ids[found] = candidates[first]
+    result = np.zeros((len(uvs), 2))
+    result[found] = bary[first]
+
+    return tri_ids, result
+
+
+def locate_candidates(points, corners, grid, tolerance=1e-6):
+    """ return all pairs of a point and a triangle containing it
+    :param points: (n, 2) array of query points
+    :param corners: (t, 3, 2) array of triangle corners
+    :param grid: TriangleGrid of the triangles
+    :return: (k,) point indices sorted in ascending order, (k,) triangle
+             ids and (k, 2) barycentric coordinates """
+
+    point_ids, candidates = grid.query(points)
+    tri_corners = corners[candidates].astype(float)
+    bary = barycentric_2d(points[point_ids], tri_corners[:, 0], tri_corners[:, 1], tri_corners[:, 2])
+    with np.errstate(invalid='ignore'):
+        inside = (bary[:, 0] >= -tolerance) & (bary[:, 1] >= -tolerance)\
+            & (bary.sum(axis=1) <= 1 + tolerance)
+
+    return point_ids[inside], candidates[inside], np.clip(bary[inside], 0, 1)
+
+
+def cell_keys(points, cell_size):
+    """ return a unique integer key of the grid cell each point lies in
+    :param points: (n, 3) array of positions
+    :param cell_size: edge length of the cubic grid cells
+    :return: (n,) int64 array of cell keys """
+
+    cells = np.floor(points / cell_size).astype(np.int64)
+    cells -= cells.min(axis=0)
+    dims = cells.max(axis=0) + 1
+    return cells[:, 0] + dims[0] * (cells[:, 1] + dims[1] * cells[:, 2])
+
+
+def pick_per_cell(points, cell_size, rng=np.random):
+    """ pick one random point out of every occupied grid cell.
+    the points are shuffled and the first point of every cell is kept
+    :param points: (n, 3) array of positions
+    :param cell_size: edge length of the cubic grid cells
+    :param rng: numpy RandomState used for sampling
+    :return: sorted array of indices of the picked points """
+
+    if not len(points):
+        return np.empty(0, dtype=int)
+
+    order = rng.permutation(len(points))
+    _, first = np.unique(cell_keys(points[order], cell_size), return_index=True)
+    return np.sort(order[first])
+
+
+def subdivide_triangles(vertices, triangles, max_edge):
+    """ split the triangles of an indexed mesh into sub triangles with
+    edges no longer than max_edge. every triangle is split into n * n
+    congruent sub triangles, where n depends on its longest edge
+    :return: (m,) ids of the source triangle per sub triangle and
+             (m, 3, 2) barycentric coordinates of the sub triangle corners """
+
+    corners = vertices[triangles].astype(float)
+    edges = np.stack((corners[:, 1] - corners[:, 0],
+                      corners[:, 2] - corners[:, 1],
+                      corners[:, 0] - corners[:, 2]), axis=1)
+    longest = np.sqrt(np.sum(edges ** 2, axis=2)).max(axis=1)
+    level = np.maximum(np.ceil(longest / max_edge).astype(int), 1)
+
+    tri_ids = []
+    sub_bary = []
+    for n in np.unique(level):
+
+        # corners of the n * n sub triangles on a barycentric grid
+        a, b = [g.ravel() for g in np.mgrid[0:n, 0:n]]
+        up = a + b <= n - 1
+        down = a + b <= n - 2
+        up = np.transpose(((a, b), (a + 1, b), (a, b + 1)), (2, 0, 1))[up]
+        down = np.transpose(((a + 1, b), (a + 1, b + 1), (a, b + 1)), (2, 0, 1))[down]
+        template = np.vstack((up, down))
+        template = template.astype(float) / n
+
+        ids = np.flatnonzero(level == n)
+        tri_ids.append(np.repeat(ids, len(template)))
+        sub_bary.append(np.tile(template, (len(ids), 1, 1)))
+
+    return np.concatenate(tri_ids), np.concatenate(sub_bary)
+
+
+def stratified_sample_surface(vertices, triangles, cell_size, rng=np.random):
+    """ draw one sample from the surface inside every occupied grid cell.
+    the mesh is subdivided to half the cell size and every sub triangle
+    is assigned to the cell of its centroid. one sub triangle per cell is
+    picked proportional to its area and a random point is drawn on it
+    :param vertices: (v, 3) array of vertex positions
+    :param triangles: (t, 3) array of vertex indices per triangle
+    :param cell_size: edge length of the cubic grid cells
+    :param rng: numpy RandomState used for sampling
+    :return: (n,) triangle ids, (n, 2) barycentric coordinates and
+             (n, 3) positions """
+
+    tri_ids, sub_bary = subdivide_triangles(vertices, triangles, cell_size / 2.0)
+    corners = vertices[triangles[tri_ids]].astype(float)
+    p0, p1, p2 = corners[:, 0], corners[:, 1], corners[:, 2]
+
+    # centroid and area of every sub triangle
+    centroid = interpolate(p0, p1, p2, sub_bary.mean(axis=1))
+    normal = np.cross(p1 - p0, p2 - p0)
+    level = np.sqrt(np.bincount(tri_ids)[tri_ids])
+    area = np.sqrt(np.sum(normal ** 2, axis=1)) / level ** 2
+
+    # sort the sub triangles by cell and search a random key in the
+    # cumulative area of each cell
+    keys = cell_keys(centroid, cell_size)
+    order = np.argsort(keys, kind='mergesort')
+    _, start, count = np.unique(keys[order], return_index=True, return_counts=True)
+    cumulative = np.cumsum(area[order])
+    before = np.concatenate(([0], cumulative))[start]
+    total = cumulative[start + count - 1] - before
+    pick = np.searchsorted(cumulative, before + rng.random_sample(len(start)) * total, side='right')
+    pick = order[np.clip(pick, start, start + count - 1)]
+
+    # random point on the picked sub triangles in source triangle coordinates
+    sub = sub_bary[pick]
+    bary = interpolate(sub[:, 0], sub[:, 1], sub[:, 2], random_barycentric(len(pick), rng))
+    position = interpolate(p0[pick], p1[pick], p2[pick], bary)
+
+    return tri_ids[pick], bary, position
+
+
+def drop_to_surface(points, vertices, triangles):
+    """ project 2d points in the xz plane vertically onto an indexed mesh.
+    all up facing triangles containing a point in the xz plane are tested
+    and the highest hit is taken, so every point lands on the top of the
+    surface
+    :param points: (n, 2) array of x, z coordinates
+    :param vertices: (v, 3) array of vertex positions
+    :param triangles: (t, 3) array of vertex indices per triangle
+    :return: (n,) triangle ids, -1 for points that miss the mesh and
+             (n, 2) barycentric coordinates """
+
+    corners = vertices[triangles].astype(float)
+    normal_y = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])[:, 1]
+    up_ids = np.flatnonzero(normal_y > 0)
+    tri_ids = np.full(len(points), -1, dtype=int)
+    result = np.zeros((len(points), 2))
+    if not len(up_ids):
+        return tri_ids, result
+
+    ground = corners[:, :, [0, 2]]
+    point_ids, candidates, bary = locate_candidates(points, ground, TriangleGrid(ground, up_ids))
+
+    # take the highest hit of every point
+    y = corners[candidates, :, 1]
+    height = y[:, 0] + (y[:, 1] - y[:, 0]) * bary[:, 0] + (y[:, 2] - y[:, 0]) * bary[:, 1]
+    order = np.lexsort((-height, point_ids))
+    found, first = np.unique(point_ids[order], return_index=True)
+    tri_ids[found] = candidates[order[first]]
+    result[found] = bary[order[first]]
+
+    return tri_ids, result
+
+
+def density_bounds(density, num_triangles, chunk_size=100000):
+    """ estimate the maximum and the mean of a density over every triangle
+    by evaluating it at the DENSITY_PROBES. the maximum is exact for
+    densities that are linear within the triangle, e.g. vertex colors
+    :param density: callable taking (n,) triangle ids and (n, 2)
+                    barycentric coordinates, returning (n,) densities
+    :param num_triangles: number of triangles
+    :param chunk_size: number of triangles probed at once
+    :return: (t,) array of maxima and (t,) array of means """
+
+    num_probes = len(DENSITY_PROBES)
+    bound = np.empty(num_triangles)
+    mean = np.empty(num_triangles)
+    for start in range(0, num_triangles, chunk_size):
+        end = min(start + chunk_size, num_triangles)
+        tri_ids = np.repeat(np.arange(start, end), num_probes)
+        bary = np.tile(DENSITY_PROBES, (end - start, 1))
+        values = np.asarray(density(tri_ids, bary), dtype=float).reshape(-1, num_probes)
+        bound[start:end] = values.max(axis=1)
+        mean[start:end] = values.mean(axis=1)
+
+    return bound, mean
+
+
+def weighted_cdf(cdf, weights):
+    """ reweight the area cdf of a mesh with the given per triangle weights
+    :param cdf: (t,) array of the normalized cumulative triangle area
+    :param weights: (t,) array of non negative weights
+    :return: (t,) normalized cdf of area * weight or None if the
+             weighted area is zero """
+
+    area = np.diff(np.concatenate(([0], cdf)))
+    weighted = np.cumsum(area * np.maximum(weights, 0))
+    if not len(weighted) or weighted[-1] <= 0:
+        return None
+
+    return weighted / weighted[-1]
+
+
+def triangles_in_box(vertices, triangles, bb_min, bb_max):
+    """ find the triangles whose bounding box overlaps the given box
+    :param vertices: (v, 3) array of vertex positions
+    :param triangles: (t, 3) array of vertex indices per triangle
+    :param bb_min: lower corner of the box
+    :param bb_max: upper corner of the box
+    :return: (t,) boolean mask """
+
+    corners = vertices[triangles]
+    return np.all(corners.max(axis=1) >= bb_min, axis=1)\
+        & np.all(corners.min(axis=1) <= bb_max, axis=1)
+
+
+def triangles_in_sphere(vertices, triangles, center, radius):
+    """ find the triangles touching the given sphere
+    :param vertices: (v, 3) array of vertex positions
+    :param triangles: (t, 3) array of vertex indices per triangle
+    :param center: center of the sphere
+    :param radius: radius of the sphere
+    :return: (t,) boolean mask """
+
+    center = np.asarray(center, dtype=float)
+    mask = triangles_in_box(vertices, triangles, center - radius, center + radius)
+
+    ids = np.flatnonzero(mask)
+    corners = vertices[triangles[ids]].astype(float)
+    query = np.tile(center, (len(ids), 1))
+    closest, _ = closest_point_on_triangles(query, corners[:, 0], corners[:, 1], corners[:, 2])
+    mask[ids] = np.sum((closest - query) ** 2, axis=1) <= radius ** 2
+    return mask
+
+
+def points_in_box(points, bb_min, bb_max):
+    """ :return: (n,) boolean mask of the points inside the given box """
+
+    return np.all((points >= bb_min) & (points <= bb_max), axis=1)
+
+
+def points_in_sphere(points, center, radius):
+    """ :return: (n,) boolean mask of the points inside the given sphere """
+
+    return np.sum((points - center) ** 2, axis=1) <= radius ** 2
@@ -3,6 +3,8 @@ import sys
 import unittest
 import __builtin__
 
+import numpy as np
+
 import maya.cmds as cmds
 
 
@@ -65,6 +67,22 @@ class TestUtil(object):
         return suite
 
 
+def grid_plane(res, size):
+    """ create a square grid plane in the xz plane for tests
+    :param res: number of quads per side
+    :param size: edge length of the plane
+    :return: (v, 3) array of vertices, (2 * res * res, 3) array of triangles """
+
+    x = np.linspace(0, size, res + 1)
+    grid_x, grid_z = np.meshgrid(x, x)
+    vertices = np.column_stack((grid_x.ravel(), np.zeros(grid_x.size), grid_z.ravel()))
+    i, j = np.meshgrid(np.arange(res), np.arange(res))
+    a = (j * (res + 1) + i).ravel()
+    triangles = np.vstack((np.column_stack((a, a + res + 1, a + 1)),
+                           np.column_stack((a + 1, a + res + 1, a + res + 2))))
+    return vertices, triangles
+
+
 class TestCase(unittest.TestCase):
     plugins = set()
 
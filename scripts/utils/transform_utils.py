@@ -0,0 +1,213 @@
+""" batched placement transforms.
+all functions take and return numpy arrays with one row per instance.
+matrices follow maya's row vector convention (p' = p * M) and euler
+rotations are given in degrees with xyz rotation order. """
+
+import numpy as np
+
+
+WORLD_UP = np.array((0.0, 1.0, 0.0))
+
+
+def normalize(vectors):
+    """ return the given (n, 3) vectors normalized """
+
+    length = np.sqrt(np.sum(vectors ** 2, axis=1))
+    return vectors / np.maximum(length, 1e-12)[:, np.newaxis]
+
+
+def euler_to_matrix(rotation):
+    """ convert xyz euler rotations to rotation matrices
+    :param rotation: (n, 3) array of euler angles in degrees
+    :return: (n, 3, 3) array of row vector rotation matrices """
+
+    rx, ry, rz = np.radians(rotation).T
+    cx, sx = np.cos(rx), np.sin(rx)
+    cy, sy = np.cos(ry), np.sin(ry)
+    cz, sz = np.cos(rz), np.sin(rz)
+
+    # Rx * Ry * Rz
+    matrix = np.empty((len(rx), 3, 3))
+    matrix[:, 0, 0] = cy * cz
+    matrix[:, 0, 1] = cy * sz
+    matrix[:, 0, 2] = -sy
+    matrix[:, 1, 0] = sx * sy * cz - cx * sz
+    matrix[:, 1, 1] = sx * sy * sz + cx * cz
+    matrix[:, 1, 2] = sx * cy
+    matrix[:, 2, 0] = cx * sy * cz + sx * sz
+    matrix[:, 2, 1] = cx * sy * sz - sx * cz
+    matrix[:, 2, 2] = cx * cy
+    return matrix
+
+
+def matrix_to_euler(matrix):
+    """ convert rotation matrices to xyz euler rotations
+    :param matrix: (n, 3, 3) array of row vector rotation matrices
+    :return: (n, 3) array of euler angles in degrees """
+
+    sy = -np.clip(matrix[:, 0, 2], -1, 1)
+    ry = np.arcsin(sy)
+    gimbal = np.abs(sy) > 1 - 1e-9
+
+    # in gimbal lock only the sum of x and z is defined. keep z at zero
+    rx = np.where(gimbal,
+                  np.arctan2(-matrix[:, 2, 1], matrix[:, 1, 1]),
+                  np.arctan2(matrix[:, 1, 2], matrix[:, 2, 2]))
+    rz = np.where(gimbal, 0, np.arctan2(matrix[:, 0, 1], matrix[:, 0, 0]))
+
+    return np.degrees(np.column_stack((rx, ry, rz)))
+
+
+def axis_angle_to_matrix(axis, angle):
+    """ create rotation matrices from normalized axes and angles
+    :param axis: (n, 3) array of normalized rotation axes
+    :param angle: (n,) array of angles in radians
+    :return: (n, 3, 3) array of row vector rotation matrices """
+
+    x, y, z = axis.T
+    c, s = np.cos(angle), np.sin(angle)
+    t = 1 - c
+
+    # transpose of the rodrigues rotation matrix since maya uses row vectors
+    matrix = np.empty((len(angle), 3, 3))
+    matrix[:, 0, 0] = t * x * x + c
+    matrix[:, 0, 1] = t * x * y + s * z
+    matrix[:, 0, 2] = t * x * z - s * y
+    matrix[:, 1, 0] = t * x * y - s * z
+    matrix[:, 1, 1] = t * y * y + c
+    matrix[:, 1, 2] = t * y * z + s * x
+    matrix[:, 2, 0] = t * x * z + s * y
+    matrix[:, 2, 1] = t * y * z - s * x
+    matrix[:, 2, 2] = t * z * z + c
+    return matrix
+
+
+def align(source, target, weight=1.0):
+    """ rotations turning the source vectors towards the target vectors.
+    the rotation is slerped by the given weight the same way as
+    MQuaternion(source, target, weight) does
+    :param source: (n, 3) or (3,) array of vectors to rotate from
+    :param target: (n, 3) array of vectors to rotate into
+    :param weight: float or (n,) array between 0 and 1
+    :return: (n, 3, 3) array of row vector rotation matrices """
+
+    target = normalize(np.atleast_2d(target).astype(float))
+    source = normalize(np.broadcast_to(source, target.shape).astype(float))
+
+    axis = np.cross(source, target)
+    sin = np.sqrt(np.sum(axis ** 2, axis=1))
+    cos = np.sum(source * target, axis=1)
+    angle = np.arctan2(sin, cos)
+
+    # parallel vectors have no defined axis. use any perpendicular axis
+    degenerated = sin < 1e-9
+    if degenerated.any():
+        fallback = np.cross(source[degenerated], (1, 0, 0))
+        small = np.sum(fallback ** 2, axis=1) < 1e-9
+        fallback[small] = np.cross(source[degenerated][small], (0, 0, 1))
+        axis[degenerated] = fallback
+
+    return axis_angle_to_matrix(normalize(axis), angle * weight)
+
+
+def random_rotation(num_points, min_rot, max_rot, rng=np.random):
+    """ random euler rotations between min and max rotation
+    :return: (n, 3) array of euler angles in degrees """
+
+    return rng.uniform(min_rot, max_rot, (num_points, 3))
+
+
+def get_rotation(direction, weight, initial_rotation):
+    """ rotate the given initial rotations into the given directions.
+    the initial rotation is applied first, then the object is turned from
+    the world up vector towards the direction by the given weight
+    :param direction: (n, 3) array of alignment directions
+    :param weight: float between 0 and 1
+    :param initial_rotation: (n, 3) array of euler angles in degrees
+    :return: (n, 3) array of euler angles in degrees """
+
+    matrix = np.matmul(euler_to_matrix(initial_rotation),
+                       align(WORLD_UP, direction, weight))
+    return matrix_to_euler(matrix)
+
+
+def rotate_into(rotation, direction, weight):
+    """ turn the local up vector of the given rotations towards the given
+    directions by the given weight
+    :param rotation: (n, 3) array of current euler angles in degrees
+    :param direction: (n, 3) array of target directions
+    :param weight: float between 0 and 1
+    :return: (n, 3) array of euler angles in degrees """
+
+    matrix = euler_to_matrix(rotation)
+    local_up = matrix[:, 1]
+    matrix = np.matmul(matrix, align(local_up, direction, weight))
+    return matrix_to_euler(matrix)
+
+
+def randomize_rotation(rotation, weight, rng=np.random):
+    """ add a random rotation of up to 5 degrees times the given weight
+    :param rotation: (n, 3) array of euler angles in degrees
+    :return: (n, 3) array of euler angles in degrees """
+
+    factor = 5 * weight
+    jitter = rng.uniform(-factor, factor, (len(rotation), 3))
+    matrix = np.matmul(euler_to_matrix(rotation), euler_to_matrix(jitter))
+    return matrix_to_euler(matrix)
+
+
+def random_scale(num_points, min_scale, max_scale, uniform=True, rng=np.random):
+    """ random scale values between min and max scale
+    :return: (n, 3) array of scale values """
+
+    if uniform:
+        scale = rng.uniform(min_scale[0], max_scale[0], num_points)
+        return np.repeat(scale[:, np.newaxis], 3, axis=1)
+
+    return rng.uniform(min_scale, max_scale, (num_points, 3))
+
+
+def random_offset(num_points, min_offset, max_offset, rng=np.random):
+    """ random offset values between min and max offset
+    :return: (n,) array of offsets """
+
+    return rng.uniform(min_offset, max_offset, num_points)
+
+
+def apply_offset(position, normal, offset):
+    """ move the given positions along their normal by the given offset
+    :return: (n, 3) array of positions """
+
+    return position + normal * np.asarray(offset)[:, np.newaxis]
+
+
+def footprint_radius(prototype_radius, instance_id, scale):
+    """ radius of the footprint of instances on the surface. the radius of
+    the instanced prototype is scaled by the larger of the x and z scale
+    :param prototype_radius: (p,) array of footprint radii per prototype
+    :param instance_id: (n,) array of instance ids. ids without a
+                        prototype have a radius of 0
+    :param scale: (n, 3) array of scale values
+    :return: (n,) array of radii """
+
+    prototype_radius = np.asarray(prototype_radius, dtype=float)
+    instance_id = np.asarray(instance_id, dtype=int)
+    valid = (instance_id >= 0) & (instance_id < len(prototype_radius))
+
+    radius = np.zeros(len(instance_id))
+    radius[valid] = prototype_radius[instance_id[valid]]
+    return radius * np.abs(np.asarray(scale)[:, [0, 2]]).max(axis=1)
+
+
+def get_tangent(normal):
+    """ return normalized tangents for the given normals.
+    the tangent is perpendicular to the normal and to the longer one of
+    normal x (0, 0, 1) and normal x (0, 1, 0)
+    :param normal: (n, 3) array of normals
+    :return: (n, 3) array of tangents """
+
+    u = np.cross(normal, (0, 0, 1))
+    v = np.cross(normal, (0, 1, 0))
+    use_u = np.sum(u ** 2, axis=1) > np.sum(v ** 2, axis=1)
+    tangent = normalize(np.where(use_u[:, np.newaxis], u, v))
+    return normalize(np.cross(normal, tangent))
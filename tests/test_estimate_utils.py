@@ -0,0 +1,62 @@
+import numpy as np
+
+from test_util import TestCase
+import estimate_utils
+
+
+class TestEstimateUtils(TestCase):
+
+    def test_candidate_count(self):
+
+        self.assertEqual(estimate_utils.candidate_count('random', 10, 500), (500, 500))
+        self.assertEqual(estimate_utils.candidate_count('elimination', 10, 500), (2500, 500))
+        self.assertEqual(estimate_utils.candidate_count('stratified', 100, cell_size=2), (25, 25))
+
+        # jitter never keeps more points than cells or samples
+        drawn, candidates = estimate_utils.candidate_count('jitter', 100, 10, cell_size=1)
+        self.assertAlmostEqual(candidates, 10, 0)
+        drawn, candidates = estimate_utils.candidate_count('jitter', 100, 100000, cell_size=1)
+        self.assertAlmostEqual(candidates, 100)
+
+        drawn, candidates = estimate_utils.candidate_count('poisson3d', 100, radius=0.5)
+        self.assertAlmostEqual(candidates, estimate_utils.DISK_PACKING * 400)
+
+        # multiclass is limited by the sum of the classes and the global radius
+        drawn, candidates = estimate_utils.candidate_count('multiclass', 100, radius=0.5, class_radius=[1, 2])
+        self.assertAlmostEqual(candidates, estimate_utils.DISK_PACKING * 125)
+        drawn, candidates = estimate_utils.candidate_count('multiclass', 100, radius=0.5, class_radius=[0.1, 2])
+        self.assertAlmostEqual(candidates, estimate_utils.DISK_PACKING * 400)
+        self.assertRaises(ValueError, estimate_utils.candidate_count, 'foo', 1)
+
+    def test_expected_count(self):
+        """ test that the interval covers the outcome of the emit """
+
+        rng = np.random.RandomState(0)
+        covered = 0
+        for i in range(100):
+            pilot = rng.random_sample(1000) < 0.3
+            emit = (rng.random_sample(100000) < 0.3).sum()
+            count, low, high = estimate_utils.expected_count(100000, pilot.sum(), 1000)
+            self.assertTrue(low <= count <= high)
+            covered += low <= emit <= high
+
+        self.assertTrue(covered >= 90)
+
+        # the interval never collapses and never exceeds the candidates
+        count, low, high = estimate_utils.expected_count(1000, 0, 100)
+        self.assertEqual(count, 0)
+        self.assertTrue(high > 0)
+        count, low, high = estimate_utils.expected_count(1000, 100, 100)
+        self.assertEqual(high, 1000)
+        self.assertTrue(low < 1000)
+
+    def test_cost(self):
+
+        self.assertEqual(estimate_utils.peak_memory(10, 5),
+                         10 * estimate_utils.SAMPLE_BYTES + 5 * estimate_utils.POINT_BYTES)
+
+        random = estimate_utils.runtime('random', 1000, 1000, 500, 1e-6, 0, 0)
+        poisson = estimate_utils.runtime('poisson3d', 1000, 1000, 500, 1e-6, 0, 0)
+        self.assertAlmostEqual(random, 1e-3)
+        self.assertTrue(poisson > random)
+        self.assertAlmostEqual(estimate_utils.runtime('random', 0, 1000, 500, 0, 1e-6, 2e-6), 2e-3)
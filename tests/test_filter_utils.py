@@ -0,0 +1,133 @@
+import numpy as np
+
+from test_util import TestCase
+import filter_utils
+
+
+class TestFilterUtils(TestCase):
+
+    def setUp(self):
+
+        self.rng = np.random.RandomState(0)
+
+    def test_pipeline(self):
+        """ test combining masks with and / or """
+
+        points = np.arange(10)
+        pipeline = filter_utils.FilterPipeline()
+        self.assertTrue(pipeline.evaluate(points).all())
+
+        pipeline.add(lambda p: p > 2)
+        pipeline.add(lambda p: p < 6)
+        self.assertEqual(np.flatnonzero(pipeline.evaluate(points)).tolist(), [3, 4, 5])
+
+        pipeline.add(lambda p: p == 9, 'or')
+        self.assertEqual(np.flatnonzero(pipeline.evaluate(points)).tolist(), [3, 4, 5, 9])
+
+        self.assertRaises(ValueError, pipeline.add, lambda p: p, 'xor')
+
+    def test_altitude_mask(self):
+
+        position = np.zeros((5, 3))
+        position[:, 1] = (0, 2, 5, 8, 10)
+
+        keep = filter_utils.altitude_mask(position, 0, 10, 0.3, 0.7, 0, 0, self.rng)
+        self.assertEqual(keep.tolist(), [False, False, True, False, False])
+
+        # points within the fuzziness are kept with falling probability
+        position = np.zeros((10000, 3))
+        position[:, 1] = 2.5
+        keep = filter_utils.altitude_mask(position, 0, 10, 0.3, 0.7, 0.1, 0, self.rng)
+        self.assertAlmostEqual(keep.mean(), 0.5, 1)
+
+    def test_slope_mask(self):
+
+        normal = np.array([(0, 1, 0), (1, 1, 0), (1, 0, 0), (0, -2, 0)], dtype=float)
+        keep = filter_utils.slope_mask(normal, 0, 50, 0, self.rng)
+        self.assertEqual(keep.tolist(), [True, True, False, False])
+
+    def test_texture_mask(self):
+
+        self.assertTrue(filter_utils.texture_mask(np.ones(100), rng=self.rng).all())
+        self.assertFalse(filter_utils.texture_mask(np.full(100, -1.0), rng=self.rng).any())
+        keep = filter_utils.texture_mask(np.full(10000, 0.5 ** 2.2), rng=self.rng)
+        self.assertAlmostEqual(keep.mean(), 0.5, 1)
+
+    def test_density_mask(self):
+
+        density = np.full(10000, 0.25)
+        keep = filter_utils.density_mask(density, np.full(10000, 0.5), self.rng)
+        self.assertAlmostEqual(keep.mean(), 0.5, 1)
+        self.assertTrue(filter_utils.density_mask(density, density, self.rng).all())
+        self.assertFalse(filter_utils.density_mask(density, np.zeros(10000), self.rng).any())
+
+    def test_keys(self):
+        """ test that fixed keys give stable masks when re-tuning """
+
+        position = self.rng.random_sample((1000, 3)) * 10
+        normal = self.rng.normal(size=(1000, 3))
+        keys = self.rng.random_sample(1000)
+
+        keep = filter_utils.altitude_mask(position, 0, 10, 0.3, 0.7, 0.2, 0.2, keys=keys)
+        self.assertEqual(keep.tolist(), filter_utils.altitude_mask(position, 0, 10, 0.3, 0.7, 0.2, 0.2, keys=keys).tolist())
+        tighter = filter_utils.altitude_mask(position, 0, 10, 0.4, 0.7, 0.2, 0.2, keys=keys)
+        self.assertFalse((tighter & ~keep).any())
+
+        keep = filter_utils.slope_mask(normal, 20, 90, 0.5, keys=keys)
+        tighter = filter_utils.slope_mask(normal, 30, 90, 0.5, keys=keys)
+        self.assertFalse((tighter & ~keep).any())
+
+        value = position[:, 0] / 10
+        keep = filter_utils.texture_mask(value, keys=keys)
+        self.assertFalse((filter_utils.texture_mask(value * 0.5, keys=keys) & ~keep).any())
+
+    def test_exclusion_index(self):
+        """ test blocking points with per node radii """
+
+        index = filter_utils.ExclusionIndex([], [])
+        self.assertEqual(len(index), 0)
+        self.assertTrue(index.mask(np.zeros((3, 3))).all())
+
+        index = filter_utils.ExclusionIndex([[(0, 0, 0)], [(10, 0, 0), (20, 0, 0)]], [1, 3])
+        self.assertEqual(len(index), 3)
+        position = np.array([(0.5, 0, 0), (2, 0, 0), (8, 0, 0), (6, 0, 0), (20, 0, 2.9)])
+        self.assertEqual(index.mask(position).tolist(), [False, True, False, True, False])
+
+        # compare against brute force
+        blockers = [self.rng.random_sample((50, 3)), self.rng.random_sample((20, 3))]
+        index = filter_utils.ExclusionIndex(blockers, [0.05, 0.2])
+        position = self.rng.random_sample((500, 3))
+        distance = [np.sqrt(np.sum((position[:, np.newaxis] - b) ** 2, axis=2)).min(axis=1) for b in blockers]
+        expected = (distance[0] >= 0.05) & (distance[1] >= 0.2)
+        self.assertEqual(index.mask(position).tolist(), expected.tolist())
+
+        # per point radii and the radius of the candidates
+        index = filter_utils.ExclusionIndex([[(0, 0, 0), (10, 0, 0)]], [np.array([1, 2])])
+        position = np.array([(1.5, 0, 0), (8.5, 0, 0), (5, 0, 0)])
+        self.assertEqual(index.mask(position).tolist(), [True, False, True])
+        self.assertEqual(index.mask(position, 1).tolist(), [False, False, True])
+
+        # added points are blocking before and after the buffer is merged
+        index = filter_utils.ExclusionIndex([], [], buffer_size=2)
+        index.add([(0, 0, 0)], 1)
+        self.assertIsNone(index.tree)
+        self.assertEqual(index.mask([(0.5, 0, 0), (2, 0, 0)]).tolist(), [False, True])
+        index.add([(5, 0, 0), (8, 0, 0)], [1, 0.5])
+        self.assertEqual(len(index), 3)
+        self.assertIsNotNone(index.tree)
+        self.assertEqual(index.mask([(0.5, 0, 0), (5.9, 0, 0), (8.4, 0, 0), (2, 0, 0)]).tolist(),
+                         [False, False, False, True])
+
+        # popped and reset points stop blocking, fixed blockers are kept
+        index = filter_utils.ExclusionIndex([[(0, 0, 0)]], [1], buffer_size=2)
+        index.add([(5, 0, 0), (8, 0, 0), (11, 0, 0)], 1)
+        index.pop(1)
+        self.assertEqual(index.mask([(11, 0, 0), (8, 0, 0)]).tolist(), [True, False])
+        index.add([(11, 0, 0)], 1)
+        index.pop(2)
+        self.assertEqual(index.mask([(11, 0, 0), (8, 0, 0), (5, 0, 0)]).tolist(), [True, True, False])
+        index.pop(10)
+        self.assertEqual(len(index), 1)
+        index.add([(5, 0, 0)], 1)
+        index.reset([(8, 0, 0)], 1)
+        self.assertEqual(index.mask([(0, 0, 0), (5, 0, 0), (8, 0, 0)]).tolist(), [False, True, False])
@@ -1,6 +1,8 @@
 import os
 import sys
 
+import numpy as np
+
 import maya.cmds as cmds
 import maya.OpenMaya as om
 
@@ -36,21 +38,100 @@ class TestGeoCache(TestCase):
 
         self.geo_cache.cache_geometry(self.plane)
 
-        self.assertEqual(self.geo_cache.p0.length(), 200)
-        self.assertEqual(self.geo_cache.p1.length(), 200)
-        self.assertEqual(self.geo_cache.p2.length(), 200)
-        self.assertEqual(self.geo_cache.normals.length(), 200)
-        self.assertEqual(self.geo_cache.poly_id.length(), 200)
-        self.assertEqual(self.geo_cache.AB.length(), 200)
-        self.assertEqual(self.geo_cache.AC.length(), 200)
+        self.assertEqual(len(self.geo_cache), 200)
+        self.assertEqual(len(self.geo_cache.vertices), 121)
+        self.assertEqual(self.geo_cache.vertices.dtype, np.float32)
+        self.assertEqual(self.geo_cache.triangles.dtype, np.int32)
+        self.assertEqual(len(self.geo_cache.p0), 200)
+        self.assertEqual(len(self.geo_cache.p1), 200)
+        self.assertEqual(len(self.geo_cache.p2), 200)
+        self.assertEqual(len(self.geo_cache.normals), 200)
+        self.assertEqual(len(self.geo_cache.poly_id), 200)
+        self.assertEqual(len(self.geo_cache.AB), 200)
+        self.assertEqual(len(self.geo_cache.AC), 200)
 
         for i in range(100):
             self.assertEqual(self.geo_cache.poly_id[i * 2], i)
             self.assertEqual(self.geo_cache.poly_id[i * 2 + 1], i)
 
         self.geo_cache.create_uv_lookup()
+        self.assertEqual(self.geo_cache.uvs.shape, (200, 3, 2))
+        self.assertEqual(len(self.geo_cache.uv_tri_ids), 200)
+
+        # a uv coordinate maps back onto the triangle it lies in
+        tri_ids, bary = self.geo_cache.get_triangles_at_uv(np.array([(0.55, 0.55), (2, 2)]))
+        self.assertEqual(tri_ids[1], -1)
+        corners = self.geo_cache.uvs[tri_ids[:1]].astype(float)
+        uv = corners[0, 0] + (corners[0, 1] - corners[0, 0]) * bary[0, 0]\
+            + (corners[0, 2] - corners[0, 0]) * bary[0, 1]
+        self.assertTrue(np.allclose(uv, (0.55, 0.55), atol=1e-5))
+        self.assertTrue(np.allclose(self.geo_cache.get_uvs(tri_ids[:1], bary[:1]), (0.55, 0.55), atol=1e-5))
+
+        # world space points on the surface map back to their uvs. the
+        # default plane spans -5 to 5 and its v axis points along -z
+        cmds.xform(self.plane.fullPathName(), t=(1, 2, 3), s=(2, 1, 2))
+        tri_ids, bary = self.geo_cache.get_closest_triangles(np.array([(1.0, 2.0, 3.0), (5.0, 2.0, -1.0)]))
+        uvs = self.geo_cache.get_uvs(tri_ids, bary)
+        self.assertTrue(np.allclose(uvs, [(0.5, 0.5), (0.7, 0.7)], atol=1e-5))
+
+    def test_build_cancel(self):
+        """ test that a cancelled build leaves the cache untouched """
+
+        self.geo_cache.mesh = self.plane
+        vertices, triangles, poly_ids = self.geo_cache.extract_geometry()
+        self.assertEqual(vertices.shape, (121, 3))
+        self.assertEqual(triangles.shape, (200, 3))
+
+        self.geo_cache.flush_cache()
+        self.assertFalse(self.geo_cache.build_cache(vertices, triangles, poly_ids, lambda value: False))
+        self.assertFalse(self.geo_cache.cached)
+        self.assertEqual(len(self.geo_cache), 0)
+
+        progress = []
+        self.assertTrue(self.geo_cache.build_cache(vertices, triangles, poly_ids, lambda value: progress.append(value) or True))
+        self.assertTrue(self.geo_cache.cached)
+        self.assertEqual(len(self.geo_cache), 200)
+        self.assertEqual(progress[-1], 100)
+        self.assertAlmostEqual(self.geo_cache.cdf[-1], 1.0)
+
+    def test_build_empty(self):
+        """ test that geometry without surface area fails the build """
+
+        self.geo_cache.mesh = self.plane
+        vertices, triangles, poly_ids = self.geo_cache.extract_geometry()
+        self.geo_cache.flush_cache()
+
+        self.assertRaises(RuntimeError, self.geo_cache.build_cache,
+                          vertices, triangles[:0], poly_ids[:0])
+        self.assertRaises(RuntimeError, self.geo_cache.build_cache,
+                          np.zeros_like(vertices), triangles, poly_ids)
+        self.assertFalse(self.geo_cache.cached)
+
+    def test_transform(self):
+        """ test that the cache is object space and survives transformations """
 
-
-
-
-
+        self.geo_cache.cache_geometry(self.plane)
+        object_p0 = self.geo_cache.p0.copy()
+
+        cmds.xform(self.plane.fullPathName(), t=(1, 2, 3), ro=(0, 45, 90), s=(2, 2, 2))
+        self.assertTrue(self.geo_cache.validate_cache())
+        self.assertTrue((self.geo_cache.p0 == object_p0).all())
+
+        cmds.move(0, 1, 0, '{}.vtx[0]'.format(self.plane.fullPathName()), r=True)
+        self.assertFalse(self.geo_cache.validate_cache())
+        cmds.move(0, -1, 0, '{}.vtx[0]'.format(self.plane.fullPathName()), r=True)
+
+        tri_points = om.MPointArray()
+        vert_ids = om.MIntArray()
+        poly_iter = om.MItMeshPolygon(self.plane)
+        poly_iter.getTriangles(tri_points, vert_ids, om.MSpace.kWorld)
+
+        world_p0 = self.geo_cache.to_world(self.geo_cache.p0[:1])[0]
+        self.assertAlmostEqual(world_p0[0], tri_points[0].x, 5)
+        self.assertAlmostEqual(world_p0[1], tri_points[0].y, 5)
+        self.assertAlmostEqual(world_p0[2], tri_points[0].z, 5)
+
+        world_normal = self.geo_cache.normals_to_world(self.geo_cache.normals[:1])[0]
+        self.assertAlmostEqual(world_normal[0], -1, 5)
+        self.assertAlmostEqual(world_normal[1], 0, 5)
+        self.assertAlmostEqual(world_normal[2], 0, 5)
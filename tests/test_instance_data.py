@@ -1,5 +1,8 @@
 import os
 import sys
+import time
+
+import numpy as np
 
 import maya.cmds as cmds
 import maya.OpenMaya as om
@@ -188,6 +191,82 @@ class TestInstanceData(TestCase):
         self.instance_data += instance_data_2
         self.instance_data_validation(60)
 
+    def test_truncate(self):
+
+        length = 20
+        position, scale, rotation, instance_id, visibility, normal, tangent, u_coord, v_coord, poly_id, color = create_test_data(length)
+        self.instance_data.append_points(position, scale, rotation, instance_id,
+                                         visibility, normal, tangent, u_coord,
+                                         v_coord, poly_id, color)
+        self.instance_data.truncate(30)
+        self.instance_data_validation(20)
+
+        self.instance_data.truncate(5)
+        self.instance_data_validation(5)
+        self.assertEqual(self.instance_data.position[4], position[4])
+
+    def test_display_object(self):
+
+        length = 20
+        position, scale, rotation, instance_id, visibility, normal, tangent, u_coord, v_coord, poly_id, color = create_test_data(length)
+        self.instance_data.append_points(position, scale, rotation, instance_id,
+                                         visibility, normal, tangent, u_coord,
+                                         v_coord, poly_id, color)
+
+        data_object = self.instance_data.get_data_object()
+        self.assertEqual(self.instance_data.get_display_object(), data_object)
+
+        # rank the points like an emit does
+        display_rank = om.MDoubleArray()
+        for i in xrange(length):
+            display_rank.append((i + 1) / float(length))
+        self.instance_data.set_points(range(length), display_rank=display_rank)
+
+        # brushed points are always displayed
+        position, scale, rotation, instance_id, visibility, normal, tangent, u_coord, v_coord, poly_id, color = create_test_data(2)
+        self.instance_data.append_points(position, scale, rotation, instance_id,
+                                         visibility, normal, tangent, u_coord,
+                                         v_coord, poly_id, color)
+
+        self.instance_data.display_fraction = 0.25
+        display_object = self.instance_data.get_display_object()
+        array_attr_fn = om.MFnArrayAttrsData(display_object)
+        self.assertEqual(array_attr_fn.vectorArray('position').length(), 22)
+        self.assertEqual(array_attr_fn.intArray('objectIndex').length(), 22)
+        display_visibility = array_attr_fn.intArray('visibility')
+        self.assertEqual([display_visibility[i] for i in xrange(22)],
+                         [1] * 5 + [0] * 15 + [1] * 2)
+
+        # the display object is cached until the fraction changes
+        self.assertEqual(self.instance_data.get_display_object(), display_object)
+        self.instance_data.display_fraction = 0.5
+        array_attr_fn = om.MFnArrayAttrsData(self.instance_data.get_display_object())
+        display_visibility = array_attr_fn.intArray('visibility')
+        self.assertEqual(sum(display_visibility[i] for i in xrange(22)), 12)
+        self.instance_data_validation(22)
+
+    def test_bulk_arrays(self):
+        """ test that 1M points are converted and set in bulk """
+
+        length = 1000000
+        position = np.random.RandomState(0).random_sample((length, 3))
+
+        start = time.time()
+        vector_array = instance_data.to_vector_array(position)
+        int_array = instance_data.to_int_array(np.arange(length))
+        double_array = instance_data.to_double_array(position[:, 0])
+        self.instance_data.set_length(length)
+        self.instance_data.set_points(range(length), position=vector_array,
+                                      instance_id=int_array, u_coord=double_array)
+        result = instance_data.from_vector_array(self.instance_data.position)
+        self.assertLess(time.time() - start, 10)
+
+        self.assertTrue(np.allclose(result, position))
+        self.assertTrue(np.allclose(self.instance_data.np_position, position))
+        self.assertTrue(np.array_equal(instance_data.from_int_array(self.instance_data.instance_id), np.arange(length)))
+        self.assertTrue(np.allclose(instance_data.from_double_array(self.instance_data.u_coord), position[:, 0]))
+        self.assertTrue(np.array_equal(instance_data.from_int_array(self.instance_data.unique_id), np.arange(length)))
+
     def instance_data_validation(self, predicted_length):
         """ validate the instance data object """
         self.assertTrue(self.instance_data.is_valid)
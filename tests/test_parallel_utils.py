@@ -0,0 +1,61 @@
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree as kd_tree
+except ImportError:
+    from scipy.spatial import cKDTree as kd_tree
+
+from test_util import TestCase, grid_plane
+import parallel_utils
+
+
+class TestParallelUtils(TestCase):
+
+    def setUp(self):
+
+        # 20x20 grid plane in the xz plane
+        self.vertices, self.triangles = grid_plane(20, 20)
+
+        area = np.ones(len(self.triangles))
+        self.cdf = np.cumsum(area) / area.sum()
+
+    def test_sample_surface(self):
+        """ test that the result does not depend on the number of processes """
+
+        single = parallel_utils.sample_surface(self.vertices, self.triangles, self.cdf,
+                                               2500, 3, chunk_size=1000)
+        again = parallel_utils.sample_surface(self.vertices, self.triangles, self.cdf,
+                                              2500, 3, chunk_size=1000, processes=2)
+
+        self.assertEqual(len(single[2]), 2500)
+        for a, b in zip(single, again):
+            self.assertTrue(np.array_equal(a, b))
+
+        other = parallel_utils.sample_surface(self.vertices, self.triangles, self.cdf,
+                                              2500, 4, chunk_size=1000)
+        self.assertFalse(np.array_equal(single[2], other[2]))
+
+    def test_disk_sampling_surface(self):
+        """ test that the result does not depend on the number of processes,
+        the radius and the density at block borders """
+
+        radius = 0.5
+        single = parallel_utils.disk_sampling_surface(self.vertices, self.triangles, self.cdf,
+                                                      radius, 3, block_size=10)
+        again = parallel_utils.disk_sampling_surface(self.vertices, self.triangles, self.cdf,
+                                                     radius, 3, block_size=10, processes=2)
+
+        for a, b in zip(single, again):
+            self.assertTrue(np.array_equal(a, b))
+
+        distance, _ = kd_tree(single[2]).query(single[2], 2)
+        self.assertTrue((distance[:, 1] >= radius - 1e-6).all())
+
+        # the blocks are 5 units wide. the slabs right after the borders
+        # must be as dense as the rest of the plane
+        x = single[2][:, 0]
+        inner = (x > 1) & (x < 19)
+        density = np.sum(inner) / 18.0
+        for border in (5, 10, 15):
+            slab = np.sum((x >= border) & (x < border + 1))
+            self.assertGreater(slab, 0.85 * density)
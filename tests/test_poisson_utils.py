@@ -0,0 +1,201 @@
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree as kd_tree
+except ImportError:
+    from scipy.spatial import cKDTree as kd_tree
+
+from test_util import TestCase, grid_plane
+import sample_utils
+import poisson_utils
+
+
+class TestPoissonUtils(TestCase):
+
+    def setUp(self):
+
+        # 10x10 grid plane in the xz plane and a second plane further up
+        vertices, triangles = grid_plane(10, 10)
+        offset = vertices + (0, 20, 0)
+        self.vertices = np.vstack((vertices, offset)).astype(np.float32)
+        self.triangles = np.vstack((triangles, triangles + len(vertices))).astype(np.int32)
+
+        area = np.ones(len(self.triangles))
+        self.cdf = np.cumsum(area) / area.sum()
+        self.rng = np.random.RandomState(1)
+
+    def test_sparse_grid(self):
+
+        grid = poisson_utils.SparseGrid(3)
+        grid.add((0, 0, 0), (0, 1, 0), 0, (0, 0))
+        grid.add((2, 0, 0), (0, 1, 0), 0, (0, 0))
+        grid.add((100, 0, 0), (0, 1, 0), 0, (0, 0))
+
+        self.assertEqual(len(grid.cells), 2)
+        self.assertEqual(len(grid.neighbours((1, 0, 0))), 2)
+        self.assertEqual(len(grid.neighbours((50, 0, 0))), 0)
+
+        grid.add((1, 0, 0), (0, 1, 0), 0, (0, 0), 3)
+        index = grid.neighbour_ids((1, 0, 0))
+        self.assertEqual(sorted(grid.label[index].tolist()), [0, 0, 3])
+
+        index = grid.extend(np.array([(101, 0, 0), (200, 0, 0)]), np.zeros((2, 3)),
+                            np.zeros(2), np.zeros((2, 2)))
+        self.assertEqual(index.tolist(), [4, 5])
+
+    def test_resolve_conflicts(self):
+
+        position = np.array([(0, 0, 0), (0.5, 0, 0), (1.2, 0, 0), (0.9, 0, 0)])
+        valid = poisson_utils.resolve_conflicts(position, 1)
+        self.assertEqual(valid.tolist(), [0, 2])
+
+        # points conflict if they are closer than the mean of their radii
+        radius = np.array([3, 1, 1, 0.5])
+        position = np.array([(0, 0, 0), (1.8, 0, 0), (2.2, 0, 0), (2.9, 0, 0)])
+        valid = poisson_utils.resolve_conflicts(position, radius)
+        self.assertEqual(valid.tolist(), [0, 2])
+
+    def test_disk_sampling_surface(self):
+        """ test minimum distance, coverage and disconnected parts """
+
+        radius = 0.5
+        tri_ids, bary, position = poisson_utils.disk_sampling_surface(self.vertices,
+                                                                      self.triangles,
+                                                                      self.cdf,
+                                                                      radius,
+                                                                      self.rng)
+
+        # all samples lie on the surface
+        self.assertTrue(np.isin(np.round(position[:, 1], 5), (0, 20)).all())
+        self.assertTrue((position[:, 1] == 20).any())
+        self.assertTrue((position[:, 1] == 0).any())
+
+        # no two samples are closer than the radius
+        tree = kd_tree(position)
+        distance, _ = tree.query(position, 2)
+        self.assertTrue((distance[:, 1] >= radius - 1e-6).all())
+
+        # the surface is covered without big gaps
+        _, _, test_points = sample_utils.sample_surface(self.vertices,
+                                                        self.triangles,
+                                                        self.cdf,
+                                                        5000,
+                                                        self.rng)
+        distance, _ = tree.query(test_points)
+        self.assertTrue(distance.max() < radius * 1.5)
+
+        # triangle ids and barycentric coordinates reproduce the positions
+        corners = self.vertices[self.triangles[tri_ids]].astype(float)
+        result = sample_utils.interpolate(corners[:, 0], corners[:, 1], corners[:, 2], bary)
+        self.assertTrue(np.allclose(result, position))
+
+    def test_multi_class_disk_sampling(self):
+        """ test the class and global minimum distance and the class mix """
+
+        radius = 0.4
+        class_radius = np.array([0.4, 1.2])
+        tri_ids, bary, position, label = poisson_utils.multi_class_disk_sampling(self.vertices,
+                                                                                 self.triangles,
+                                                                                 self.cdf,
+                                                                                 class_radius,
+                                                                                 radius,
+                                                                                 self.rng)
+
+        self.assertEqual(len(label), len(position))
+        self.assertEqual(set(label.tolist()), {0, 1})
+
+        # no two samples are closer than the global radius and no two
+        # samples of the same class closer than the class radius
+        distance, _ = kd_tree(position).query(position, 2)
+        self.assertTrue((distance[:, 1] >= radius - 1e-6).all())
+        for i, r in enumerate(class_radius):
+            points = position[label == i]
+            distance, _ = kd_tree(points).query(points, 2)
+            self.assertTrue((distance[:, 1] >= r - 1e-6).all())
+
+        # the sparse class is spread out over the surface instead of
+        # being squeezed into the gaps of the dense class
+        share = np.mean(label == 1)
+        self.assertTrue(0.05 < share < 0.3)
+
+        corners = self.vertices[self.triangles[tri_ids]].astype(float)
+        result = sample_utils.interpolate(corners[:, 0], corners[:, 1], corners[:, 2], bary)
+        self.assertTrue(np.allclose(result, position))
+
+    def test_weighted_sample_elimination(self):
+        """ test exact sample count and better spacing than random samples """
+
+        num_samples = 200
+        _, _, candidates = sample_utils.sample_surface(self.vertices,
+                                                       self.triangles,
+                                                       self.cdf,
+                                                       num_samples * 5,
+                                                       self.rng)
+        valid = poisson_utils.weighted_sample_elimination(candidates, num_samples, 200)
+
+        self.assertEqual(len(valid), num_samples)
+        self.assertEqual(len(np.unique(valid)), num_samples)
+
+        # the closest pair is much further apart than among random samples
+        distance, _ = kd_tree(candidates[valid]).query(candidates[valid], 2)
+        random_distance, _ = kd_tree(candidates[:num_samples]).query(candidates[:num_samples], 2)
+        self.assertTrue(distance[:, 1].min() > random_distance[:, 1].min() * 3)
+
+    def test_disk_sampling_2d(self):
+        """ test minimum distance and coverage of a udim tile """
+
+        radius = 0.05
+        uvs = poisson_utils.disk_sampling_2d(radius, (1, 2), (0, 1), self.rng)
+
+        self.assertTrue((uvs[:, 0] >= 1).all() and (uvs[:, 0] < 2).all())
+        self.assertTrue((uvs[:, 1] >= 0).all() and (uvs[:, 1] < 1).all())
+
+        tree = kd_tree(uvs)
+        distance, _ = tree.query(uvs, 2)
+        self.assertTrue((distance[:, 1] >= radius - 1e-9).all())
+
+        distance, _ = tree.query(self.rng.random_sample((5000, 2)) + (1, 0))
+        self.assertTrue(distance.max() < radius * 1.5)
+
+    def test_progressive_order(self):
+        """ test that every prefix is spread out like a poisson disk set """
+
+        _, _, position = poisson_utils.disk_sampling_surface(self.vertices,
+                                                             self.triangles,
+                                                             self.cdf,
+                                                             0.2,
+                                                             self.rng)
+        position = np.vstack((position, position[:3]))
+        order = poisson_utils.progressive_order(position, self.rng)
+        self.assertEqual(sorted(order.tolist()), list(range(len(position))))
+
+        # the min distance of a prefix scales with the disk radius of a
+        # poisson set of the same size on the same area
+        for count in (10, 100, 1000):
+            prefix = position[order[:count]]
+            distance, _ = kd_tree(prefix).query(prefix, 2)
+            self.assertTrue(distance[:, 1].min() > 0.4 * np.sqrt(200.0 / count))
+
+        self.assertEqual(sorted(poisson_utils.progressive_order(np.zeros((3, 3)), self.rng).tolist()), [0, 1, 2])
+
+    def test_corner_tiles(self):
+        """ test that tiles with matching corners keep the minimum distance
+        across seams and that different seeds pick different tiles """
+
+        tiles, min_distance = poisson_utils.corner_tiles(256, self.rng)
+        self.assertEqual(len(tiles), 16)
+        self.assertTrue(all(abs(len(tile) - 256) < 16 for tile in tiles))
+        self.assertTrue(all(((tile >= 0) & (tile < 1)).all() for tile in tiles))
+        self.assertTrue(min_distance > 0.5 / np.sqrt(256))
+
+        points = poisson_utils.tile_plane(tiles, 2.0, (0, 0), (12, 12), (0.5, 0.5))
+        self.assertTrue((points >= 0).all() and (points <= 12).all())
+        self.assertTrue(abs(len(points) - 256 * 36) < 256)
+
+        distance, _ = kd_tree(points).query(points, 2)
+        self.assertTrue((distance[:, 1] >= min_distance * 2 - 1e-9).all())
+
+        other = poisson_utils.tile_plane(tiles, 2.0, (0, 0), (12, 12), (0.5, 0.5), seed=1)
+        self.assertFalse(np.array_equal(np.sort(points, axis=0), np.sort(other, axis=0)))
+        colors = poisson_utils.corner_colors(np.arange(100), np.zeros(100, dtype=int))
+        self.assertTrue(0 < colors.sum() < 100)
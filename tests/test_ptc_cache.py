@@ -0,0 +1,50 @@
+import numpy as np
+
+from test_util import TestCase
+import ptc_cache
+
+
+class Points(object):
+    """ minimal point container as filled by the sampler """
+
+    def __init__(self, length, offset=0):
+
+        self.position = np.arange(length * 3, dtype=float).reshape(-1, 3) + offset
+        self.normal = np.tile((0.0, 1.0, 0.0), (length, 1))
+        self.poly_id = np.arange(length)
+        self.tri_id = np.arange(length) * 2
+        self.barycentric = np.zeros((length, 2))
+        self.u_coord = np.zeros(length)
+        self.v_coord = np.zeros(length)
+
+
+class TestPtcCache(TestCase):
+
+    def setUp(self):
+
+        self.ptc_cache = ptc_cache.PtcCache()
+
+    def test_lock(self):
+        """ test that batches are merged and the cache is locked """
+
+        for i in range(3):
+            points = Points(10, i * 100)
+            self.ptc_cache.append(points, np.full((10, 3), i), [points.position, np.full(10, i)])
+
+        self.assertEqual(len(self.ptc_cache), 0)
+        self.ptc_cache.lock()
+        self.assertTrue(self.ptc_cache.locked)
+        self.assertEqual(len(self.ptc_cache), 30)
+        self.assertEqual(self.ptc_cache.keys.shape, (30, 3))
+        self.assertEqual(self.ptc_cache.transforms[1].tolist(), [0] * 10 + [1] * 10 + [2] * 10)
+        self.assertRaises(RuntimeError, self.ptc_cache.append, Points(1), np.zeros((1, 3)), [])
+
+        mask = np.arange(30) % 3 == 0
+        self.ptc_cache.set_published(mask, 5)
+        self.assertEqual(self.ptc_cache.published, (5, 15))
+        position = self.ptc_cache.get_transforms(mask)[0]
+        self.assertTrue(np.allclose(position, self.ptc_cache.position[mask]))
+
+        self.ptc_cache.flush_cache()
+        self.assertFalse(self.ptc_cache.locked)
+        self.assertEqual(len(self.ptc_cache), 0)
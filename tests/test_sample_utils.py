@@ -0,0 +1,233 @@
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree as kd_tree
+except ImportError:
+    from scipy.spatial import cKDTree as kd_tree
+
+from test_util import TestCase
+import sample_utils
+
+
+class TestSampleUtils(TestCase):
+
+    def setUp(self):
+
+        # two triangles forming a 2x1 quad and a small triangle far away
+        self.vertices = np.array([(0, 0, 0), (2, 0, 0), (2, 0, 1), (0, 0, 1),
+                                  (10, 0, 0), (11, 0, 0), (10, 0, 1)], dtype=np.float32)
+        self.triangles = np.array([(0, 1, 2), (0, 2, 3), (4, 5, 6)], dtype=np.int32)
+        area = np.array([2, 2, 1], dtype=float)
+        self.cdf = np.cumsum(area) / area.sum()
+        self.rng = np.random.RandomState(0)
+
+    def test_pick_triangles(self):
+        """ test that triangles are picked proportional to their area """
+
+        ids = sample_utils.pick_triangles(self.cdf, 50000, self.rng)
+        counts = np.bincount(ids, minlength=3) / 50000.0
+
+        self.assertAlmostEqual(counts[0], 0.4, 1)
+        self.assertAlmostEqual(counts[1], 0.4, 1)
+        self.assertAlmostEqual(counts[2], 0.2, 1)
+
+    def test_random_barycentric(self):
+        """ test that all coordinates lie within the triangle """
+
+        bary = sample_utils.random_barycentric(10000, self.rng)
+
+        self.assertEqual(bary.shape, (10000, 2))
+        self.assertTrue((bary >= 0).all())
+        self.assertTrue((bary.sum(axis=1) <= 1).all())
+
+    def test_sample_surface(self):
+        """ test that all samples lie on their triangle """
+
+        tri_ids, bary, position = sample_utils.sample_surface(self.vertices,
+                                                              self.triangles,
+                                                              self.cdf,
+                                                              1000,
+                                                              self.rng)
+
+        self.assertEqual(position.shape, (1000, 3))
+        self.assertTrue((position[:, 1] == 0).all())
+        self.assertTrue((position[tri_ids == 2, 0] >= 10).all())
+        self.assertTrue((position[tri_ids != 2, 0] <= 2).all())
+
+        # the same seed gives the same samples
+        _, _, other = sample_utils.sample_surface(self.vertices,
+                                                  self.triangles,
+                                                  self.cdf,
+                                                  1000,
+                                                  np.random.RandomState(0))
+        self.assertTrue(np.allclose(position, other))
+
+    def test_closest_point(self):
+        """ test projecting points onto the closest triangle """
+
+        points = np.array([(1.5, 3, 0.2), (10.2, -1, 0.2), (-5, 0, 5)])
+        tree = kd_tree(self.vertices[self.triangles].mean(axis=1))
+        tri_ids, bary, position = sample_utils.project_to_surface(points,
+                                                                  self.vertices,
+                                                                  self.triangles,
+                                                                  tree)
+
+        self.assertTrue(np.allclose(position, [(1.5, 0, 0.2), (10.2, 0, 0.2), (0, 0, 1)]))
+        self.assertEqual(tri_ids[1], 2)
+        self.assertTrue((bary >= 0).all())
+
+    def test_locate_uvs(self):
+        """ test finding the uv triangle and barycentric coordinates """
+
+        tri_uvs = np.array([[(0, 0), (1, 0), (1, 1)],
+                            [(0, 0), (1, 1), (0, 1)],
+                            [(2, 0), (3, 0), (2, 1)]], dtype=np.float32)
+        grid = sample_utils.TriangleGrid(tri_uvs, np.array([0, 2]))
+
+        uvs = np.array([(0.75, 0.25), (2.25, 0.5), (0.25, 0.75), (5, 5)])
+        tri_ids, bary = sample_utils.locate_uvs(uvs, tri_uvs, grid)
+
+        # the second triangle is not mapped
+        self.assertEqual(tri_ids.tolist(), [0, 2, -1, -1])
+        self.assertTrue(np.allclose(bary[0], (0.5, 0.25)))
+        self.assertTrue(np.allclose(bary[1], (0.25, 0.5)))
+
+    def test_locate_uvs_mixed_size(self):
+        """ test that a large triangle next to many small ones is found """
+
+        # a fan of 400 small triangles in [0, 1] and one large triangle
+        # covering [1, 10] x [0, 9]
+        x = np.linspace(0, 1, 401)
+        small = np.stack((np.column_stack((x[:-1], np.zeros(400))),
+                          np.column_stack((x[1:], np.zeros(400))),
+                          np.column_stack((x[:-1], np.ones(400)))), axis=1)
+        large = np.array([[(1, 0), (10, 0), (1, 9)]])
+        tri_uvs = np.concatenate((small, large))
+        grid = sample_utils.TriangleGrid(tri_uvs)
+
+        uvs = self.rng.random_sample((1000, 2)) * 4 + (1, 0)
+        tri_ids, bary = sample_utils.locate_uvs(uvs, tri_uvs, grid)
+        self.assertTrue((tri_ids == 400).all())
+
+        position = sample_utils.interpolate(tri_uvs[tri_ids, 0], tri_uvs[tri_ids, 1],
+                                            tri_uvs[tri_ids, 2], bary)
+        self.assertTrue(np.allclose(position, uvs))
+
+    def test_pick_per_cell(self):
+        """ test that exactly one point per occupied cell is picked """
+
+        points = self.rng.random_sample((1000, 3)) * (4, 0, 4)
+        ids = sample_utils.pick_per_cell(points, 1, self.rng)
+
+        self.assertEqual(len(ids), 16)
+        self.assertTrue((np.diff(ids) > 0).all())
+        cells = np.floor(points[ids]).astype(int)
+        self.assertEqual(len(set(map(tuple, cells.tolist()))), 16)
+
+    def test_stratified_sample_surface(self):
+        """ test one sample per cell proportional to the surface area """
+
+        tri_ids, bary, position = sample_utils.stratified_sample_surface(self.vertices,
+                                                                         self.triangles,
+                                                                         0.25,
+                                                                         self.rng)
+
+        # 8 * 4 cells on the quad and 2 * 4 cells on the small triangle
+        self.assertTrue(35 <= len(position) <= 45)
+        self.assertTrue((position[:, 1] == 0).all())
+
+        corners = self.vertices[self.triangles[tri_ids]].astype(float)
+        result = sample_utils.interpolate(corners[:, 0], corners[:, 1], corners[:, 2], bary)
+        self.assertTrue(np.allclose(result, position))
+
+    def test_halton_sample_surface(self):
+        """ test the halton sequence and deterministic surface samples """
+
+        sequence = sample_utils.halton(1000, 3, self.rng)
+        self.assertTrue((sequence >= 0).all() and (sequence < 1).all())
+
+        # every eighth of the first dimension holds exactly 1/8 of the points
+        counts = np.bincount((sequence[:1000 // 8 * 8, 0] * 8).astype(int))
+        self.assertTrue((counts == 125).all())
+
+        tri_ids, bary, position = sample_utils.halton_sample_surface(self.vertices,
+                                                                     self.triangles,
+                                                                     self.cdf,
+                                                                     1000,
+                                                                     np.random.RandomState(0))
+        self.assertTrue((position[:, 1] == 0).all())
+        self.assertTrue((bary >= 0).all() and (bary.sum(axis=1) <= 1 + 1e-9).all())
+        self.assertAlmostEqual(np.mean(tri_ids == 2), 0.2, 2)
+
+        _, _, other = sample_utils.halton_sample_surface(self.vertices,
+                                                         self.triangles,
+                                                         self.cdf,
+                                                         1000,
+                                                         np.random.RandomState(0))
+        self.assertTrue(np.allclose(position, other))
+
+    def test_drop_to_surface(self):
+        """ test vertical projection onto the top of the mesh """
+
+        vertices = self.vertices.copy()
+        vertices[2, 1] = 2
+        points = np.array([(1.5, 0.5), (10.2, 0.2), (5, 5)])
+        tri_ids, bary = sample_utils.drop_to_surface(points, vertices, self.triangles[:, ::-1])
+
+        self.assertEqual(tri_ids[2], -1)
+        corners = vertices[self.triangles[:, ::-1][tri_ids[:2]]].astype(float)
+        position = sample_utils.interpolate(corners[:, 0], corners[:, 1], corners[:, 2], bary[:2])
+        self.assertTrue(np.allclose(position[:, [0, 2]], points[:2]))
+        self.assertTrue(position[0, 1] > 0)
+
+    def test_drop_to_stacked_surface(self):
+        """ test that the highest of several stacked layers is hit """
+
+        layer = np.array([(0, 0, 0), (0, 0, 10), (10, 0, 0)], dtype=float)
+        vertices = np.concatenate((layer, layer + (0, 3, 0), layer + (0, 1, 0)))
+        triangles = np.arange(9).reshape(3, 3)
+        points = self.rng.random_sample((100, 2)) * 5
+
+        tri_ids, bary = sample_utils.drop_to_surface(points, vertices, triangles)
+        self.assertTrue((tri_ids == 1).all())
+
+    def test_density_sampling(self):
+        """ test sampling proportional to a density that is linear in x """
+
+        def density(tri_ids, bary):
+            corners = self.vertices[self.triangles[tri_ids]].astype(float)
+            position = sample_utils.interpolate(corners[:, 0], corners[:, 1], corners[:, 2], bary)
+            return np.where(position[:, 0] < 5, position[:, 0] / 2, 0)
+
+        bound, mean = sample_utils.density_bounds(density, len(self.triangles), chunk_size=2)
+        self.assertTrue(np.allclose(bound, (1, 1, 0)))
+        self.assertTrue(np.allclose(mean[2], 0))
+        self.assertTrue(sample_utils.weighted_cdf(self.cdf, np.zeros(3)) is None)
+
+        cdf = sample_utils.weighted_cdf(self.cdf, bound)
+        self.assertTrue(np.allclose(cdf, (0.5, 1, 1)))
+
+        # rejection against the bound gives a density proportional to x
+        # on the quad, so the mean of x is 4/3
+        tri_ids, bary, position = sample_utils.sample_surface(self.vertices, self.triangles, cdf, 50000, self.rng)
+        keep = density(tri_ids, bary) / bound[tri_ids] > self.rng.random_sample(len(tri_ids))
+        self.assertTrue((tri_ids != 2).all())
+        self.assertAlmostEqual(position[keep, 0].mean(), 4 / 3.0, 1)
+
+    def test_region(self):
+        """ test selecting triangles and points inside a box or sphere """
+
+        mask = sample_utils.triangles_in_box(self.vertices, self.triangles, (1.5, -1, 0.8), (3, 1, 2))
+        self.assertEqual(mask.tolist(), [True, True, False])
+        mask = sample_utils.triangles_in_box(self.vertices, self.triangles, (9, -1, -1), (9.5, 1, 1))
+        self.assertFalse(mask.any())
+
+        # the sphere touches the hypotenuse of the first triangle only
+        mask = sample_utils.triangles_in_sphere(self.vertices, self.triangles, (1.5, 0, 0.2), 0.1)
+        self.assertEqual(mask.tolist(), [True, False, False])
+        mask = sample_utils.triangles_in_sphere(self.vertices, self.triangles, (10.2, 0.3, 0.2), 0.5)
+        self.assertEqual(mask.tolist(), [False, False, True])
+
+        points = np.array([(0, 0, 0), (1, 1, 1), (3, 0, 0)], dtype=float)
+        self.assertEqual(sample_utils.points_in_box(points, (0, 0, 0), (1, 1, 1)).tolist(), [True, True, False])
+        self.assertEqual(sample_utils.points_in_sphere(points, np.zeros(3), 1.5).tolist(), [True, False, False])
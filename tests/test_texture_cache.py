@@ -0,0 +1,39 @@
+import numpy as np
+
+import maya.cmds as cmds
+
+from test_util import TestCase
+import texture_cache
+
+
+class TestTextureCache(TestCase):
+
+    def setUp(self):
+
+        cmds.file(new=True, f=True)
+        self.load_plugin('spore')
+
+        self.ramp = cmds.shadingNode('ramp', asTexture=True)
+        self.texture_cache = texture_cache.TextureCache()
+
+    def tearDown(self):
+        cmds.file(new=True, f=True)
+
+    def test_sample_texture(self):
+        """ test bilinear lookup at pixel centers and in between """
+
+        image = np.array([[(0, 0, 0), (1, 1, 1)],
+                          [(2, 2, 2), (3, 3, 3)]], dtype=np.float32)
+        color = texture_cache.sample_texture(image, [0.25, 0.75, 0.5, 1.25], [0.25, 0.25, 0.5, 0.25])
+
+        self.assertTrue(np.allclose(color[:, 0], (0, 1, 1.5, 0)))
+
+    def test_cache(self):
+        """ test that a texture is only baked again once it changes """
+
+        image = self.texture_cache.get_texture(self.ramp, 16)
+        self.assertEqual(image.shape, (16, 16, 3))
+        self.assertTrue(self.texture_cache.get_texture(self.ramp, 16) is image)
+
+        cmds.setAttr('{}.noise'.format(self.ramp), 0.5)
+        self.assertFalse(self.texture_cache.get_texture(self.ramp, 16) is image)
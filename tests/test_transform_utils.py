@@ -0,0 +1,74 @@
+import numpy as np
+
+import maya.OpenMaya as om
+
+from test_util import TestCase
+import transform_utils
+
+
+class TestTransformUtils(TestCase):
+
+    def setUp(self):
+
+        self.rng = np.random.RandomState(0)
+        self.rotation = self.rng.uniform(-180, 180, (20, 3))
+        self.direction = transform_utils.normalize(self.rng.randn(20, 3))
+
+    def test_euler_matrix(self):
+        """ test that euler conversion matches maya's rotation matrices """
+
+        matrix = transform_utils.euler_to_matrix(self.rotation)
+        for i, (x, y, z) in enumerate(np.radians(self.rotation)):
+            m_matrix = om.MEulerRotation(x, y, z).asMatrix()
+            for row in range(3):
+                for col in range(3):
+                    self.assertAlmostEqual(matrix[i, row, col], m_matrix(row, col), 6)
+
+        euler = transform_utils.matrix_to_euler(matrix)
+        self.assertTrue(np.allclose(transform_utils.euler_to_matrix(euler), matrix))
+
+    def test_get_rotation(self):
+        """ test the batched rotation against maya's quaternion slerp """
+
+        weight = 0.7
+        rotation = transform_utils.get_rotation(self.direction, weight, self.rotation)
+
+        for i in range(len(rotation)):
+            initial = om.MEulerRotation(*np.radians(self.rotation[i]))
+            direction = om.MVector(*self.direction[i])
+            quat = om.MQuaternion(om.MVector(0, 1, 0), direction, weight)
+            m_matrix = initial.asMatrix() * quat.asMatrix()
+
+            matrix = transform_utils.euler_to_matrix(rotation[i:i + 1])[0]
+            for row in range(3):
+                for col in range(3):
+                    self.assertAlmostEqual(matrix[row, col], m_matrix(row, col), 6)
+
+    def test_rotate_into(self):
+        """ test that the local up vector points in the target direction """
+
+        rotation = transform_utils.rotate_into(self.rotation, self.direction, 1.0)
+        local_up = transform_utils.euler_to_matrix(rotation)[:, 1]
+        self.assertTrue(np.allclose(local_up, self.direction))
+
+    def test_scale_offset_tangent(self):
+
+        scale = transform_utils.random_scale(100, (1, 1, 1), (2, 3, 4), True, self.rng)
+        self.assertTrue((scale[:, 0] == scale[:, 1]).all())
+        self.assertTrue(((scale >= 1) & (scale <= 2)).all())
+
+        scale = transform_utils.random_scale(100, (1, 1, 1), (2, 3, 4), False, self.rng)
+        self.assertTrue((scale.max(axis=0) <= (2, 3, 4)).all())
+
+        position = transform_utils.apply_offset(np.zeros((20, 3)), self.direction, np.ones(20))
+        self.assertTrue(np.allclose(position, self.direction))
+
+        tangent = transform_utils.get_tangent(self.direction)
+        self.assertTrue(np.allclose(np.sum(tangent * self.direction, axis=1), 0))
+        self.assertTrue(np.allclose(np.sum(tangent ** 2, axis=1), 1))
+
+    def test_footprint_radius(self):
+
+        scale = np.array([(1, 5, 1), (2, 1, 0.5), (0.5, 1, -3), (1, 1, 1)])
+        radius = transform_utils.footprint_radius([1, 2], [0, 1, 0, 2], scale)
+        self.assertTrue(np.allclose(radius, (1, 4, 3, 0)))